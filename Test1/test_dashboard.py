@@ -0,0 +1,262 @@
+# tests/test_dashboard.py
+from fastapi.testclient import TestClient
+
+from conftest import sqlite_only
+from test_flow_transfer import _register, _login, _headers, _open_account
+
+def test_admin_summary_counters_follow_write_paths_without_drift(client: TestClient, db):
+    from app.counters import compute_bank_stats, reconcile_bank_stats
+
+    # earlier tests flip KYC rows directly in the DB; start from a reconciled row
+    reconcile_bank_stats(db, fix=True)
+
+    client.post("/auth/create-admin", json={"email": "statsadmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "statsadmin@test.com", "Admin@123")
+    _register(client, "stats1@test.com", "Test@123", "S1")
+    _register(client, "stats2@test.com", "Test@123", "S2")
+    tok1 = _login(client, "stats1@test.com", "Test@123")
+    tok2 = _login(client, "stats2@test.com", "Test@123")
+    kyc1 = client.post("/kyc/apply", headers=_headers(tok1)).json()["kyc_id"]
+    kyc2 = client.post("/kyc/apply", headers=_headers(tok2)).json()["kyc_id"]
+
+    r = client.put(f"/kyc/admin/{kyc1}/verify", headers=_headers(admin), params={"decision": "approved"})
+    assert r.json()["message"] == "KYC approved and account created"
+    client.put(f"/kyc/admin/{kyc2}/verify", headers=_headers(admin), params={"decision": "rejected"})
+    r = client.post("/accounts/create", headers=_headers(tok1), json={"account_type": "current", "initial_deposit": 7000})
+    assert r.status_code == 200, r.text
+
+    summary = client.get("/dashboard/admin/summary", headers=_headers(admin)).json()["data"]
+    actual = compute_bank_stats(db)
+    assert summary == {
+        "total_users": actual["total_users"],
+        "kyc_pending": actual["kyc_pending"],
+        "kyc_approved": actual["kyc_approved"],
+        "total_accounts": actual["total_accounts"],
+        "total_bank_balance": actual["total_balance"],
+    }
+    assert reconcile_bank_stats(db) == {}
+
+def test_customer_reads_answer_304_until_a_transfer_touches_the_user(client: TestClient, db):
+    from sqlalchemy import event
+
+    _register(client, "etag1@test.com", "Test@123", "E1")
+    _register(client, "etag2@test.com", "Test@123", "E2")
+    tok1 = _login(client, "etag1@test.com", "Test@123")
+    tok2 = _login(client, "etag2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 5000)
+    acct2 = _open_account(client, tok2, 1000)
+
+    first = client.get("/dashboard/customer/summary", headers=_headers(tok2))
+    assert first.status_code == 200 and first.json()["data"]["total_balance"] == 1000
+    etag = first.headers["ETag"]
+
+    queries = []
+    engine = db.get_bind()
+    def count(conn, cursor, statement, *args):
+        if "FROM accounts" in statement or "FROM kyc_applications" in statement:
+            queries.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        again = client.get("/dashboard/customer/summary", headers={**_headers(tok2), "If-None-Match": etag})
+        assert again.status_code == 304 and again.headers["ETag"] == etag
+        assert queries == []
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # a transfer into one of the user's accounts bumps their version once it commits
+    t = client.post("/transfer", headers=_headers(tok1), json={"sender_account": acct1, "receiver_account": acct2, "amount": 250})
+    assert t.status_code == 200, t.text
+    fresh = client.get("/dashboard/customer/summary", headers={**_headers(tok2), "If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.json()["data"]["total_balance"] == 1250
+    assert fresh.headers["ETag"] != etag
+    assert [a["balance"] for a in client.get("/accounts/me", headers=_headers(tok2)).json()] == [1250]
+
+def test_cache_versions_are_shared_and_bumped_only_by_the_outer_commit(client: TestClient, db):
+    from sqlalchemy import event, select, update
+    from app import group_commit, response_cache
+    from app.models import Account, CacheVersion, User
+
+    _register(client, "shared@test.com", "Test@123", "Shared")
+    tok = _login(client, "shared@test.com", "Test@123")
+    acct = _open_account(client, tok, 1000)
+    user_id = db.query(User.id).filter_by(email="shared@test.com").scalar()
+    engine = db.get_bind()
+
+    def summary(etag=None):
+        return client.get("/dashboard/customer/summary", headers={**_headers(tok), **({"If-None-Match": etag} if etag else {})})
+    etag = summary().headers["ETag"]
+
+    # a group-commit batch whose COMMIT fails bumps nothing, although its SAVEPOINT was released
+    def refuse(conn):
+        raise RuntimeError("disk full")
+    def credit(session):
+        response_cache.touch(session, user_id)
+        session.execute(update(Account).where(Account.account_number == acct).values(balance=Account.balance + 1))
+    before = response_cache.current_version(db, user_id)
+    event.listen(engine, "commit", refuse)
+    try:
+        writer = group_commit.GroupCommitWriter(engine, max_batch=8, max_wait_ms=50)
+        assert writer.submit(credit).exception(timeout=5).status_code == 500
+    finally:
+        event.remove(engine, "commit", refuse)
+    assert response_cache.current_version(db, user_id) == before
+    assert summary(etag).status_code == 304
+
+    # another worker's commit (data and version row, no in-process state) invalidates this one's entry
+    with engine.begin() as conn:
+        conn.execute(update(Account).where(Account.account_number == acct).values(balance=Account.balance + 5))
+        conn.execute(update(CacheVersion).where(CacheVersion.user_id == user_id).values(version=CacheVersion.version + 1))
+    fresh = summary(etag)
+    assert fresh.status_code == 200 and fresh.json()["data"]["total_balance"] == 1005
+    assert db.execute(select(CacheVersion.version).where(CacheVersion.user_id == user_id)).scalar() == before + 1
+
+def test_volume_rollups_match_a_rebuild_from_transactions(client: TestClient, db):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select
+    from app import rollups
+    from app.models import VolumeRollup
+
+    client.post("/auth/create-admin", json={"email": "voladmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "voladmin@test.com", "Admin@123")
+    _register(client, "vol1@test.com", "Test@123", "V1")
+    _register(client, "vol2@test.com", "Test@123", "V2")
+    tok1 = _login(client, "vol1@test.com", "Test@123")
+    tok2 = _login(client, "vol2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 5000)
+    acct2 = _open_account(client, tok2, 5000)
+
+    def totals(buckets):
+        return sum(b["transfers"] for b in buckets), sum(b["amount"] for b in buckets)
+
+    before = totals(client.get("/dashboard/admin/volume", headers=_headers(admin)).json()["data"]["buckets"])
+    client.post("/transfer", headers=_headers(tok1), json={"sender_account": acct1, "receiver_account": acct2, "amount": 40})
+    client.post("/transfer/batch", headers=_headers(tok2), json={"transfers": [
+        {"sender_account": acct2, "receiver_account": acct1, "amount": 60},
+        {"sender_account": acct2, "receiver_account": acct1, "amount": 5},
+    ]})
+
+    r = client.get("/dashboard/admin/volume", headers=_headers(admin), params={"granularity": "hour"})
+    assert r.status_code == 200, r.text
+    buckets = r.json()["data"]["buckets"]
+    assert len(buckets) in (24, 25)  # partial hour at the start
+    transfers, amount = totals(buckets)
+    assert (transfers - before[0], amount - before[1]) == (3, 105)
+
+    day = client.get("/dashboard/admin/volume", headers=_headers(admin),
+                     params={"granularity": "day", "account_type": "savings"}).json()["data"]["buckets"][-1]
+    assert day["transfers"] >= 3 and set(day["by_account_type"]) == {"savings"}
+
+    assert client.get("/dashboard/admin/volume", headers=_headers(admin), params={
+        "start": (datetime.utcnow() - timedelta(days=400)).isoformat()}).status_code == 400
+    assert client.get("/dashboard/admin/volume", headers=_headers(tok1)).status_code == 403
+
+    # bounds with an offset are converted to UTC, not compared with naive ones
+    ist = timezone(timedelta(hours=5, minutes=30))
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+    start = hour.replace(tzinfo=timezone.utc).astimezone(ist)  # e.g. 14:30+05:30 for 09:00 UTC
+    r = client.get("/dashboard/admin/volume", headers=_headers(admin), params={"start": start.isoformat()})
+    assert r.status_code == 200, r.text
+    first = r.json()["data"]["buckets"][0]["bucket"]
+    assert datetime.fromisoformat(first) == hour
+    r = client.get("/dashboard/admin/volume", headers=_headers(admin),
+                   params={"start": "2026-10-17T00:00:00Z", "end": "2026-10-17T05:30:00+05:30"})
+    assert r.status_code == 400 and r.json()["detail"] == "start must be before end"
+
+    def snapshot():
+        return sorted(tuple(x) for x in db.execute(select(VolumeRollup.__table__)).all())
+    live = snapshot()
+    rollups.rebuild_rollups(db)
+    assert snapshot() == live
+
+@sqlite_only
+def test_reads_use_the_replica_unless_it_lags_or_the_user_just_wrote(client: TestClient, db, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app import config, metrics, replicas
+    from app.models import Account, CacheVersion
+    from conftest import engine
+
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    _register(client, "reader@test.com", "Test@123", "Reader")
+    _register(client, "payee@test.com", "Test@123", "Payee")
+    tok = _login(client, "reader@test.com", "Test@123")
+    mine = _open_account(client, tok, 5000)
+    theirs = _open_account(client, _login(client, "payee@test.com", "Test@123"), 1000)
+
+    def age_writes():
+        # as if every write so far were older than READ_YOUR_WRITES_SECONDS
+        db.execute(update(CacheVersion).values(
+            written_at=datetime.utcnow() - timedelta(seconds=config.READ_YOUR_WRITES_SECONDS + 1)))
+        db.commit()
+    age_writes()  # opening the accounts was a write too
+
+    replica = replicas.Replica(f"sqlite:///{tmp_path / 'replica.db'}", engine, heartbeat_seconds=0, sync_seconds=3600)
+    monkeypatch.setattr(replicas, "replica", replica)
+    monkeypatch.setattr(replicas, "pins", replicas.Pins(60))
+    replica.tick()  # heartbeat, snapshot copy, read-back
+    assert replica.lag() < config.REPLICA_MAX_LAG_SECONDS
+
+    def balance():
+        r = client.get("/dashboard/customer/summary", headers=_headers(tok))
+        assert r.status_code == 200, r.text
+        return r.json()["data"]["total_balance"]
+
+    # a change the replica has not received yet (and that pins nobody) stays invisible
+    db.execute(update(Account).where(Account.account_number == mine).values(balance=Account.balance + 1))
+    db.commit()
+    assert balance() == 5000
+    assert client.get("/transactions/me", headers=_headers(tok)).status_code == 200
+
+    # the user's own transfer pins their reads to the primary
+    r = client.post("/transfer", headers=_headers(tok), json={"sender_account": mine, "receiver_account": theirs, "amount": 1000})
+    assert r.status_code == 200, r.text
+    assert balance() == 4001
+    assert replicas.pins.pinned(db.query(Account.user_id).filter_by(account_number=mine).scalar())
+
+    # another worker has no pin in memory, but sees the write stamped on the primary
+    monkeypatch.setattr(replicas, "pins", replicas.Pins(60))
+    assert balance() == 4001
+
+    # once the write is older than READ_YOUR_WRITES_SECONDS, reads return to the replica;
+    # past the lag limit they go back to the primary
+    age_writes()
+    assert balance() == 5000
+    lagging = metrics.counter("replica.reads_lagging").value
+    replica.seen = datetime.utcnow() - timedelta(seconds=config.REPLICA_MAX_LAG_SECONDS + 1)
+    assert balance() == 4001
+    assert metrics.counter("replica.reads_lagging").value == lagging + 1
+
+    replica.beat()
+    replica.copy()
+    replica.refresh()
+    assert balance() == 4001  # caught up
+
+@sqlite_only
+def test_an_admin_reads_their_own_write_from_the_primary(client: TestClient, db, tmp_path, monkeypatch):
+    from app import replicas
+    from app.models import User
+    from conftest import engine
+
+    client.post("/auth/create-admin", json={"email": "rywadmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "rywadmin@test.com", "Admin@123")
+    _register(client, "rywpayer@test.com", "Test@123", "Payer")
+    _register(client, "rywpayee@test.com", "Test@123", "Payee")
+    payer = _open_account(client, _login(client, "rywpayer@test.com", "Test@123"), 5000)
+    payee = _open_account(client, _login(client, "rywpayee@test.com", "Test@123"), 1000)
+
+    replica = replicas.Replica(f"sqlite:///{tmp_path / 'replica.db'}", engine, heartbeat_seconds=0, sync_seconds=3600)
+    monkeypatch.setattr(replicas, "replica", replica)
+    monkeypatch.setattr(replicas, "pins", replicas.Pins(60))
+    replica.tick()
+
+    def history():
+        r = client.get("/transactions/all", headers=_headers(admin), params={"account": payer})
+        assert r.status_code == 200, r.text
+        return [t["amount"] for t in r.json()["data"]]
+
+    assert history() == []
+    # the admin moves money between two customers' accounts, then looks it up
+    r = client.post("/transfer", headers=_headers(admin), json={"sender_account": payer, "receiver_account": payee, "amount": 700})
+    assert r.status_code == 200, r.text
+    assert history() == [700]
+    assert replicas.pins.pinned(db.query(User.id).filter_by(email="rywadmin@test.com").scalar())
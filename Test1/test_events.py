@@ -0,0 +1,106 @@
+# tests/test_events.py
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app import events
+from test_flow_transfer import _register, _login, _headers, _open_account
+
+def test_bus_delivers_across_threads_resumes_and_resets_lagging_subscribers():
+    bus = events.EventBus(history_size=3, buffer_size=2)
+
+    async def scenario():
+        sub = bus.subscribe({"kyc"})
+        threading.Thread(target=bus.publish, args=("kyc", {"n": 1})).start()
+        lagged, batch = await sub.next(timeout=5)
+        assert not lagged and [e.data for e in batch] == [{"n": 1}]
+
+        bus.publish("transactions", {"n": 2})  # other topic: not delivered
+        for n in (3, 4, 5):
+            bus.publish("kyc", {"n": n})
+        lagged, batch = await sub.next(timeout=1)
+        assert lagged and batch == []  # buffer of 2 overflowed
+
+        last = bus.publish("kyc", {"n": 6}).id
+        bus.publish("kyc", {"n": 7})
+        resumed = bus.subscribe({"kyc"}, last_event_id=last)
+        lagged, batch = await resumed.next(timeout=1)
+        assert not lagged and [e.data for e in batch] == [{"n": 7}]
+
+        for stale in ("0-1", f"{bus.epoch}-1"):  # other process / fell out of the history
+            lagged, _ = await bus.subscribe({"kyc"}, last_event_id=stale).next(timeout=0)
+            assert lagged
+    asyncio.run(scenario())
+
+def test_write_paths_publish_only_committed_changes(client: TestClient, db):
+    from app import group_commit
+
+    _register(client, "ev1@test.com", "Test@123", "E1")
+    _register(client, "ev2@test.com", "Test@123", "E2")
+    tok1 = _login(client, "ev1@test.com", "Test@123")
+    tok2 = _login(client, "ev2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 5000)
+    acct2 = _open_account(client, tok2, 5000)
+    _register(client, "ev3@test.com", "Test@123", "E3")
+    tok3 = _login(client, "ev3@test.com", "Test@123")
+
+    published = []
+    original = events.bus.publish
+    events.bus.publish = lambda topic, data: published.append((topic, data)) or original(topic, data)
+    try:
+        kyc_id = client.post("/kyc/apply", headers=_headers(tok3)).json()["kyc_id"]
+        ref = client.post("/transfer", headers=_headers(tok1),
+                          json={"sender_account": acct1, "receiver_account": acct2, "amount": 75}).json()["reference_id"]
+        r = client.post("/transfer", headers=_headers(tok1),
+                        json={"sender_account": acct1, "receiver_account": acct2, "amount": 10_000_000})
+        assert r.status_code == 400
+
+        # a job rolled back to its SAVEPOINT inside a committed group-commit batch publishes nothing
+        writer = group_commit.GroupCommitWriter(db.get_bind(), max_batch=8, max_wait_ms=50)
+        def fails(session):
+            events.publish_on_commit(session, "transactions", {"ref": "rolled-back"})
+            raise ValueError("boom")
+        def works(session):
+            events.publish_on_commit(session, "transactions", {"ref": "kept"})
+        futures = [writer.submit(fails), writer.submit(works)]
+        assert futures[1].result(timeout=5) is None
+        assert isinstance(futures[0].exception(timeout=5), ValueError)
+    finally:
+        events.bus.publish = original
+
+    assert [(t, d.get("ref") or d.get("kyc_id")) for t, d in published] == [
+        ("kyc", kyc_id), ("transactions", ref), ("transactions", "kept"),
+    ]
+
+def test_group_commit_batch_whose_commit_fails_publishes_nothing(db):
+    from sqlalchemy import event
+    from app import group_commit
+
+    def refuse(conn):
+        raise RuntimeError("disk full")
+
+    published = []
+    original = events.bus.publish
+    events.bus.publish = lambda topic, data: published.append((topic, data)) or original(topic, data)
+    engine = db.get_bind()
+    event.listen(engine, "commit", refuse)  # the batch COMMIT fails after every SAVEPOINT was released
+    try:
+        writer = group_commit.GroupCommitWriter(engine, max_batch=8, max_wait_ms=50)
+        def job(session):
+            events.publish_on_commit(session, "transactions", {"ref": "never-committed"})
+        futures = [writer.submit(job), writer.submit(job)]
+        assert all(f.exception(timeout=5).status_code == 500 for f in futures)
+    finally:
+        event.remove(engine, "commit", refuse)
+        events.bus.publish = original
+    assert published == []
+
+def test_admin_event_stream_requires_admin_and_known_topics(client: TestClient):
+    _register(client, "evc@test.com", "Test@123", "EC")
+    tok = _login(client, "evc@test.com", "Test@123")
+    assert client.get("/events/admin", headers=_headers(tok)).status_code == 403
+
+    client.post("/auth/create-admin", json={"email": "evadmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "evadmin@test.com", "Admin@123")
+    assert client.get("/events/admin", headers=_headers(admin), params={"topics": "balances"}).status_code == 400
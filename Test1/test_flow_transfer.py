@@ -2,6 +2,7 @@
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.main import app
 from app.models import KYCApplication
 
 def _register(client: TestClient, email: str, password: str, full_name: str="Test"):
@@ -16,7 +17,7 @@ def _headers(tok: str): return {"Authorization": f"Bearer {tok}"}
 
 def _approve_kyc_direct(client: TestClient):
     # flip all KYC applications in DB to approved (shortcut for tests)
-    gen = get_db()
+    gen = app.dependency_overrides.get(get_db, get_db)()
     db: Session = next(gen)
     try:
         rows = db.query(KYCApplication).filter(KYCApplication.status != "approved").all()
@@ -61,3 +62,237 @@ def test_register_login_transfer_flow(client: TestClient):
                     json={"sender_account": acct1, "receiver_account": acct2, "amount": 500})
     assert t.status_code == 200, t.text
     assert t.json()["message"] == "Transfer successful"
+
+def _open_account(client: TestClient, tok: str, deposit: int) -> str:
+    client.post("/kyc/apply", headers=_headers(tok))
+    _approve_kyc_direct(client)
+    r = client.post("/accounts/create", headers=_headers(tok),
+                    json={"account_type": "savings", "initial_deposit": deposit})
+    assert r.status_code == 200, r.text
+    return r.json()["account_number"]
+
+def test_batch_transfer_settles_valid_items_and_reports_failures(client: TestClient):
+    _register(client, "b1@test.com", "Test@123", "B1")
+    _register(client, "b2@test.com", "Test@123", "B2")
+    tok1 = _login(client, "b1@test.com", "Test@123")
+    tok2 = _login(client, "b2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 3000)
+    acct2 = _open_account(client, tok2, 1000)
+
+    items = [
+        {"sender_account": acct1, "receiver_account": acct2, "amount": 1000},
+        {"sender_account": acct1, "receiver_account": acct1, "amount": 10},
+        {"sender_account": acct1, "receiver_account": acct2, "amount": 2500},  # only 2000 left
+        {"sender_account": acct2, "receiver_account": acct1, "amount": 10},    # not b1's account
+        {"sender_account": acct1, "receiver_account": "0000000000", "amount": 10},
+        {"sender_account": acct1, "receiver_account": acct2, "amount": 2000},
+    ]
+    r = client.post("/transfer/batch", headers=_headers(tok1), json={"transfers": items})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["succeeded"], body["failed"]) == (2, 4)
+    assert [x["status"] for x in body["results"]] == ["success", "failed", "failed", "failed", "failed", "success"]
+    assert body["results"][2]["detail"] == "Insufficient funds"
+    assert body["results"][3]["status_code"] == 403
+    assert body["results"][4]["status_code"] == 404
+
+    balances = {a["account_number"]: a["balance"] for a in client.get("/accounts/me", headers=_headers(tok2)).json()}
+    assert balances[acct2] == 4000
+
+def test_daily_debit_counter_tracks_transfers_and_rebuilds(client: TestClient, db: Session):
+    from app.counters import rebuild_daily_debits, todays_debits
+    from app.routers.transfers import DAILY_LIMIT, MAX_PER_TRANSFER
+
+    _register(client, "d1@test.com", "Test@123", "D1")
+    _register(client, "d2@test.com", "Test@123", "D2")
+    tok1 = _login(client, "d1@test.com", "Test@123")
+    tok2 = _login(client, "d2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, DAILY_LIMIT + MAX_PER_TRANSFER)
+    acct2 = _open_account(client, tok2, 1000)
+
+    for _ in range(DAILY_LIMIT // MAX_PER_TRANSFER):
+        t = client.post("/transfer", headers=_headers(tok1),
+                        json={"sender_account": acct1, "receiver_account": acct2, "amount": MAX_PER_TRANSFER})
+        assert t.status_code == 200, t.text
+    assert todays_debits(db, acct1) == DAILY_LIMIT
+
+    t = client.post("/transfer", headers=_headers(tok1),
+                    json={"sender_account": acct1, "receiver_account": acct2, "amount": 1})
+    assert t.status_code == 400 and t.json()["detail"] == "Daily transfer limit exceeded"
+
+    assert rebuild_daily_debits(db, dry_run=True) == {}
+
+def test_rebuild_of_daily_debits_does_not_lose_a_concurrent_transfer(client: TestClient, db: Session, monkeypatch):
+    import threading
+    from app import counters
+    from app.counters import rebuild_daily_debits, todays_debits
+
+    _register(client, "rb1@test.com", "Test@123", "R1")
+    _register(client, "rb2@test.com", "Test@123", "R2")
+    tok1 = _login(client, "rb1@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 5000)
+    acct2 = _open_account(client, _login(client, "rb2@test.com", "Test@123"), 1000)
+
+    responses = []
+    def send():
+        responses.append(client.post("/transfer", headers=_headers(tok1),
+                                     json={"sender_account": acct1, "receiver_account": acct2, "amount": 300}))
+    sender = threading.Thread(target=send)
+    recount = counters._debits_from_transactions
+    def recount_then_race(session):
+        expected = recount(session)
+        sender.start()
+        sender.join(timeout=1)  # it commits here unless the rebuild holds it off
+        return expected
+    monkeypatch.setattr(counters, "_debits_from_transactions", recount_then_race)
+
+    rebuild_daily_debits(db)
+    sender.join()
+    assert responses[0].status_code == 200, responses[0].text
+    monkeypatch.undo()
+    assert todays_debits(db, acct1) == 300
+    assert not [k for k in rebuild_daily_debits(db, dry_run=True) if k.startswith(acct1)]
+
+def test_transfer_at_midnight_counts_on_the_day_it_is_stamped(client: TestClient, db: Session, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.counters import rebuild_daily_debits
+    from app.models import DailyDebit, Transaction
+    from app.routers import transfers
+
+    _register(client, "mid1@test.com", "Test@123", "M1")
+    _register(client, "mid2@test.com", "Test@123", "M2")
+    tok1 = _login(client, "mid1@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 5000)
+    acct2 = _open_account(client, _login(client, "mid2@test.com", "Test@123"), 1000)
+
+    class Clock(datetime):
+        # every call lands later; the first one is just before midnight
+        ticks = iter(datetime(2031, 1, 1, 23, 59, 59, 999_000) + timedelta(seconds=i) for i in range(100))
+
+        @classmethod
+        def utcnow(cls):
+            return next(cls.ticks)
+
+    monkeypatch.setattr(transfers, "datetime", Clock)
+    for path, body in (
+        ("/transfer", {"sender_account": acct1, "receiver_account": acct2, "amount": 100}),
+        ("/transfer/batch", {"transfers": [{"sender_account": acct1, "receiver_account": acct2, "amount": 50}]}),
+    ):
+        r = client.post(path, headers=_headers(tok1), json=body)
+        assert r.status_code == 200, r.text
+
+    days = {t.timestamp.date() for t in db.query(Transaction).filter(Transaction.sender_account == acct1)}
+    counted = {d.day for d in db.query(DailyDebit).filter(DailyDebit.account_number == acct1)}
+    assert days == counted
+    assert not [k for k in rebuild_daily_debits(db, dry_run=True) if k.startswith(acct1)]
+
+def test_concurrent_transfers_from_hot_account_keep_exact_balances(client: TestClient):
+    from concurrent.futures import ThreadPoolExecutor
+
+    _register(client, "hot1@test.com", "Test@123", "Hot1")
+    _register(client, "hot2@test.com", "Test@123", "Hot2")
+    tok1 = _login(client, "hot1@test.com", "Test@123")
+    tok2 = _login(client, "hot2@test.com", "Test@123")
+    hot = _open_account(client, tok1, 5000)
+    other = _open_account(client, tok2, 1000)
+
+    def send(_):
+        return client.post("/transfer", headers=_headers(tok1),
+                           json={"sender_account": hot, "receiver_account": other, "amount": 100})
+
+    # 80 transfers of 100 race for 5000: exactly 50 may succeed
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(send, range(80)))
+    codes = [r.status_code for r in responses]
+    assert codes.count(200) == 50, [r.text for r in responses if r.status_code != 200][:3]
+    assert all(r.json()["detail"] == "Insufficient funds" for r in responses if r.status_code != 200)
+
+    mine = {a["account_number"]: a["balance"] for a in client.get("/accounts/me", headers=_headers(tok1)).json()}
+    theirs = {a["account_number"]: a["balance"] for a in client.get("/accounts/me", headers=_headers(tok2)).json()}
+    assert mine[hot] == 0
+    assert theirs[other] == 6000
+
+def test_idempotency_key_replays_transfer_without_second_debit(client: TestClient):
+    _register(client, "idem1@test.com", "Test@123", "I1")
+    _register(client, "idem2@test.com", "Test@123", "I2")
+    tok1 = _login(client, "idem1@test.com", "Test@123")
+    tok2 = _login(client, "idem2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 2000)
+    acct2 = _open_account(client, tok2, 1000)
+
+    body = {"sender_account": acct1, "receiver_account": acct2, "amount": 700}
+    headers = {**_headers(tok1), "Idempotency-Key": "pay-42"}
+    first = client.post("/transfer", headers=headers, json=body)
+    again = client.post("/transfer", headers=headers, json=body)
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers.get("Idempotent-Replayed") == "true"
+
+    balances = {a["account_number"]: a["balance"] for a in client.get("/accounts/me", headers=_headers(tok1)).json()}
+    assert balances[acct1] == 1300
+
+    reused = client.post("/transfer", headers=headers, json={**body, "amount": 1})
+    assert reused.status_code == 422
+
+    # same key, different user: independent
+    other = client.post("/transfer", headers={**_headers(tok2), "Idempotency-Key": "pay-42"},
+                        json={"sender_account": acct2, "receiver_account": acct1, "amount": 1})
+    assert other.status_code == 200 and "Idempotent-Replayed" not in other.headers
+
+    acct_headers = {**_headers(tok1), "Idempotency-Key": "open-current"}
+    c1 = client.post("/accounts/create", headers=acct_headers, json={"account_type": "current", "initial_deposit": 5000})
+    c2 = client.post("/accounts/create", headers=acct_headers, json={"account_type": "current", "initial_deposit": 5000})
+    assert c1.status_code == c2.status_code == 200
+    assert c1.json()["account_number"] == c2.json()["account_number"]
+
+def test_account_creation_losing_an_idempotency_race_replays_the_winner(client: TestClient, db, monkeypatch):
+    from app import idempotency
+    from app.models import Account, User
+    from app.routers.accounts import AccountCreateRequest
+
+    _register(client, "idemrace@test.com", "Test@123", "Race")
+    tok = _login(client, "idemrace@test.com", "Test@123")
+    _open_account(client, tok, 1000)
+    user_id = db.query(User.id).filter_by(email="idemrace@test.com").scalar()
+
+    # the winning resend committed its outcome after this request's replay() check found nothing
+    body = {"account_type": "current", "initial_deposit": 5000}
+    winner = {"message": "Current account created successfully", "account_number": "2026999999", "balance": 5000}
+    idempotency.remember(db, user_id, "open-race", "create_account", AccountCreateRequest(**body), winner)
+    db.commit()
+    replay, calls = idempotency.replay, []
+    def first_misses(*args, **kwargs):
+        calls.append(args)
+        return None if len(calls) == 1 else replay(*args, **kwargs)
+    monkeypatch.setattr(idempotency, "replay", first_misses)
+
+    r = client.post("/accounts/create", headers={**_headers(tok), "Idempotency-Key": "open-race"}, json=body)
+    assert r.status_code == 200, r.text
+    assert r.json() == winner and r.headers.get("Idempotent-Replayed") == "true"
+    assert db.query(Account).filter_by(user_id=user_id, account_type="current").count() == 0
+
+def test_group_commit_mode_keeps_per_request_outcomes(client: TestClient, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from app import config
+
+    monkeypatch.setattr(config, "TRANSFER_GROUP_COMMIT", True)
+    _register(client, "gc1@test.com", "Test@123", "GC1")
+    _register(client, "gc2@test.com", "Test@123", "GC2")
+    tok1 = _login(client, "gc1@test.com", "Test@123")
+    tok2 = _login(client, "gc2@test.com", "Test@123")
+    acct1 = _open_account(client, tok1, 2000)
+    acct2 = _open_account(client, tok2, 1000)
+
+    def send(amount):
+        return client.post("/transfer", headers=_headers(tok1),
+                           json={"sender_account": acct1, "receiver_account": acct2, "amount": amount})
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        responses = list(pool.map(send, [100] * 30 + [60_000]))
+    codes = [r.status_code for r in responses]
+    assert codes[:30].count(200) == 20
+    assert {r.json()["detail"] for r in responses[:30] if r.status_code != 200} == {"Insufficient funds"}
+    assert codes[30] == 400 and "Maximum per transfer" in responses[30].json()["detail"]
+
+    balances = {a["account_number"]: a["balance"] for a in client.get("/accounts/me", headers=_headers(tok2)).json()}
+    assert balances[acct2] == 3000
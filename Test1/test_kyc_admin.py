@@ -0,0 +1,94 @@
+# tests/test_kyc_admin.py
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from test_flow_transfer import _login, _headers
+from test_kyc_upload import PDF, _kyc, _upload
+
+def _admin(client: TestClient) -> str:
+    client.post("/auth/create-admin", json={"email": "kycadmin@test.com", "password": "Admin@123"})
+    return _login(client, "kycadmin@test.com", "Admin@123")
+
+def test_pending_queue_pages_by_cursor_with_users_and_documents_in_constant_queries(client: TestClient, tmp_path, monkeypatch):
+    from app import config
+    from conftest import engine
+
+    monkeypatch.setattr(config, "KYC_STORAGE_DIR", str(tmp_path))
+    admin = _admin(client)
+    mine = []
+    for i in range(5):
+        tok, kyc_id = _kyc(client, f"queue{i}@test.com")
+        assert _upload(client, tok, kyc_id, "pan.pdf", PDF).status_code == 200
+        mine.append(kyc_id)
+
+    def queries(limit):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            page = client.get("/kyc/admin/pending", headers=_headers(admin), params={"limit": limit}).json()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return page, len(statements)
+
+    queries(1)  # warm the principal cache so both counts below cover the same work
+    small, small_queries = queries(2)
+    large, large_queries = queries(5)
+    assert small["count"] == 2 and small["next_cursor"]
+    assert large["count"] == 5 and all(k["documents"] for k in large["data"] if k["id"] in mine)
+    assert small_queries == large_queries  # no per-row lazy loads
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/kyc/admin/pending", headers=_headers(admin), params=params).json()
+        seen += page["data"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    ids = [k["id"] for k in seen]
+    assert ids == sorted(set(ids)) and set(mine) <= set(ids)
+    item = next(k for k in seen if k["id"] == mine[0])
+    assert item["user"]["email"] == "queue0@test.com"
+    assert [d["document_type"] for d in item["documents"]] == ["pan"]
+
+    assert client.get("/kyc/admin/pending", headers=_headers(admin), params={"cursor": "junk"}).status_code == 400
+    tok = _login(client, "queue0@test.com", "Test@123")
+    assert client.get("/kyc/admin/pending", headers=_headers(tok)).status_code == 403
+
+def test_batch_verify_decides_many_applications_in_one_commit(client: TestClient, db):
+    from app.counters import compute_bank_stats, reconcile_bank_stats
+    from app.models import Account, LedgerEntry
+
+    reconcile_bank_stats(db, fix=True)
+    admin = _admin(client)
+    kycs = [_kyc(client, f"batchkyc{i}@test.com")[1] for i in range(3)]
+
+    r = client.put("/kyc/admin/verify-batch", headers=_headers(admin), json={"decisions": [
+        {"kyc_id": kycs[0], "decision": "approved"},
+        {"kyc_id": kycs[1], "decision": "approved"},
+        {"kyc_id": kycs[2], "decision": "rejected"},
+        {"kyc_id": kycs[0], "decision": "rejected"},
+        {"kyc_id": 999999, "decision": "approved"},
+    ]})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["succeeded"], body["failed"], body["accounts_created"]) == (3, 2, 2)
+    assert [x["status"] for x in body["results"]] == ["success"] * 3 + ["failed"] * 2
+
+    numbers = [x["account_number"] for x in body["results"][:2]]
+    assert len(set(numbers)) == 2
+    db.expire_all()
+    for number in numbers:
+        assert db.query(Account).filter_by(account_number=number).one().account_type == "savings"
+        assert db.query(LedgerEntry).filter_by(account_number=number).count() == 1
+    summary = client.get("/dashboard/admin/summary", headers=_headers(admin)).json()["data"]
+    assert summary["kyc_approved"] == compute_bank_stats(db)["kyc_approved"]
+    assert summary["total_accounts"] == compute_bank_stats(db)["total_accounts"]
+
+    # approving again does not open a second account
+    again = client.put("/kyc/admin/verify-batch", headers=_headers(admin),
+                       json={"decisions": [{"kyc_id": kycs[0], "decision": "approved"}]}).json()
+    assert again["accounts_created"] == 0
+    assert client.put("/kyc/admin/verify-batch", headers=_headers(admin),
+                      json={"decisions": [{"kyc_id": kycs[2], "decision": "maybe"}]}).status_code == 422
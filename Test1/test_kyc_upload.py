@@ -0,0 +1,103 @@
+# tests/test_kyc_upload.py
+import hashlib
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import config
+from app.middleware import BodySizeLimitMiddleware
+from test_flow_transfer import _register, _login, _headers
+
+PDF = b"%PDF-1.4\n" + b"x" * 200_000
+
+def _kyc(client: TestClient, email: str):
+    _register(client, email, "Test@123", "Doc")
+    tok = _login(client, email, "Test@123")
+    return tok, client.post("/kyc/apply", headers=_headers(tok)).json()["kyc_id"]
+
+def _upload(client, tok, kyc_id, name, data, document_type="pan"):
+    return client.post(f"/kyc/{kyc_id}/upload", headers=_headers(tok), params={"document_type": document_type},
+                       files={"file": (name, data, "application/octet-stream")})
+
+def test_upload_streams_into_the_blob_store_and_checks_type_and_size(client: TestClient, tmp_path, monkeypatch):
+    from app import storage
+
+    monkeypatch.setattr(config, "KYC_STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "UPLOAD_CHUNK_BYTES", 4096)
+    tok, kyc_id = _kyc(client, "doc1@test.com")
+
+    r = _upload(client, tok, kyc_id, "../../etc/pan.pdf", PDF)
+    assert r.status_code == 200, r.text
+    stored = [os.path.join(d, f) for d, _, files in os.walk(tmp_path) for f in files]
+    assert stored == [storage.blob_path(hashlib.sha256(PDF).hexdigest())]
+    with open(stored[0], "rb") as fh:
+        assert fh.read() == PDF
+
+    assert _upload(client, tok, kyc_id, "photo.png", PDF, "selfie").status_code == 415  # bytes are a PDF
+    assert _upload(client, tok, kyc_id, "script.exe", b"MZ...", "selfie").status_code == 415
+    monkeypatch.setattr(config, "KYC_MAX_UPLOAD_BYTES", 100_000)
+    assert _upload(client, tok, kyc_id, "big.pdf", PDF, "aadhaar").status_code == 413
+    # nothing partial or rejected is left on disk
+    assert [f for _, _, files in os.walk(tmp_path) for f in files] == [os.path.basename(stored[0])]
+
+def test_identical_documents_share_one_blob_and_gc_drops_unreferenced_ones(client: TestClient, db, tmp_path, monkeypatch):
+    from app import storage
+    from app.models import KYCBlob, KYCDocument
+
+    monkeypatch.setattr(config, "KYC_STORAGE_DIR", str(tmp_path))
+    tok1, kyc1 = _kyc(client, "blob1@test.com")
+    tok2, kyc2 = _kyc(client, "blob2@test.com")
+    scan = b"%PDF-1.7\nsame scan"
+    sha = hashlib.sha256(scan).hexdigest()
+
+    assert _upload(client, tok1, kyc1, "aadhaar.pdf", scan, "aadhaar").status_code == 200
+    assert _upload(client, tok2, kyc2, "my-id.pdf", scan, "aadhaar").status_code == 200
+    assert db.get(KYCBlob, sha).refcount == 2
+    assert len([f for _, _, files in os.walk(tmp_path) for f in files]) == 1
+
+    # re-uploading a document type replaces the previous one instead of adding a row
+    newer = b"%PDF-1.7\nrescanned"
+    assert _upload(client, tok2, kyc2, "my-id.pdf", newer, "aadhaar").status_code == 200
+    assert db.query(KYCDocument).filter(KYCDocument.kyc_id == kyc2).count() == 1
+    db.expire_all()
+    assert db.get(KYCBlob, sha).refcount == 1
+
+    # only unreferenced content goes, and only after the grace period
+    _upload(client, tok1, kyc1, "aadhaar.pdf", newer, "aadhaar")
+    assert storage.gc(db)["removed_blobs"] == 0
+    summary = storage.gc(db, grace_seconds=-1)
+    assert summary["removed_blobs"] >= 1 and not os.path.exists(storage.blob_path(sha))
+    assert db.get(KYCBlob, sha) is None
+    assert os.path.exists(storage.blob_path(hashlib.sha256(newer).hexdigest()))
+
+def test_legacy_documents_move_into_the_store(db, tmp_path, monkeypatch):
+    from app import storage
+    from app.models import KYCDocument
+
+    monkeypatch.setattr(config, "KYC_STORAGE_DIR", str(tmp_path))
+    legacy = tmp_path / "7" / "pan" / "pan card.pdf"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"%PDF-1.3\nlegacy")
+    doc = KYCDocument(kyc_id=None, document_type="pan", file_path=str(legacy))
+    db.add(doc)
+    db.commit()
+
+    assert storage.migrate_legacy(db)["moved"] >= 1
+    db.refresh(doc)
+    assert doc.file_path == storage.blob_path(doc.blob_sha256)
+    assert open(doc.file_path, "rb").read() == b"%PDF-1.3\nlegacy"
+    storage.gc(db, grace_seconds=-1)
+    assert not legacy.exists() and os.path.exists(doc.file_path)
+
+def test_body_limit_rejects_declared_and_streamed_oversized_bodies():
+    app = FastAPI()
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+    client = TestClient(BodySizeLimitMiddleware(app, default_limit=1000))
+
+    assert client.post("/echo", content=b"a" * 1000).json() == {"size": 1000}
+    assert client.post("/echo", content=b"a" * 1001).status_code == 413
+    chunks = (b"a" * 300 for _ in range(5))  # no Content-Length: counted as it arrives
+    assert client.post("/echo", content=chunks).status_code == 413
@@ -0,0 +1,86 @@
+# tests/test_migrations.py
+from sqlalchemy import create_engine, inspect
+
+from app import migrations, models
+
+def test_upgrade_adds_indexes_to_existing_table_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # pre-migration database: transactions table without the composite indexes
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for index in models.Transaction.__table__.indexes:
+            if index.name in ("ix_transactions_sender_ts", "ix_transactions_receiver_ts", "ix_transactions_ts_id"):
+                index.drop(bind=conn)
+
+    assert migrations.upgrade(engine) == [v for v, _, _ in migrations.MIGRATIONS]
+    names = {ix["name"] for ix in inspect(engine).get_indexes("transactions")}
+    assert {"ix_transactions_sender_ts", "ix_transactions_receiver_ts", "ix_transactions_ts_id"} <= names
+
+    # already applied: nothing to do
+    assert migrations.upgrade(engine) == []
+    engine.dispose()
+
+def test_tuned_sqlite_profile_sets_wal_and_pragmas_on_every_connection(tmp_path):
+    from sqlalchemy import text
+    from app.database import make_engine
+
+    def pragmas(engine):
+        with engine.connect() as conn:
+            return {name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                    for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size")}
+
+    tuned = make_engine(f"sqlite:///{tmp_path / 'tuned.db'}", profile="tuned")
+    assert pragmas(tuned) == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "cache_size": -65536}
+    assert tuned.pool.size() == 10
+    tuned.dispose()
+
+    stock = make_engine(f"sqlite:///{tmp_path / 'stock.db'}", profile="default")
+    assert pragmas(stock)["journal_mode"] == "delete"
+    stock.dispose()
+
+def test_schema_compiles_for_mysql_with_lengths_and_microsecond_timestamps():
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy.schema import CreateTable
+
+    dialect = mysql.dialect()
+    ddl = {t.name: str(CreateTable(t).compile(dialect=dialect)) for t in models.Base.metadata.sorted_tables}
+    assert all("VARCHAR," not in sql and "VARCHAR\n" not in sql for sql in ddl.values())
+    assert "timestamp DATETIME(6)" in ddl["transactions"]
+    assert "account_number VARCHAR(20)" in ddl["ledger_entries"]
+
+def test_upgrade_counts_debits_made_before_the_counters_existed(tmp_path):
+    from datetime import datetime
+    from sqlalchemy.orm import Session
+    from app.counters import todays_debits
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        for i, amount in enumerate((1500, 500)):
+            db.add(models.Transaction(reference_id=f"OLD{i}", sender_account="1001", receiver_account="1002",
+                                      amount=amount, status="success", timestamp=datetime.utcnow()))
+        db.commit()
+
+    migrations.upgrade(engine)
+    with Session(bind=engine) as db:
+        assert todays_debits(db, "1001") == 2000
+        assert todays_debits(db, "1002") == 0
+    engine.dispose()
+
+def test_concurrent_upgrades_of_an_old_database_migrate_once(tmp_path):
+    import os
+    import shutil
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copy(os.path.join(root, "corebank.db"), tmp_path / "old.db")  # baseline schema, nothing applied
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    script = "from app import migrations; from app.database import make_engine; print(migrations.upgrade(make_engine(%r)))" % url
+    env = {**os.environ, "PYTHONPATH": root, "KYC_STORAGE_DIR": str(tmp_path / "kyc")}
+    procs = [subprocess.Popen([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(4)]
+    results = [p.communicate(timeout=120) + (p.returncode,) for p in procs]
+    assert all(code == 0 for _, _, code in results), [err for _, err, _ in results]
+    runs = sorted((out.strip() for out, _, _ in results), key=len)
+    assert runs == ["[]"] * 3 + [str([v for v, _, _ in migrations.MIGRATIONS])]
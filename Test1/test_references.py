@@ -0,0 +1,72 @@
+# tests/test_references.py
+from concurrent.futures import ThreadPoolExecutor
+
+from app import snowflake
+from app.utils import generate_transaction_reference
+
+def test_snowflake_ids_are_unique_and_ordered_across_threads():
+    gen = snowflake.SnowflakeGenerator(worker_id=7)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        chunks = list(pool.map(lambda _: [gen.next_id() for _ in range(5000)], range(8)))
+    ids = [i for chunk in chunks for i in chunk]
+    assert len(set(ids)) == len(ids)
+    assert all(a < b for chunk in chunks for a, b in zip(chunk, chunk[1:]))
+    assert {(i >> snowflake.SEQUENCE_BITS) & (snowflake.MAX_WORKERS - 1) for i in ids} == {7}
+
+def test_different_workers_never_collide_in_the_same_millisecond():
+    a, b = snowflake.SnowflakeGenerator(1), snowflake.SnowflakeGenerator(2)
+    ids_a = {a.next_id() for _ in range(10_000)}
+    ids_b = {b.next_id() for _ in range(10_000)}
+    assert not ids_a & ids_b
+
+def test_transaction_reference_format_sorts_by_time():
+    refs = [generate_transaction_reference() for _ in range(1000)]
+    assert all(r.startswith("TXN") and len(r) == 3 + snowflake.ID_DIGITS for r in refs)
+    assert refs == sorted(refs)
+
+def test_account_number_blocks_do_not_overlap_between_processes(db):
+    from app.sequences import BlockSequence
+
+    # two allocators on the same database stand in for two uvicorn workers
+    seed = lambda conn: 1
+    worker_a = BlockSequence("test_blocks", 10, seed)
+    worker_b = BlockSequence("test_blocks", 10, seed)
+    issued = [w.next_value(db) for _ in range(25) for w in (worker_a, worker_b)]
+    assert len(set(issued)) == len(issued) == 50
+
+    # a restarted worker starts after every block reserved so far
+    restarted = BlockSequence("test_blocks", 10, seed)
+    assert restarted.next_value(db) > max(issued)
+
+def test_concurrent_account_openings_on_the_async_path_each_reserve_without_deadlock(client, monkeypatch):
+    import asyncio, threading
+    import httpx
+    from app import config, sequences
+    from app.main import app
+    from test_flow_transfer import _register, _login, _headers, _approve_kyc_direct
+
+    monkeypatch.setattr(config, "DB_ASYNC", True)
+    tokens = []
+    for n in (1, 2):
+        _register(client, f"seq{n}@test.com", "Test@123", f"Seq{n}")
+        tokens.append(_login(client, f"seq{n}@test.com", "Test@123"))
+        client.post("/kyc/apply", headers=_headers(tokens[-1]))
+    _approve_kyc_direct(client)
+    sequences.account_numbers.reset()  # both requests need a new block
+
+    results = []
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            results.extend(await asyncio.gather(*[
+                ac.post("/accounts/create", headers=_headers(tok), json={"account_type": "savings", "initial_deposit": 1000})
+                for tok in tokens
+            ]))
+
+    runner = threading.Thread(target=asyncio.run, args=(scenario(),), daemon=True)
+    runner.start()
+    runner.join(timeout=30)
+    assert not runner.is_alive(), "account creation deadlocked"
+    assert [r.status_code for r in results] == [200, 200], [r.text for r in results]
+    numbers = {r.json()["account_number"] for r in results}
+    assert len(numbers) == 2
@@ -7,3 +7,152 @@ def test_hash_verify_roundtrip():
     assert h != raw
     assert verify_password(raw, h)
     assert not verify_password("Wrong@123", h)
+
+def test_principal_cache_serves_repeat_requests_and_drops_changed_users(client, db):
+    from sqlalchemy import event
+    from app import principals
+    from app.models import User
+
+    client.post("/auth/register", json={"email": "pc@test.com", "password": "Test@123", "full_name": "PC"})
+    tok = client.post("/auth/login", data={"username": "pc@test.com", "password": "Test@123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {tok}"}
+
+    from conftest import async_engine
+
+    user_lookups = []
+    engines = [db.get_bind()] + ([async_engine.sync_engine] if async_engine else [])  # sync routes and async routes
+    def count(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            user_lookups.append(statement)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        principals.cache.invalidate("pc@test.com")
+        for _ in range(3):
+            assert client.get("/transactions/all", headers=headers).status_code == 403
+        assert len(user_lookups) == 1
+
+        # promoting the user through the ORM evicts the cached principal
+        user = db.query(User).filter(User.email == "pc@test.com").first()
+        user.role = "admin"
+        db.commit()
+        user_lookups.clear()
+        assert client.get("/transactions/all", headers=headers).status_code == 200
+        assert len(user_lookups) == 1
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+
+def test_token_with_embedded_principal_needs_no_user_lookup(client, monkeypatch):
+    from jose import jwt
+    from app import config, principals
+    from app.security import SECRET_KEY, ALGORITHM
+
+    monkeypatch.setattr(config, "TOKEN_EMBED_PRINCIPAL", True)
+    monkeypatch.setattr(config, "PRINCIPAL_CACHE_ENABLED", False)
+    client.post("/auth/register", json={"email": "claims@test.com", "password": "Test@123", "full_name": "Claims"})
+    tok = client.post("/auth/login", data={"username": "claims@test.com", "password": "Test@123"}).json()["access_token"]
+    claims = jwt.decode(tok, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["role"] == "customer" and claims["uid"]
+
+    r = client.get("/kyc/status", headers={"Authorization": f"Bearer {tok}"})
+    assert r.status_code == 404  # resolved from the token; no KYC yet
+    assert principals.cache.get("claims@test.com") is None
+
+def test_login_rehashes_password_made_with_old_cost(client, db):
+    from passlib.context import CryptContext
+    from app.models import User
+    from app.security import pwd_context
+
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("Old@1234")
+    db.add(User(email="rehash@test.com", full_name="Rehash", password=cheap))
+    db.commit()
+
+    r = client.post("/auth/login", data={"username": "rehash@test.com", "password": "Old@1234"})
+    assert r.status_code == 200, r.text
+    db.expire_all()
+    stored = db.query(User).filter(User.email == "rehash@test.com").first().password
+    assert stored != cheap and not pwd_context.needs_update(stored)
+    assert verify_password("Old@1234", stored)
+
+def test_hash_executor_rejects_when_saturated():
+    import asyncio, threading
+    import pytest
+    from fastapi import HTTPException
+    from app.security import HashExecutor
+
+    executor = HashExecutor(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(hash_password, "x")
+        assert exc.value.status_code == 503
+        release.set()
+        await busy
+        assert await executor.run(lambda: "ok") == "ok"  # slot freed again
+
+    asyncio.run(scenario())
+
+def test_login_locks_out_identity_after_repeated_failures(client):
+    from app import config
+
+    client.post("/auth/register", json={"email": "stuffed@test.com", "password": "Right@123", "full_name": "S"})
+    for _ in range(config.LOGIN_MAX_FAILURES):
+        r = client.post("/auth/login", data={"username": "stuffed@test.com", "password": "wrong"})
+        assert r.status_code == 401
+    r = client.post("/auth/login", data={"username": "stuffed@test.com", "password": "Right@123"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+def test_throttle_backoff_doubles_and_is_shared_through_sqlite_store(tmp_path, monkeypatch):
+    from app import config, throttle
+
+    monkeypatch.setattr(config, "LOGIN_MAX_FAILURES", 2)
+    clock = [1000.0]
+    monkeypatch.setattr(throttle.time, "time", lambda: clock[0])
+
+    path = str(tmp_path / "throttle.db")
+    worker_a = throttle.LoginThrottle(throttle.SQLiteStore(path))
+    worker_b = throttle.LoginThrottle(throttle.SQLiteStore(path))
+
+    worker_a.record_failure("victim@test.com", "10.0.0.1")
+    assert worker_b.retry_after("victim@test.com", None) == 0
+    worker_b.record_failure("victim@test.com", "10.0.0.2")
+    assert worker_a.retry_after("victim@test.com", None) == config.LOGIN_LOCKOUT_BASE_SECONDS
+    worker_a.record_failure("victim@test.com", "10.0.0.1")
+    assert worker_b.retry_after("Victim@test.com", None) == 2 * config.LOGIN_LOCKOUT_BASE_SECONDS
+
+    worker_b.record_success("victim@test.com", "10.0.0.2")
+    assert worker_a.retry_after("victim@test.com", None) == 0
+
+def test_login_waiting_on_a_locked_shared_throttle_store_does_not_stall_other_requests(tmp_path, monkeypatch):
+    import asyncio, sqlite3, threading, time
+    import httpx
+    from app import throttle
+    from app.main import app
+    from app.routers import auth
+
+    path = str(tmp_path / "throttle.db")
+    monkeypatch.setattr(auth, "login_throttle", throttle.LoginThrottle(throttle.SQLiteStore(path)))
+    other_worker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other_worker.execute("BEGIN IMMEDIATE")  # holds the write lock record_failure needs
+    threading.Timer(1.5, other_worker.rollback).start()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as ac:
+            async def quick():
+                started = time.perf_counter()
+                await asyncio.sleep(0.3)  # the login is waiting on the lock by now
+                r = await ac.get("/auth/me", headers={"Authorization": "Bearer t"})
+                return r.status_code, time.perf_counter() - started
+            return await asyncio.gather(
+                ac.post("/auth/login", data={"username": "nobody@test.com", "password": "Wrong@123"}), quick()
+            )
+
+    login, (status, elapsed) = asyncio.run(scenario())
+    other_worker.close()
+    assert login.status_code == 401
+    assert status == 200 and elapsed < 1.0  # the lock is only released after 1.5 s
@@ -0,0 +1,147 @@
+# tests/test_transactions.py
+from fastapi.testclient import TestClient
+
+from test_flow_transfer import _register, _login, _headers, _open_account
+
+def _setup_pair(client: TestClient, prefix: str):
+    _register(client, f"{prefix}1@test.com", "Test@123", prefix)
+    _register(client, f"{prefix}2@test.com", "Test@123", prefix)
+    tok1 = _login(client, f"{prefix}1@test.com", "Test@123")
+    tok2 = _login(client, f"{prefix}2@test.com", "Test@123")
+    return tok1, _open_account(client, tok1, 10_000), tok2, _open_account(client, tok2, 10_000)
+
+def _send(client, tok, sender, receiver, amount):
+    r = client.post("/transfer", headers=_headers(tok),
+                    json={"sender_account": sender, "receiver_account": receiver, "amount": amount})
+    assert r.status_code == 200, r.text
+    return r.json()["reference_id"]
+
+def test_my_transactions_keyset_pages_and_filters(client: TestClient):
+    tok1, acct1, tok2, acct2 = _setup_pair(client, "pg")
+    sent = [_send(client, tok1, acct1, acct2, 100 + i) for i in range(5)]
+    received = [_send(client, tok2, acct2, acct1, 200 + i) for i in range(2)]
+
+    refs, cursor = [], None
+    while True:
+        r = client.get("/transactions/me", headers=_headers(tok1), params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert len(page["data"]) <= 3
+        refs += [t["reference_id"] for t in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert refs == list(reversed(sent + received))
+
+    out = client.get("/transactions/me", headers=_headers(tok1), params={"direction": "out"}).json()["data"]
+    assert [t["reference_id"] for t in out] == list(reversed(sent))
+
+    big_in = client.get("/transactions/me", headers=_headers(tok1),
+                        params={"direction": "in", "counterparty": acct2, "min_amount": 201}).json()["data"]
+    assert [t["reference_id"] for t in big_in] == [received[1]]
+
+    r = client.get("/transactions/me", headers=_headers(tok1), params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+def test_history_bounds_with_an_offset_are_read_as_utc(client: TestClient):
+    from datetime import datetime, timedelta, timezone
+    tok1, acct1, tok2, acct2 = _setup_pair(client, "tz")
+    _send(client, tok1, acct1, acct2, 10)
+    cut = datetime.utcnow()
+    later = _send(client, tok1, acct1, acct2, 20)
+
+    ist = cut.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5, minutes=30)))
+    r = client.get("/transactions/me", headers=_headers(tok1), params={"start": ist.isoformat(), "direction": "out"})
+    assert r.status_code == 200, r.text
+    assert [t["reference_id"] for t in r.json()["data"]] == [later]
+    r = client.get("/transactions/me", headers=_headers(tok1), params={"end": ist.isoformat(), "direction": "out"})
+    assert [t["amount"] for t in r.json()["data"]] == [10]
+
+def test_export_streams_ndjson_and_gzipped_csv(client: TestClient):
+    import csv, io, json
+    from datetime import datetime, timedelta, timezone
+    tok1, acct1, tok2, acct2 = _setup_pair(client, "ex")
+    refs = [_send(client, tok1, acct1, acct2, 10 + i) for i in range(2)]
+    cut = datetime.utcnow()
+    refs.append(_send(client, tok1, acct1, acct2, 12))
+
+    r = client.get("/transactions/export", headers=_headers(tok1))
+    assert r.status_code == 403
+
+    client.post("/auth/create-admin", json={"email": "auditadmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "auditadmin@test.com", "Admin@123")
+
+    r = client.get("/transactions/export", headers=_headers(admin), params={"account": acct1})
+    assert r.status_code == 200, r.text
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [x["reference_id"] for x in lines] == refs
+
+    r = client.get("/transactions/export", headers={**_headers(admin), "Accept-Encoding": "gzip"},
+                   params={"account": acct1, "format": "csv"})
+    assert r.headers["content-encoding"] == "gzip"
+    rows = list(csv.DictReader(io.StringIO(r.text)))  # httpx already gunzipped the body
+    assert [x["reference_id"] for x in rows] == refs
+
+    # an offset-aware bound is the same instant in UTC
+    ist = cut.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5, minutes=30)))
+    r = client.get("/transactions/export", headers=_headers(admin), params={"account": acct1, "start": ist.isoformat()})
+    assert [json.loads(line)["reference_id"] for line in r.text.splitlines()] == refs[2:]
+
+def test_ledger_running_balances_answer_balance_as_of_and_survive_rebuild(client: TestClient, db):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select
+    from app import ledger
+
+    tok1, acct1, tok2, acct2 = _setup_pair(client, "lg")
+    _send(client, tok1, acct1, acct2, 300)
+    mid = datetime.utcnow()
+    _send(client, tok2, acct2, acct1, 1_000)
+    r = client.post("/transfer/batch", headers=_headers(tok1), json={"transfers": [
+        {"sender_account": acct1, "receiver_account": acct2, "amount": 50},
+        {"sender_account": acct1, "receiver_account": acct2, "amount": 70},
+    ]})
+    assert r.json()["succeeded"] == 2
+
+    legs = db.execute(
+        select(ledger.ent.amount, ledger.ent.balance)
+        .where(ledger.ent.account_number == acct1).order_by(ledger.ent.id)
+    ).all()
+    assert [tuple(x) for x in legs] == [(10_000, 10_000), (-300, 9_700), (1_000, 10_700), (-50, 10_650), (-70, 10_580)]
+
+    r = client.get(f"/accounts/{acct1}/balance", headers=_headers(tok1), params={"as_of": mid.isoformat()})
+    assert r.status_code == 200, r.text
+    assert r.json()["balance"] == 9_700
+    ist = mid.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5, minutes=30)))
+    r = client.get(f"/accounts/{acct1}/balance", headers=_headers(tok1), params={"as_of": ist.isoformat()})
+    assert r.json()["balance"] == 9_700  # the same instant with an offset
+    assert client.get(f"/accounts/{acct1}/balance", headers=_headers(tok1)).json()["balance"] == 10_580
+    assert client.get(f"/accounts/{acct1}/balance", headers=_headers(tok2)).status_code == 404
+
+    def transfer_legs():
+        return sorted(tuple(x) for x in db.execute(
+            select(ledger.ent.account_number, ledger.ent.transaction_id, ledger.ent.amount, ledger.ent.balance)
+            .where(ledger.ent.transaction_id.isnot(None))
+        ).all())
+    before = transfer_legs()
+    ledger.rebuild_ledger(db)
+    assert transfer_legs() == before
+
+def test_hot_routes_behave_the_same_on_the_threadpool_path(client: TestClient, monkeypatch):
+    import json
+    from app import config
+
+    monkeypatch.setattr(config, "DB_ASYNC", False)
+    tok1, acct1, tok2, acct2 = _setup_pair(client, "th")
+    refs = [_send(client, tok1, acct1, acct2, 30 + i) for i in range(2)]
+
+    page = client.get("/transactions/me", headers=_headers(tok1)).json()
+    assert [t["reference_id"] for t in page["data"]] == list(reversed(refs))
+    balance = client.get(f"/accounts/{acct2}/balance", headers=_headers(tok2)).json()["balance"]
+    assert balance == 10_000 + 30 + 31
+    summary = client.get("/dashboard/customer/summary", headers=_headers(tok2)).json()["data"]
+    assert summary["total_balance"] == balance
+
+    client.post("/auth/create-admin", json={"email": "auditadmin@test.com", "password": "Admin@123"})
+    admin = _login(client, "auditadmin@test.com", "Admin@123")
+    r = client.get("/transactions/export", headers=_headers(admin), params={"account": acct1})
+    assert [json.loads(line)["reference_id"] for line in r.text.splitlines()] == refs
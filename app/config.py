@@ -0,0 +1,87 @@
+"""Runtime settings, read once from environment variables at import time."""
+import os
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+# Database connection; the SQLite profile and pragmas only apply to sqlite:// URLs
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./corebank.db")
+DB_POOL_SIZE = _int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT_SECONDS = _int("DB_POOL_TIMEOUT_SECONDS", 30)
+# Server databases (MySQL): check connections on checkout, replace them before the server's wait_timeout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE_SECONDS = _int("DB_POOL_RECYCLE_SECONDS", 30 * 60)
+DB_ISOLATION_LEVEL = os.getenv("DB_ISOLATION_LEVEL", "READ COMMITTED")  # MySQL only; transfers lock rows explicitly
+# Async request path for the hot routers (aiosqlite, or aiomysql for MySQL; threadpool if it is missing); 0 = threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "1").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")  # default: DATABASE_URL with the async driver
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")  # "tuned" (WAL + pragmas below) or "default"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable across app crashes in WAL mode
+SQLITE_CACHE_SIZE_KIB = _int("SQLITE_CACHE_SIZE_KIB", 64 * 1024)
+SQLITE_MMAP_SIZE_BYTES = _int("SQLITE_MMAP_SIZE_BYTES", 256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _int("SQLITE_BUSY_TIMEOUT_MS", 5_000)
+# Apply pending migrations when the app starts (workers take turns); 0 = run `python -m app.maintenance migrate` on deploy
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+# Read replica for the dashboard, account and history reads; empty = they use the primary
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+REPLICA_HEARTBEAT_SECONDS = _int("REPLICA_HEARTBEAT_SECONDS", 1)
+REPLICA_SYNC_SECONDS = _int("REPLICA_SYNC_SECONDS", 2)            # SQLite stand-in: copy the primary this often; 0 = never
+REPLICA_MAX_LAG_SECONDS = _int("REPLICA_MAX_LAG_SECONDS", 5)      # reads fall back to the primary beyond this
+READ_YOUR_WRITES_SECONDS = _int("READ_YOUR_WRITES_SECONDS", 10)   # keep >= REPLICA_MAX_LAG_SECONDS
+
+# Idempotency-Key replay store
+IDEMPOTENCY_TTL_SECONDS = _int("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60)
+IDEMPOTENCY_MAX_KEYS = _int("IDEMPOTENCY_MAX_KEYS", 100_000)
+IDEMPOTENCY_PURGE_EVERY = _int("IDEMPOTENCY_PURGE_EVERY", 1_000)
+
+# Account numbers are reserved from the sequences table this many at a time per process
+ACCOUNT_NUMBER_BLOCK_SIZE = _int("ACCOUNT_NUMBER_BLOCK_SIZE", 1_000)
+
+# Group commit: funnel transfers through one writer thread that commits them in micro-batches
+TRANSFER_GROUP_COMMIT = os.getenv("TRANSFER_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_BATCH = _int("GROUP_COMMIT_MAX_BATCH", 64)
+GROUP_COMMIT_MAX_WAIT_MS = _int("GROUP_COMMIT_MAX_WAIT_MS", 2)
+
+# Resolved-principal cache for get_current_user
+PRINCIPAL_CACHE_ENABLED = os.getenv("PRINCIPAL_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+PRINCIPAL_CACHE_SIZE = _int("PRINCIPAL_CACHE_SIZE", 10_000)
+PRINCIPAL_CACHE_TTL_SECONDS = _int("PRINCIPAL_CACHE_TTL_SECONDS", 60)
+# Put user id, role and name into access tokens so most requests resolve the user with no query.
+# Trade-off: a role change only reaches such tokens when they expire.
+TOKEN_EMBED_PRINCIPAL = os.getenv("TOKEN_EMBED_PRINCIPAL", "0").lower() in ("1", "true", "yes")
+
+# Password hashing: bcrypt cost and the dedicated executor it runs on
+BCRYPT_ROUNDS = _int("BCRYPT_ROUNDS", 12)
+HASH_WORKERS = _int("HASH_WORKERS", os.cpu_count() or 2)
+HASH_MAX_PENDING = _int("HASH_MAX_PENDING", 4 * (os.cpu_count() or 2))  # queued + running
+
+# Login throttling (per username and per client IP), checked before the user lookup and bcrypt
+LOGIN_THROTTLE_ENABLED = os.getenv("LOGIN_THROTTLE_ENABLED", "1").lower() in ("1", "true", "yes")
+LOGIN_THROTTLE_STORE = os.getenv("LOGIN_THROTTLE_STORE", "")  # SQLite file shared by workers; empty = per-process memory
+LOGIN_MAX_FAILURES = _int("LOGIN_MAX_FAILURES", 5)
+LOGIN_MAX_FAILURES_PER_IP = _int("LOGIN_MAX_FAILURES_PER_IP", 50)
+LOGIN_FAILURE_WINDOW_SECONDS = _int("LOGIN_FAILURE_WINDOW_SECONDS", 15 * 60)
+LOGIN_LOCKOUT_BASE_SECONDS = _int("LOGIN_LOCKOUT_BASE_SECONDS", 1)
+LOGIN_LOCKOUT_MAX_SECONDS = _int("LOGIN_LOCKOUT_MAX_SECONDS", 15 * 60)
+LOGIN_THROTTLE_MAX_KEYS = _int("LOGIN_THROTTLE_MAX_KEYS", 100_000)
+
+# Per-user response cache (with ETag / 304) for the dashboard, account and KYC status reads
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = _int("RESPONSE_CACHE_SIZE", 10_000)
+RESPONSE_CACHE_TTL_SECONDS = _int("RESPONSE_CACHE_TTL_SECONDS", 30)
+
+# Server-sent events feed for the admin dashboards (in-process pub/sub)
+EVENTS_HISTORY_SIZE = _int("EVENTS_HISTORY_SIZE", 1_000)       # kept for Last-Event-ID resume
+EVENTS_SUBSCRIBER_BUFFER = _int("EVENTS_SUBSCRIBER_BUFFER", 256)  # undelivered events per client before a reset
+EVENTS_HEARTBEAT_SECONDS = _int("EVENTS_HEARTBEAT_SECONDS", 15)
+
+# Request bodies and KYC document uploads
+REQUEST_MAX_BYTES = _int("REQUEST_MAX_BYTES", 4 * 1024 * 1024)         # any request, checked while receiving
+KYC_MAX_UPLOAD_BYTES = _int("KYC_MAX_UPLOAD_BYTES", 10 * 1024 * 1024)  # one document
+KYC_STORAGE_DIR = os.getenv("KYC_STORAGE_DIR", "storage/kyc")
+UPLOAD_CHUNK_BYTES = _int("UPLOAD_CHUNK_BYTES", 64 * 1024)
+# Unreferenced KYC blobs (and stray files) younger than this are left alone by the GC
+KYC_BLOB_GC_GRACE_SECONDS = _int("KYC_BLOB_GC_GRACE_SECONDS", 60 * 60)
@@ -0,0 +1,169 @@
+from datetime import date, datetime
+from sqlalchemy import false, func, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import Account, BankStats, DailyDebit, KYCApplication, Transaction, User
+
+
+def _upsert_increment(db: Session, model, keys: dict, increments: dict, assign: dict | None = None):
+    """INSERT the row with `increments` (and `assign`) as its values, or add them to the existing row (and set `assign`)."""
+    dialect = db.get_bind().dialect.name
+    assign = assign or {}
+    values = {**keys, **increments, **assign}
+    if dialect == "sqlite":
+        stmt = sqlite.insert(model).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={**{col: getattr(model, col) + getattr(stmt.excluded, col) for col in increments}, **assign},
+        )
+        db.execute(stmt)
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(model).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            {**{col: getattr(model, col) + getattr(stmt.inserted, col) for col in increments}, **assign}
+        )
+        db.execute(stmt)
+    else:
+        conditions = [getattr(model, col) == val for col, val in keys.items()]
+        result = db.execute(
+            update(model).where(*conditions)
+            .values({**{col: getattr(model, col) + val for col, val in increments.items()}, **assign})
+        )
+        if result.rowcount == 0:
+            db.add(model(**values))
+            db.flush()
+
+
+def _insert_ignore(db: Session, model, values: dict):
+    """INSERT the row unless its primary key already exists."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(sqlite.insert(model).values(**values).on_conflict_do_nothing())
+    elif dialect in ("mysql", "mariadb"):
+        db.execute(mysql.insert(model).values(**values).prefix_with("IGNORE"))
+    else:
+        key = tuple(values[col.name] for col in model.__table__.primary_key)
+        if db.get(model, key) is None:
+            db.add(model(**values))
+            db.flush()
+
+
+# ---------- Daily debit counters ----------
+def todays_debits(db: Session, account_number: str, day: date | None = None) -> int:
+    day = day or datetime.utcnow().date()
+    row = db.get(DailyDebit, (account_number, day))
+    return row.total if row else 0
+
+def todays_debits_many(db: Session, account_numbers, day: date | None = None) -> dict:
+    day = day or datetime.utcnow().date()
+    rows = db.query(DailyDebit.account_number, DailyDebit.total).filter(
+        DailyDebit.day == day, DailyDebit.account_number.in_(account_numbers)
+    ).all()
+    return dict(rows)
+
+def try_record_debit(db: Session, account_number: str, amount: int, limit: int, day: date | None = None) -> bool:
+    """Add `amount` to today's counter only if the total stays within `limit`; False if it would not."""
+    day = day or datetime.utcnow().date()
+    stmt = (
+        update(DailyDebit)
+        .where(DailyDebit.account_number == account_number, DailyDebit.day == day, DailyDebit.total + amount <= limit)
+        .values(total=DailyDebit.total + amount)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).rowcount:
+        return True
+    if amount > limit:
+        return False
+    # First debit of the day: make sure the row exists, then retry the conditional update
+    _insert_ignore(db, DailyDebit, {"account_number": account_number, "day": day, "total": 0})
+    return bool(db.execute(stmt).rowcount)
+
+def _debits_from_transactions(db: Session) -> dict:
+    rows = db.query(
+        Transaction.sender_account, func.date(Transaction.timestamp), func.sum(Transaction.amount)
+    ).filter(Transaction.status == "success").group_by(
+        Transaction.sender_account, func.date(Transaction.timestamp)
+    ).all()
+    # SQLite hands DATE() back as text
+    return {
+        (acct, day if isinstance(day, date) else date.fromisoformat(day)): int(total)
+        for acct, day, total in rows
+    }
+
+def _hold_off_transfers(db: Session):
+    # Take what every transfer needs before it writes a counter: its account rows (locked FOR
+    # UPDATE in account-number order, as _load_accounts does) or, on SQLite, the write lock.
+    # Transfers already holding them commit first and are counted; later ones wait for our commit.
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(DailyDebit).where(false()).values(total=DailyDebit.total))
+    else:
+        db.execute(select(Account.id).order_by(Account.account_number).with_for_update()).all()
+
+def rebuild_daily_debits(db: Session, dry_run: bool = False) -> dict:
+    """Recompute every counter from the transactions table; returns the drift that was found.
+
+    Unless dry_run, transfers are held off from the first read to the commit, so none can bump a
+    counter between the recount and the rewrite and lose its debit.
+    """
+    if not dry_run:
+        _hold_off_transfers(db)
+    expected = _debits_from_transactions(db)
+    actual = {(r.account_number, r.day): r.total for r in db.query(DailyDebit).all()}
+    drift = {
+        f"{acct}@{day}": {"counter": actual.get((acct, day), 0), "transactions": expected.get((acct, day), 0)}
+        for acct, day in expected.keys() | actual.keys()
+        if actual.get((acct, day), 0) != expected.get((acct, day), 0)
+    }
+    if not dry_run:
+        db.query(DailyDebit).delete()
+        db.add_all(DailyDebit(account_number=acct, day=day, total=total) for (acct, day), total in expected.items())
+        db.commit()
+    return drift
+
+
+# ---------- Bank-wide stats (admin summary) ----------
+BANK_STATS_ID = 1
+BANK_STATS_FIELDS = ("total_users", "kyc_pending", "kyc_approved", "total_accounts", "total_balance")
+
+def bump_bank_stats(db: Session, **deltas):
+    """Apply deltas (e.g. total_users=1) to the stats row inside the caller's transaction."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        _upsert_increment(db, BankStats, {"id": BANK_STATS_ID}, deltas)
+
+def kyc_status_deltas(old: str | None, new: str) -> dict:
+    """Stats deltas for a KYC application moving from `old` (None = new application) to `new`."""
+    deltas = {"kyc_pending": 0, "kyc_approved": 0}
+    for status, sign in ((old, -1), (new, 1)):
+        if status == "pending":
+            deltas["kyc_pending"] += sign
+        elif status == "approved":
+            deltas["kyc_approved"] += sign
+    return deltas
+
+def read_bank_stats(db: Session) -> dict:
+    row = db.get(BankStats, BANK_STATS_ID)
+    return {field: getattr(row, field) if row else 0 for field in BANK_STATS_FIELDS}
+
+def compute_bank_stats(db: Session) -> dict:
+    return {
+        "total_users": db.query(func.count(User.id)).scalar(),
+        "kyc_pending": db.query(func.count(KYCApplication.id)).filter(KYCApplication.status == "pending").scalar(),
+        "kyc_approved": db.query(func.count(KYCApplication.id)).filter(KYCApplication.status == "approved").scalar(),
+        "total_accounts": db.query(func.count(Account.id)).scalar(),
+        "total_balance": db.query(func.coalesce(func.sum(Account.balance), 0)).scalar(),
+    }
+
+def reconcile_bank_stats(db: Session, fix: bool = False) -> dict:
+    """Recompute the stats from the base tables; returns {field: {"stored", "actual"}} for every mismatch."""
+    actual = compute_bank_stats(db)
+    stored = read_bank_stats(db)
+    drift = {f: {"stored": stored[f], "actual": actual[f]} for f in BANK_STATS_FIELDS if stored[f] != actual[f]}
+    if fix and (drift or db.get(BankStats, BANK_STATS_ID) is None):
+        row = db.get(BankStats, BANK_STATS_ID) or BankStats(id=BANK_STATS_ID)
+        for field, value in actual.items():
+            setattr(row, field, value)
+        db.add(row)
+        db.commit()
+    return drift
@@ -0,0 +1,158 @@
+"""In-process publish/subscribe feeding the admin server-sent events stream (/events/admin).
+
+Write paths call publish_on_commit(); the event goes out only once the session's transaction
+commits, so subscribers never see a transfer or KYC decision that was rolled back. Topics:
+"transactions" (one event per transfer) and "kyc" (applications and decisions).
+
+Event ids are "<epoch>-<n>", where the epoch identifies this process. The last
+EVENTS_HISTORY_SIZE events are kept, so a client reconnecting with Last-Event-ID gets what it
+missed. Each subscriber buffers at most EVENTS_SUBSCRIBER_BUFFER undelivered events. If its id is
+from another process or older than the history, or its buffer overflows, it gets a "reset"
+event: re-read the current state, then continue from the live stream.
+
+Each worker only sees events from its own write paths, so with several workers an admin
+dashboard sees the writes handled by the worker serving its stream.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import config
+
+_PENDING = "events_pending"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    topic: str
+    data: dict
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.topic}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, topics: set, buffer_size: int, loop: asyncio.AbstractEventLoop):
+        self.topics = topics
+        self.buffer_size = buffer_size
+        self.lagged = False
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._wake = asyncio.Event()
+
+    def offer(self, ev: Event):
+        """Queue an event; may be called from any thread."""
+        if ev.topic not in self.topics:
+            return
+        with self._lock:
+            if len(self._pending) >= self.buffer_size:
+                self._pending.clear()
+                self.lagged = True
+            else:
+                self._pending.append(ev)
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # the subscriber's loop is gone; unsubscribe() follows
+
+    async def next(self, timeout: float) -> tuple[bool, list]:
+        """Wait up to `timeout` seconds; returns (lagged, events) and clears both."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+        with self._lock:
+            lagged, self.lagged = self.lagged, False
+            events = list(self._pending)
+            self._pending.clear()
+        return lagged, events
+
+
+class EventBus:
+    def __init__(self, history_size: int, buffer_size: int):
+        self.epoch = format(int(time.time() * 1000), "x")
+        self.buffer_size = buffer_size
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, data: dict) -> Event:
+        with self._lock:
+            ev = Event(f"{self.epoch}-{next(self._ids)}", topic, data)
+            self._history.append(ev)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.offer(ev)
+        return ev
+
+    def _seq(self, event_id: str | None) -> int | None:
+        epoch, _, seq = (event_id or "").partition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def subscribe(self, topics, last_event_id: str | None = None) -> Subscription:
+        """Register a subscriber on the running event loop, replaying events after last_event_id."""
+        sub = Subscription(set(topics), self.buffer_size, asyncio.get_running_loop())
+        with self._lock:
+            if last_event_id is not None:
+                seq = self._seq(last_event_id)
+                oldest = self._seq(self._history[0].id) if self._history else None
+                if seq is None or (oldest is not None and seq < oldest - 1):
+                    sub.lagged = True
+                else:
+                    for ev in self._history:
+                        if self._seq(ev.id) > seq:
+                            sub.offer(ev)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+bus = EventBus(config.EVENTS_HISTORY_SIZE, config.EVENTS_SUBSCRIBER_BUFFER)
+
+
+def publish_on_commit(session: Session, topic: str, data: dict):
+    """Publish once the session's outermost transaction commits; dropped if it (or the enclosing SAVEPOINT) rolls back."""
+    tx = session.get_nested_transaction() or session.get_transaction()
+    session.info.setdefault(_PENDING, []).append((tx, topic, data))
+
+
+def _within(tx, ancestor) -> bool:
+    while tx is not None:
+        if tx is ancestor:
+            return True
+        tx = tx.parent
+    return False
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    if session.in_nested_transaction():
+        return  # a released SAVEPOINT (group-commit job); its events wait for the outer COMMIT
+    for _, topic, data in session.info.pop(_PENDING, ()):
+        bus.publish(topic, data)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back(session, previous_transaction):
+    # also fires for a SAVEPOINT (a failed job in a group-commit batch): drop only its events
+    pending = session.info.get(_PENDING)
+    if pending:
+        pending[:] = [p for p in pending if not _within(p[0], previous_transaction)]
@@ -0,0 +1,100 @@
+"""Group commit for write-heavy SQLite deployments.
+
+With TRANSFER_GROUP_COMMIT enabled, request threads hand their transfer to one writer thread
+per database instead of committing themselves. The writer collects up to GROUP_COMMIT_MAX_BATCH
+jobs, waiting at most GROUP_COMMIT_MAX_WAIT_MS after the first one, and runs them in a single
+transaction, each inside its own SAVEPOINT: a job that raises is rolled back alone and its
+caller gets its own exception, exactly as if it had run by itself. One commit (one fsync)
+then covers the whole batch, and callers are released only after that commit succeeded.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import config
+
+
+class _Job:
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    def __init__(self, engine, max_batch: int, max_wait_ms: int):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn) -> Future:
+        """Queue fn(db) to run in the next batch; the future resolves once that batch committed."""
+        job = _Job(fn)
+        self._queue.put(job)
+        return job.future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._apply(self._collect())
+
+    def _apply(self, batch: list):
+        db = Session(bind=self.engine)
+        outcomes = []
+        try:
+            if self.engine.dialect.name == "sqlite":
+                # take the write lock up front; SAVEPOINTs need an explicit outer transaction here
+                db.execute(text("BEGIN IMMEDIATE"))
+            for job in batch:
+                savepoint = db.begin_nested()
+                try:
+                    outcomes.append((job, job.fn(db), None))
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((job, None, e))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            failure = HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
+            outcomes = [(job, None, error or failure) for job, _, error in outcomes]
+            outcomes += [(job, None, failure) for job in batch[len(outcomes):]]
+        finally:
+            db.close()
+
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def writer_for(engine) -> GroupCommitWriter:
+    engine = engine.engine
+    with _writers_lock:
+        if engine not in _writers:
+            _writers[engine] = GroupCommitWriter(engine, config.GROUP_COMMIT_MAX_BATCH, config.GROUP_COMMIT_MAX_WAIT_MS)
+        return _writers[engine]
@@ -0,0 +1,81 @@
+"""Idempotency-Key support for POST endpoints that move money or create accounts.
+
+The outcome of a successful request is stored in `idempotency_keys`, keyed by (user, key), in the
+same commit as the write it describes, so a resend after a timeout either sees the stored response
+or finds nothing because the original never committed. A replay is one primary-key lookup.
+Failed requests are not stored: nothing was written, so re-running the validation is safe.
+
+Records expire after IDEMPOTENCY_TTL_SECONDS, and the table is trimmed to IDEMPOTENCY_MAX_KEYS
+every IDEMPOTENCY_PURGE_EVERY stored records (or by `python -m app.maintenance purge-idempotency`).
+"""
+import hashlib
+import itertools
+import json
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app import config
+from app.models import IdempotencyRecord
+
+_stored = itertools.count(1)
+
+
+def _request_hash(endpoint: str, payload) -> str:
+    body = payload.model_dump() if hasattr(payload, "model_dump") else payload
+    raw = json.dumps([endpoint, body], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def replay(db: Session, user_id: int, key: str, endpoint: str, payload, response: Response):
+    """Return the stored response for this key, or None if the request should run."""
+    record = db.get(IdempotencyRecord, (user_id, key))
+    if record is None:
+        return None
+    if record.created_at < datetime.utcnow() - timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS):
+        return None  # expired; remember() replaces it
+    if record.endpoint != endpoint or record.request_hash != _request_hash(endpoint, payload):
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    response.status_code = record.status_code
+    response.headers["Idempotent-Replayed"] = "true"
+    return json.loads(record.response)
+
+
+def remember(db: Session, user_id: int, key: str, endpoint: str, payload, result: dict, status_code: int = 200):
+    """Stage the outcome in the caller's transaction; it commits (or not) together with the write."""
+    cutoff = datetime.utcnow() - timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS)
+    db.execute(
+        delete(IdempotencyRecord)
+        .where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key, IdempotencyRecord.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(insert(IdempotencyRecord).values(
+        user_id=user_id,
+        key=key,
+        endpoint=endpoint,
+        request_hash=_request_hash(endpoint, payload),
+        status_code=status_code,
+        response=json.dumps(result, default=str),
+        created_at=datetime.utcnow(),
+    ))
+    if next(_stored) % config.IDEMPOTENCY_PURGE_EVERY == 0:
+        purge(db)
+
+
+def purge(db: Session) -> int:
+    """Drop expired records and, past IDEMPOTENCY_MAX_KEYS, the oldest ones; returns rows removed."""
+    cutoff = datetime.utcnow() - timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS)
+    oldest_kept = db.execute(
+        select(IdempotencyRecord.created_at)
+        .order_by(IdempotencyRecord.created_at.desc())
+        .offset(config.IDEMPOTENCY_MAX_KEYS - 1).limit(1)
+    ).scalar()
+    if oldest_kept is not None and oldest_kept > cutoff:
+        cutoff = oldest_kept
+    result = db.execute(
+        delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
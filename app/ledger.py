@@ -0,0 +1,164 @@
+"""Double-entry ledger: one row per account per transaction leg, written in the transfer's commit.
+
+Every entry stores the signed amount and the account balance right after it. An account's history
+is then one range scan on ix_ledger_account_ts (instead of a sender-side and a receiver-side scan
+of `transactions`), and its balance at any moment is the newest entry at or before that moment.
+Each account starts with an opening entry, without a transaction, for its initial deposit.
+
+Existing databases are backfilled by migration 3; `python -m app.maintenance rebuild-ledger`
+recomputes the whole ledger from `transactions` and the current balances.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import Account, LedgerEntry, Transaction
+
+entries = LedgerEntry.__table__
+ent = entries.c
+transactions = Transaction.__table__
+txn = transactions.c
+acc = Account.__table__.c
+
+REBUILD_CHUNK_ROWS = 1000
+
+
+def record_opening(db: Session, account_number: str, amount: int, when: datetime | None = None):
+    record_openings(db, [(account_number, amount)], when)
+
+
+def record_openings(db: Session, openings: list, when: datetime | None = None):
+    """Opening entries for new accounts; `openings` are (account_number, initial balance) pairs."""
+    if openings:
+        when = when or datetime.utcnow()
+        db.execute(insert(entries), [
+            {"account_number": number, "transaction_id": None, "amount": amount, "balance": amount, "timestamp": when}
+            for number, amount in openings
+        ])
+
+
+def _legs(transaction_id: int, sender: str, receiver: str, amount: int, when: datetime, balances: dict) -> list:
+    return [
+        {"account_number": sender, "transaction_id": transaction_id, "amount": -amount,
+         "balance": balances[sender], "timestamp": when},
+        {"account_number": receiver, "transaction_id": transaction_id, "amount": amount,
+         "balance": balances[receiver], "timestamp": when},
+    ]
+
+
+def _balances(db: Session, numbers) -> dict:
+    return dict(db.execute(select(acc.account_number, acc.balance).where(acc.account_number.in_(numbers))).all())
+
+
+def record_transfer(db: Session, transaction_id: int, sender: str, receiver: str, amount: int, when: datetime):
+    """Write both legs of a transfer whose balance UPDATEs already ran in this transaction.
+
+    The rows are locked by those UPDATEs until commit, so the balances read here are exactly
+    the ones this transfer produced.
+    """
+    db.execute(insert(entries), _legs(transaction_id, sender, receiver, amount, when, _balances(db, [sender, receiver])))
+
+
+def record_transfers(db: Session, transfers: list, when: datetime):
+    """Batch version of record_transfer; `transfers` are (transaction_id, sender, receiver, amount) in applied order."""
+    balances = _balances(db, {t[1] for t in transfers} | {t[2] for t in transfers})
+    # Walk back from the final balances so each leg gets the balance right after it
+    rows = []
+    for transaction_id, sender, receiver, amount in reversed(transfers):
+        rows[:0] = _legs(transaction_id, sender, receiver, amount, when, balances)
+        balances[sender] += amount
+        balances[receiver] -= amount
+    db.execute(insert(entries), rows)
+
+
+def balance_as_of(db: Session, account_number: str, when: datetime) -> int | None:
+    """Balance of the account at `when`, or None if its ledger starts after that."""
+    return db.execute(
+        select(ent.balance)
+        .where(ent.account_number == account_number, ent.timestamp <= when)
+        .order_by(ent.timestamp.desc(), ent.id.desc())
+        .limit(1)
+    ).scalar()
+
+
+def history(accounts: list[str], limit: int, conds=(), direction: str | None = None, counterparty: str | None = None):
+    """Transactions touching `accounts`, newest first: a UNION of one limited range scan per account.
+
+    `conds` may use txn.* and ent.* columns; `direction` ("in"/"out") is relative to the accounts.
+    """
+    parts = []
+    for acct in accounts:
+        where = [ent.account_number == acct, *conds]
+        if direction == "out":
+            where.append(ent.amount < 0)
+        elif direction == "in":
+            where.append(ent.amount > 0)
+        elif len(accounts) > 1:
+            # transfers between the selected accounts: keep only the debit leg
+            where.append(or_(ent.amount < 0, txn.sender_account.notin_(accounts)))
+        if counterparty:
+            where.append(or_(
+                and_(ent.amount < 0, txn.receiver_account == counterparty),
+                and_(ent.amount > 0, txn.sender_account == counterparty),
+            ))
+        parts.append(
+            select(transactions)
+            .select_from(entries.join(transactions, txn.id == ent.transaction_id))
+            .where(*where)
+            .order_by(ent.timestamp.desc(), ent.transaction_id.desc())
+            .limit(limit)
+            .subquery()
+        )
+    merged = union_all(*[select(p) for p in parts]).subquery() if len(parts) > 1 else parts[0]
+    return select(merged).order_by(merged.c.timestamp.desc(), merged.c.id.desc()).limit(limit)
+
+
+def rebuild_ledger(db: Session) -> dict:
+    """Recreate every entry from `transactions`, working back from the current balances.
+
+    Opening balances are current balance minus net transfers. Backfilled accounts open at their
+    first transaction (or now if they have none), since accounts carry no creation time.
+    """
+    net = dict(db.execute(select(acc.account_number, acc.balance)).all())
+    first_seen = {}
+    for side, sign in ((txn.sender_account, 1), (txn.receiver_account, -1)):
+        rows = db.execute(
+            select(side, func.sum(txn.amount), func.min(txn.timestamp))
+            .where(txn.status == "success").group_by(side)
+        ).all()
+        for account_number, total, first in rows:
+            if account_number in net:
+                net[account_number] += sign * int(total)
+                first_seen[account_number] = min(first, first_seen.get(account_number, first))
+
+    now = datetime.utcnow()
+    db.execute(delete(entries))
+    if net:
+        db.execute(insert(entries), [
+            {"account_number": num, "transaction_id": None, "amount": opening, "balance": opening,
+             "timestamp": first_seen.get(num, now)}
+            for num, opening in net.items()
+        ])
+
+    balances = dict(net)
+    count = len(net)
+    result = db.execute(
+        select(txn.id, txn.sender_account, txn.receiver_account, txn.amount, txn.timestamp)
+        .where(txn.status == "success")
+        .order_by(txn.timestamp, txn.id)
+        .execution_options(yield_per=REBUILD_CHUNK_ROWS)
+    )
+    for chunk in result.partitions():
+        rows = []
+        for transaction_id, sender, receiver, amount, when in chunk:
+            if sender not in balances or receiver not in balances:
+                continue
+            balances[sender] -= amount
+            balances[receiver] += amount
+            rows += _legs(transaction_id, sender, receiver, amount, when, balances)
+        if rows:
+            db.execute(insert(entries), rows)
+            count += len(rows)
+    db.commit()
+    return {"accounts": len(net), "entries": count}
@@ -1,12 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.openapi.utils import get_openapi
 
-from app.routers import auth, kyc, accounts, transfers, transactions, dashboard
+from app.routers import auth, kyc, accounts, transfers, transactions, dashboard, events
 from app.database import engine
-from app import models
+from app import config, migrations
+from app.middleware import BodySizeLimitMiddleware
+
+# ✅ Create database tables and bring existing ones up to date before serving (see app/migrations.py)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.MIGRATE_ON_STARTUP:
+        await run_in_threadpool(migrations.upgrade, engine)
+    yield
 
 # ✅ Create app FIRST before using it
-app = FastAPI(title="Core Banking System API")
+app = FastAPI(title="Core Banking System API", lifespan=lifespan)
 
 # ✅ Swagger Authorization Fix
 def custom_openapi():
@@ -33,6 +44,13 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+# ✅ Reject oversized bodies while they arrive (KYC uploads get their own, larger limit)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    default_limit=config.REQUEST_MAX_BYTES,
+    limits=[(r"/kyc/\d+/upload", config.KYC_MAX_UPLOAD_BYTES + 64 * 1024)],  # + multipart framing
+)
+
 # ✅ Include Routers
 app.include_router(auth.router)
 app.include_router(kyc.router)
@@ -40,11 +58,10 @@ app.include_router(accounts.router)
 app.include_router(transfers.router)
 app.include_router(transactions.router)
 app.include_router(dashboard.router)
+app.include_router(events.router)
 
 # ✅ Root endpoint
 @app.get("/")
 def root():
     return {"message": "Welcome to Core Banking System API"}
 
-# ✅ Create database tables
-models.Base.metadata.create_all(bind=engine)
@@ -0,0 +1,138 @@
+"""Operational commands, e.g. `python -m app.maintenance rebuild-daily-debits --dry-run`."""
+import argparse
+import json
+import time
+
+from app import idempotency, ledger, migrations, replicas, rollups, storage
+from app.database import SessionLocal, engine
+from app.counters import rebuild_daily_debits, reconcile_bank_stats
+
+
+def _migrate(args):
+    if args.status:
+        done = migrations.applied_versions(engine)
+        for version, description, _ in migrations.MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version:>3}  {description}")
+        return 0
+    applied = migrations.upgrade(engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    return 0
+
+
+def _rebuild_daily_debits(args):
+    db = SessionLocal()
+    try:
+        drift = rebuild_daily_debits(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps({"drift": drift, "rebuilt": not args.dry_run}, indent=2, default=str))
+    return 1 if drift and args.dry_run else 0
+
+
+def _reconcile_bank_stats(args):
+    db = SessionLocal()
+    try:
+        drift = reconcile_bank_stats(db, fix=args.fix)
+    finally:
+        db.close()
+    print(json.dumps({"drift": drift, "fixed": bool(args.fix and drift)}, indent=2))
+    return 1 if drift and not args.fix else 0
+
+
+def _rebuild_ledger(args):
+    db = SessionLocal()
+    try:
+        summary = ledger.rebuild_ledger(db)
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def _rebuild_rollups(args):
+    db = SessionLocal()
+    try:
+        summary = rollups.rebuild_rollups(db)
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def _gc_kyc_blobs(args):
+    db = SessionLocal()
+    try:
+        summary = storage.gc(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps({**summary, "dry_run": args.dry_run}, indent=2))
+    return 0
+
+
+def _purge_idempotency(args):
+    db = SessionLocal()
+    try:
+        removed = idempotency.purge(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Removed {removed} idempotency records")
+    return 0
+
+
+def _sync_replica(args):
+    replica = replicas.replica
+    if replica is None or not replica.stand_in:
+        print("REPLICA_DATABASE_URL does not name a SQLite stand-in for this SQLite primary")
+        return 1
+    while True:
+        replica.beat()
+        replica.copy()
+        replica.refresh()
+        print(f"Synced {replica.url}")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("migrate", help="Apply pending schema migrations")
+    cmd.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    cmd.set_defaults(func=_migrate)
+
+    cmd = commands.add_parser("rebuild-daily-debits", help="Recompute daily debit counters from transactions")
+    cmd.add_argument("--dry-run", action="store_true", help="Only report drift, do not rewrite the counters")
+    cmd.set_defaults(func=_rebuild_daily_debits)
+
+    cmd = commands.add_parser("reconcile-bank-stats", help="Compare the admin summary counters with the base tables")
+    cmd.add_argument("--fix", action="store_true", help="Overwrite the counters with the recomputed values")
+    cmd.set_defaults(func=_reconcile_bank_stats)
+
+    cmd = commands.add_parser("rebuild-ledger", help="Recreate ledger entries from transactions and current balances")
+    cmd.set_defaults(func=_rebuild_ledger)
+
+    cmd = commands.add_parser("rebuild-rollups", help="Recompute hourly/daily transfer volume buckets from transactions")
+    cmd.set_defaults(func=_rebuild_rollups)
+
+    cmd = commands.add_parser("gc-kyc-blobs", help="Delete unreferenced KYC blobs and stray files under the KYC storage dir")
+    cmd.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    cmd.set_defaults(func=_gc_kyc_blobs)
+
+    cmd = commands.add_parser("purge-idempotency", help="Drop expired / excess Idempotency-Key records")
+    cmd.set_defaults(func=_purge_idempotency)
+
+    cmd = commands.add_parser("sync-replica", help="Copy the primary into the SQLite read replica stand-in")
+    cmd.add_argument("--every", type=int, default=0, metavar="SECONDS", help="Keep copying at this interval")
+    cmd.set_defaults(func=_sync_replica)
+
+    args = parser.parse_args(argv)
+    if args.func is not _migrate:
+        migrations.upgrade(engine)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+"""In-process metrics: counters and timing summaries, read through GET /dashboard/admin/metrics."""
+import threading
+from collections import deque
+
+
+class Summary:
+    """Count, total and max of observed values, plus percentiles over the most recent ones."""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+            self._recent.append(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, peak = self.count, self.total, self.max
+
+        def pct(p):
+            return recent[min(len(recent) - 1, int(len(recent) * p))] if recent else 0.0
+        return {"count": count, "mean": total / count if count else 0.0, "p50": pct(0.5), "p99": pct(0.99), "max": peak}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get(name: str, kind):
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = kind()
+        return _registry[name]
+
+
+def summary(name: str) -> Summary:
+    return _get(name, Summary)
+
+
+def counter(name: str) -> Counter:
+    return _get(name, Counter)
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: metric.snapshot() for name, metric in sorted(items)}
@@ -0,0 +1,47 @@
+"""ASGI middleware that rejects oversized request bodies while they arrive.
+
+A declared Content-Length above the limit is answered with 413 before any of the body is read.
+Bodies without one (chunked uploads) are counted as they are received, and the request is aborted
+with 413 as soon as the count passes the limit, so an oversized upload never reaches the disk.
+"""
+import re
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, default_limit: int, limits: list[tuple[str, int]] = ()):
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = [(re.compile(pattern), limit) for pattern, limit in limits]
+
+    def _limit_for(self, path: str) -> int:
+        for pattern, limit in self.limits:
+            if pattern.fullmatch(path):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self._limit_for(scope["path"])
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({"detail": f"Request body exceeds {limit} bytes"}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes the response
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,169 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so anything that changes an
+existing table (new indexes, new columns) is added here as a numbered step. Applied
+versions are recorded in `schema_migrations`; `upgrade()` creates missing tables, then
+runs the pending steps in order. Steps must be idempotent, because a fresh database
+already gets the latest schema from `create_all`.
+
+upgrade() runs under a database-wide lock (BEGIN IMMEDIATE on SQLite, GET_LOCK on MySQL)
+and reads `schema_migrations` only once it holds it, so several workers starting at once
+migrate exactly once and the others wait, then find nothing to do. On SQLite the whole
+run is one transaction; on MySQL every step commits on its own.
+
+It runs at app startup (MIGRATE_ON_STARTUP) or as a deploy step:
+`python -m app.maintenance migrate`.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from app import config, models
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_indexes(table, *names):
+    def step(conn):
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=conn, checkfirst=True)
+    return step
+
+
+def _seed_bank_stats(conn):
+    from sqlalchemy.orm import Session
+    from app.counters import reconcile_bank_stats
+    with Session(bind=conn) as db:
+        reconcile_bank_stats(db, fix=True)
+
+
+def _backfill_ledger(conn):
+    from sqlalchemy import func
+    from sqlalchemy.orm import Session
+    from app.ledger import rebuild_ledger
+    with Session(bind=conn) as db:
+        if not db.scalar(select(func.count()).select_from(models.LedgerEntry)):
+            rebuild_ledger(db)
+
+
+def _backfill_rollups(conn):
+    from sqlalchemy import func
+    from sqlalchemy.orm import Session
+    from app.rollups import rebuild_rollups
+    with Session(bind=conn) as db:
+        if not db.scalar(select(func.count()).select_from(models.VolumeRollup)):
+            rebuild_rollups(db)
+
+
+def _add_kyc_document_blob_column(conn):
+    if "blob_sha256" not in {c["name"] for c in inspect(conn).get_columns("kyc_documents")}:
+        conn.execute(text("ALTER TABLE kyc_documents ADD COLUMN blob_sha256 VARCHAR(64)"))
+    for index in models.KYCDocument.__table__.indexes:
+        if index.name == "ix_kyc_documents_blob_sha256":
+            index.create(bind=conn, checkfirst=True)
+
+
+def _move_kyc_files_to_blobs(conn):
+    from sqlalchemy.orm import Session
+    from app.storage import migrate_legacy
+    with Session(bind=conn) as db:
+        migrate_legacy(db)
+
+
+def _seed_daily_debits(conn):
+    # counters only start moving with the first transfer after deploy; count what was already spent
+    from sqlalchemy.orm import Session
+    from app.counters import rebuild_daily_debits
+    with Session(bind=conn) as db:
+        rebuild_daily_debits(db)
+
+
+def _add_cache_versions_written_at(conn):
+    if "written_at" not in {c["name"] for c in inspect(conn).get_columns("cache_versions")}:
+        column = models.CacheVersion.__table__.c.written_at
+        conn.execute(text(f"ALTER TABLE cache_versions ADD COLUMN written_at {column.type.compile(dialect=conn.dialect)}"))
+
+
+MIGRATIONS = [
+    (1, "transactions composite indexes for history and daily-limit queries",
+     _create_indexes(models.Transaction.__table__,
+                     "ix_transactions_sender_ts", "ix_transactions_receiver_ts", "ix_transactions_ts_id")),
+    (2, "seed bank_stats from the base tables", _seed_bank_stats),
+    (3, "backfill ledger_entries from transactions", _backfill_ledger),
+    (4, "backfill volume_rollups from transactions", _backfill_rollups),
+    (5, "kyc_documents.blob_sha256 for the content-addressed store", _add_kyc_document_blob_column),
+    (6, "copy existing KYC files into the content-addressed store", _move_kyc_files_to_blobs),
+    (7, "kyc_applications (status, id) index for the pending queue",
+     _create_indexes(models.KYCApplication.__table__, "ix_kyc_applications_status_id")),
+    (8, "seed daily_debits from today's and earlier transactions", _seed_daily_debits),
+    (9, "cache_versions.written_at for read-your-writes across workers", _add_cache_versions_written_at),
+]
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        schema_migrations.create(bind=conn, checkfirst=True)
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+LOCK_NAME = "cbs_schema_migrations"
+LOCK_TIMEOUT_SECONDS = 600
+
+
+@contextmanager
+def _migration_lock(engine):
+    """A connection holding the migration lock; other processes block until the run is over."""
+    with engine.connect() as conn:
+        backend = engine.dialect.name
+        if backend == "sqlite":
+            # the write lock is the migration lock; wait for it longer than a request would
+            conn.exec_driver_sql(f"PRAGMA busy_timeout={LOCK_TIMEOUT_SECONDS * 1000}")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.exec_driver_sql(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+        elif backend in ("mysql", "mariadb"):
+            if conn.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                            {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SECONDS}).scalar() != 1:
+                raise RuntimeError(f"Timed out waiting for the {LOCK_NAME} lock")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+                conn.commit()
+        else:
+            yield conn
+            conn.commit()
+
+
+def upgrade(engine) -> list:
+    """Create missing tables and apply pending migrations under the lock; returns the versions applied."""
+    applied = []
+    with _migration_lock(engine) as conn:
+        models.Base.metadata.create_all(bind=conn)
+        schema_migrations.create(bind=conn, checkfirst=True)
+        done = set(conn.execute(select(schema_migrations.c.version)).scalars())  # read under the lock
+        for version, description, step in MIGRATIONS:
+            if version in done:
+                continue
+            step(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+            if engine.dialect.name != "sqlite":
+                conn.commit()
+            applied.append(version)
+    return applied
@@ -1,27 +1,37 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects import mysql
 from app.database import Base
 
+# Microsecond timestamps on MySQL too (its DATETIME defaults to whole seconds); history and
+# ledger ordering and the pagination cursors rely on them
+Timestamp = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql", "mariadb")
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    full_name = Column(String, nullable=False)
-    password = Column(String, nullable=False)
-    role = Column(String, default="customer")  # default role customer
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+    email = Column(String(255), unique=True, index=True, nullable=False)
+    full_name = Column(String(255), nullable=False)
+    password = Column(String(255), nullable=False)
+    role = Column(String(16), default="customer")  # default role customer
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
 class KYCApplication(Base):
     __tablename__ = "kyc_applications"
+    __table_args__ = (
+        # Admin review queue: pending applications in id order, paged by keyset
+        Index("ix_kyc_applications_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    status = Column(String, default="pending")  # pending, approved, rejected
-    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String(16), default="pending")  # pending, approved, rejected
+    created_at = Column(Timestamp, default=datetime.utcnow)
 
     user = relationship("User")
+    documents = relationship("KYCDocument", viewonly=True, order_by="KYCDocument.id")
 
 
 class KYCDocument(Base):
@@ -29,9 +39,10 @@ class KYCDocument(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     kyc_id = Column(Integer, ForeignKey("kyc_applications.id"))
-    document_type = Column(String)  # aadhaar, pan, selfie
-    file_path = Column(String)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    document_type = Column(String(32))  # aadhaar, pan, selfie
+    file_path = Column(String(512))
+    uploaded_at = Column(Timestamp, default=datetime.utcnow)
+    blob_sha256 = Column(String(64), ForeignKey("kyc_blobs.sha256"), index=True)  # content-addressed file
 
     kyc_application = relationship("KYCApplication")
 
@@ -40,21 +51,133 @@ class Account(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    account_number = Column(String, unique=True, index=True)
-    account_type = Column(String, default="savings")  # savings, current
+    account_number = Column(String(20), unique=True, index=True)
+    account_type = Column(String(16), default="savings")  # savings, current
     balance = Column(Integer, default=0)  # initial balance 0
-    status = Column(String, default="active")  # active, frozen, closed
+    status = Column(String(16), default="active")  # active, frozen, closed
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from datetime import datetime
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Sender history by time; also covers the daily debit SUM (status/amount read from the index)
+        Index("ix_transactions_sender_ts", "sender_account", "timestamp", "status", "amount"),
+        # Receiver history by time (the other half of the sender OR receiver history queries)
+        Index("ix_transactions_receiver_ts", "receiver_account", "timestamp"),
+        # Bank-wide history newest first, with id as the tie-breaker
+        Index("ix_transactions_ts_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_account = Column(String, nullable=False)
-    receiver_account = Column(String, nullable=False)
+    sender_account = Column(String(20), nullable=False)
+    receiver_account = Column(String(20), nullable=False)
     amount = Column(Integer, nullable=False)
-    status = Column(String, default="success")  # success, failed
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    reference_id = Column(String, unique=True, index=True)
+    status = Column(String(16), default="success")  # success, failed
+    timestamp = Column(Timestamp, default=datetime.utcnow)
+    reference_id = Column(String(32), unique=True, index=True)
+
+from sqlalchemy import Column, Integer, String, Date
+
+class DailyDebit(Base):
+    __tablename__ = "daily_debits"
+
+    # One row per sender account per UTC day, bumped in the same commit as the transfer
+    account_number = Column(String(20), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Outcome of a successful POST, replayed when the same user resends the same Idempotency-Key
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String(64), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False, default=200)
+    response = Column(Text, nullable=False)
+    created_at = Column(Timestamp, nullable=False, default=datetime.utcnow, index=True)
+
+from sqlalchemy import Column, BigInteger, String
+
+class IdSequence(Base):
+    __tablename__ = "sequences"
+
+    # next_value is the first number not yet handed to any process
+    name = Column(String(64), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+from sqlalchemy import Column, Integer, BigInteger
+
+class BankStats(Base):
+    __tablename__ = "bank_stats"
+
+    # Single row (id=1) kept in step with the base tables by the write paths; see app/counters.py
+    id = Column(Integer, primary_key=True)
+    total_users = Column(Integer, nullable=False, default=0)
+    kyc_pending = Column(Integer, nullable=False, default=0)
+    kyc_approved = Column(Integer, nullable=False, default=0)
+    total_accounts = Column(Integer, nullable=False, default=0)
+    total_balance = Column(BigInteger, nullable=False, default=0)
+
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+
+class LedgerEntry(Base):
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        # One range scan per account for history, statements and balance-as-of
+        Index("ix_ledger_account_ts", "account_number", "timestamp", "transaction_id"),
+    )
+
+    # One row per account per transaction leg; an opening entry (no transaction) per account
+    id = Column(Integer, primary_key=True)
+    account_number = Column(String(20), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
+    amount = Column(Integer, nullable=False)   # signed: debits negative, credits positive
+    balance = Column(Integer, nullable=False)  # account balance right after this entry
+    timestamp = Column(Timestamp, nullable=False)
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+
+class VolumeRollup(Base):
+    __tablename__ = "volume_rollups"
+
+    # Transfer count and amount per hour / day bucket (UTC) per sender account type; see app/rollups.py
+    granularity = Column(String(8), primary_key=True)  # hour, day
+    bucket = Column(Timestamp, primary_key=True)
+    account_type = Column(String(16), primary_key=True)
+    transfers = Column(Integer, nullable=False, default=0)
+    amount = Column(BigInteger, nullable=False, default=0)
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from datetime import datetime
+
+class KYCBlob(Base):
+    __tablename__ = "kyc_blobs"
+
+    # One stored file per unique content, shared by every KYCDocument with that hash; see app/storage.py
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(Timestamp, nullable=False, default=datetime.utcnow)
+
+class ReplicaHeartbeat(Base):
+    __tablename__ = "replica_heartbeat"
+
+    # Written on the primary every REPLICA_HEARTBEAT_SECONDS; its age on the replica is the lag (app/replicas.py)
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(Timestamp, nullable=False)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # Bumped in the same commit as any write a user's cached reads show (app/response_cache.py);
+    # written_at is that commit's time, for read-your-writes across workers (app/replicas.py)
+    user_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    written_at = Column(Timestamp)
@@ -0,0 +1,22 @@
+import base64
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for the last row of a page, e.g. encode_cursor(txn.timestamp, txn.id)."""
+    raw = "|".join(v.isoformat() if hasattr(v, "isoformat") else str(v) for v in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types):
+    """Inverse of encode_cursor; `types` convert each part back, e.g. (datetime.fromisoformat, int)."""
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(parts) != len(types):
+            raise ValueError(cursor)
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,90 @@
+"""The authenticated user as seen by route handlers, and a cache of them keyed by token subject.
+
+get_current_user returns a Principal (id, email, full_name, role) instead of an ORM User, so it
+can be served from the cache or from token claims without a session. Entries live for
+PRINCIPAL_CACHE_TTL_SECONDS, at most PRINCIPAL_CACHE_SIZE of them (least recently used evicted),
+and are dropped as soon as a User row is updated or deleted through the ORM in this process.
+Other workers notice within the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+from app import config
+from app.models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    full_name: str
+    role: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, role=user.role)
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # subject -> (expires_at, principal)
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal):
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = PrincipalCache(config.PRINCIPAL_CACHE_SIZE, config.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def token_claims(user: User) -> dict:
+    """Claims for create_access_token; includes the principal itself when TOKEN_EMBED_PRINCIPAL is on."""
+    claims = {"sub": user.email}
+    if config.TOKEN_EMBED_PRINCIPAL:
+        claims.update({"uid": user.id, "role": user.role, "name": user.full_name})
+    return claims
+
+
+def from_claims(payload: dict) -> Principal | None:
+    if not config.TOKEN_EMBED_PRINCIPAL or "uid" not in payload or "role" not in payload:
+        return None
+    return Principal(id=payload["uid"], email=payload["sub"], full_name=payload.get("name", ""), role=payload["role"])
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _drop_changed_user(mapper, connection, target):
+    # role or password changed (or user removed): the next request must re-read the row
+    cache.invalidate(target.email)
@@ -0,0 +1,189 @@
+"""Read replica for the read-only routes, with lag tracking and read-your-writes pinning.
+
+With REPLICA_DATABASE_URL set, the dashboard aggregates, account reads and /transactions/*
+history take their session from get_read_session() (app/routers/kyc.py), which hands out a
+replica session from read_session() below. Transfers, account opening and every other write
+keep the primary session from get_session(). Locally the replica can be a SQLite file that is
+refreshed from the primary every REPLICA_SYNC_SECONDS with SQLite's online backup (a
+consistent snapshot, even while transfers commit). In production it is a MySQL replica and
+REPLICA_SYNC_SECONDS does not apply.
+
+Lag: a background thread writes the current time into `replica_heartbeat` on the primary
+every REPLICA_HEARTBEAT_SECONDS and reads the row back from the replica. The replica is at
+most (now - that time) behind, so the estimate only grows until the next read-back; if the
+thread stalls or the replica stops applying changes, reads move to the primary once it
+passes REPLICA_MAX_LAG_SECONDS.
+
+Read-your-writes: a commit that touches a user's data, or that the user made (the same users
+response_cache.touch() invalidates), keeps their reads on the primary for READ_YOUR_WRITES_SECONDS.
+With that at least REPLICA_MAX_LAG_SECONDS, whatever the replica serves them afterwards already
+has their write. The commit stamps the user's `cache_versions.written_at` on the primary, and
+before a read goes to the replica, wrote_recently() checks that stamp, so the pin holds on every
+worker; that is one primary-key lookup per replica read. The worker that made the commit also
+pins the user in memory and skips the lookup.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import config, metrics
+from app.database import ThreadedSession, engine, has_async_driver, make_async_engine, make_engine
+from app.models import CacheVersion, ReplicaHeartbeat
+
+
+class Replica:
+    def __init__(self, url: str, primary, heartbeat_seconds: int, sync_seconds: int):
+        self.url = url
+        self.primary = primary
+        self.engine = make_engine(url)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_sessions = (
+            async_sessionmaker(make_async_engine(url), autoflush=False)
+            if config.DB_ASYNC and has_async_driver(url) else None
+        )
+        self.heartbeat_seconds = heartbeat_seconds
+        # the file copy is only a stand-in for SQLite; a real replica is fed by the server
+        self.stand_in = make_url(url).get_backend_name() == primary.dialect.name == "sqlite"
+        self.sync_seconds = sync_seconds if self.stand_in else 0
+        self.seen = None          # newest heartbeat read back from the replica
+        self.last_error = None
+        self._next_sync = 0.0
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the heartbeat thread, once; ticks also sync the stand-in when that is due."""
+        with self._start_lock:
+            if self._thread is None and self.heartbeat_seconds > 0:
+                self._thread = threading.Thread(target=self._run, name="replica-heartbeat", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+                self.last_error = None
+            except Exception as e:
+                metrics.counter("replica.tick_errors").inc()
+                self.last_error = str(e)
+            time.sleep(self.heartbeat_seconds)
+
+    def tick(self):
+        self.beat()
+        if self.sync_seconds and time.monotonic() >= self._next_sync:
+            self.copy()
+            self._next_sync = time.monotonic() + self.sync_seconds
+        self.refresh()
+
+    def beat(self):
+        with Session(bind=self.primary) as db:
+            db.merge(ReplicaHeartbeat(id=1, beat_at=datetime.utcnow()))
+            db.commit()
+
+    def copy(self):
+        """Overwrite the SQLite stand-in with a snapshot of the primary (pages copied in one step)."""
+        started = time.perf_counter()
+        src = self.primary.raw_connection()
+        dst = self.engine.raw_connection()
+        try:
+            src.driver_connection.backup(dst.driver_connection)
+        finally:
+            dst.close()
+            src.close()
+        metrics.summary("replica.sync_seconds").observe(time.perf_counter() - started)
+
+    def refresh(self):
+        with self.engine.connect() as conn:
+            beat_at = conn.execute(select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == 1)).scalar()
+        if beat_at is not None:
+            self.seen = beat_at
+
+    def lag(self) -> float | None:
+        """Upper bound on how far the replica is behind, in seconds; None before the first read-back."""
+        if self.seen is None:
+            return None
+        return max(0.0, (datetime.utcnow() - self.seen).total_seconds())
+
+    def session(self):
+        return self.async_sessions() if self.async_sessions else ThreadedSession(self.sessions())
+
+
+class Pins:
+    """Users whose reads stay on the primary until a moment after their latest write."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._until = OrderedDict()  # user_id -> monotonic deadline, oldest first
+        self._lock = threading.Lock()
+
+    def pin(self, user_ids):
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                self._until[user_id] = now + self.seconds
+                self._until.move_to_end(user_id)
+            while self._until and next(iter(self._until.values())) <= now:
+                self._until.popitem(last=False)
+
+    def pinned(self, user_id) -> bool:
+        with self._lock:
+            return self._until.get(user_id, 0) > time.monotonic()
+
+    def __len__(self):
+        return len(self._until)
+
+
+replica = (
+    Replica(config.REPLICA_DATABASE_URL, engine, config.REPLICA_HEARTBEAT_SECONDS, config.REPLICA_SYNC_SECONDS)
+    if config.REPLICA_DATABASE_URL else None
+)
+pins = Pins(config.READ_YOUR_WRITES_SECONDS)
+
+
+def pin(user_ids):
+    """Route these users' reads to the primary for the next READ_YOUR_WRITES_SECONDS (called after commit)."""
+    if replica is not None:
+        pins.pin(user_ids)
+
+
+def read_session(user_id):
+    """A new replica session for this user's read, or None to read from the primary."""
+    if replica is None:
+        return None
+    replica.start()
+    if pins.pinned(user_id):
+        metrics.counter("replica.reads_pinned").inc()
+        return None
+    lag = replica.lag()
+    if lag is None or lag > config.REPLICA_MAX_LAG_SECONDS:
+        metrics.counter("replica.reads_lagging").inc()
+        return None
+    metrics.counter("replica.reads").inc()
+    return replica.session()
+
+
+def wrote_recently(db: Session, user_id) -> bool:
+    """Whether any worker committed a write for this user within READ_YOUR_WRITES_SECONDS (`db` is the primary)."""
+    written_at = db.execute(select(CacheVersion.written_at).where(CacheVersion.user_id == user_id)).scalar()
+    if written_at is None or written_at <= datetime.utcnow() - timedelta(seconds=config.READ_YOUR_WRITES_SECONDS):
+        return False
+    metrics.counter("replica.reads_pinned").inc()
+    return True
+
+
+def stats() -> dict:
+    if replica is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "lag_seconds": replica.lag(),
+        "max_lag_seconds": config.REPLICA_MAX_LAG_SECONDS,
+        "pinned_users": len(pins),
+        "last_error": replica.last_error,
+    }
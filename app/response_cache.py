@@ -0,0 +1,181 @@
+"""Short-lived per-user cache of rendered GET responses, with ETag / If-None-Match.
+
+Every user has a version number in the `cache_versions` table, bumped inside the same commit as
+a write that changed something their read endpoints show: a transfer touching one of their
+accounts, an account opened for them, a KYC application or decision. Because the bump commits
+with the data, every worker sees it at once, and a read sees the version that matches the data
+it reads. Entries are stored under the version read before the handler ran, so a response built
+while a write was committing is never served as fresh afterwards. A group-commit batch bumps its
+users once, at its outer COMMIT, not as each job's SAVEPOINT is released.
+
+A request whose If-None-Match matches a live entry for the current version gets a 304 without
+running the handler (the only SQL is the version lookup by primary key). The ETag is a hash of
+the body, so a miss that renders the same bytes also answers 304. Bodies are cached per process,
+for at most RESPONSE_CACHE_TTL_SECONDS; at most RESPONSE_CACHE_SIZE entries are kept (least
+recently used evicted). Hit, miss and 304 counts are reported by GET /dashboard/admin/metrics.
+
+Writes made through the ORM on Account and KYCApplication mark their owner automatically; Core
+statements (the transfer UPDATEs) call touch() with the owners of the accounts they change. Every
+write route also touches the user who made the request, so an admin's own write shows in their
+next read. Once the commit succeeds, those users' reads are pinned to the primary database for a
+while (see app/replicas.py).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import config, replicas
+from app.counters import _upsert_increment
+from app.models import Account, CacheVersion, KYCApplication
+
+_TOUCHED = "response_cache_touched"
+
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()  # (user_id, route) -> (expires_at, version, etag, body)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, route: str, version: int):
+        """Return (etag, body) of a live entry stored under this version, else None."""
+        key = (user_id, route)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != version:
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2], entry[3]
+
+    def put(self, user_id: int, route: str, version: int, etag: str, body: bytes):
+        key = (user_id, route)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        served = self.hits + self.not_modified
+        total = served + self.misses
+        return {
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "hit_rate": served / total if total else 0.0,
+        }
+
+
+cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL_SECONDS)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _reply(request: Request, etag: str, body: bytes) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def current_version(db: Session, user_id: int) -> int:
+    return db.execute(select(CacheVersion.version).where(CacheVersion.user_id == user_id)).scalar() or 0
+
+
+def serve(request: Request, db: Session, user_id: int, route: str, build) -> Response:
+    """Answer a user-scoped GET from the cache, or call build() and cache its JSON-able result.
+
+    The version is read on `db`, the session build() reads from, before build() runs (see the
+    module docstring); on a replica that is the replica's version, matching the replica's data.
+    """
+    if not config.RESPONSE_CACHE_ENABLED:
+        return JSONResponse(jsonable_encoder(build()))
+
+    version = current_version(db, user_id)
+    cached = cache.get(user_id, route, version)
+    if cached is not None:
+        etag, body = cached
+        if _matches(request, etag):
+            cache.not_modified += 1
+        else:
+            cache.hits += 1
+        return _reply(request, etag, body)
+
+    cache.misses += 1
+    body = JSONResponse(jsonable_encoder(build())).body
+    etag = _etag(body)
+    cache.put(user_id, route, version, etag, body)
+    return _reply(request, etag, body)
+
+
+def touch(session: Session, *user_ids):
+    """Invalidate these users' cached responses once the session's transaction commits."""
+    session.info.setdefault(_TOUCHED, set()).update(u for u in user_ids if u is not None)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_versions(session):
+    # before_commit and after_commit also fire when a SAVEPOINT is released (group-commit jobs);
+    # only the outermost commit counts
+    if session.in_nested_transaction():
+        return
+    session.flush()  # ORM writes mark their owners while flushing
+    now = datetime.utcnow()
+    for user_id in sorted(session.info.get(_TOUCHED, ())):  # one lock order across writers
+        _upsert_increment(session, CacheVersion, {"user_id": user_id}, {"version": 1}, {"written_at": now})
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_committed(session):
+    if session.in_nested_transaction():
+        return
+    touched = session.info.pop(_TOUCHED, None)
+    if touched:
+        replicas.pin(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    # a job rolled back to its SAVEPOINT keeps the batch's users: an extra bump only costs a miss
+    if not session.in_nested_transaction():
+        session.info.pop(_TOUCHED, None)
+
+
+@event.listens_for(Account, "after_insert")
+@event.listens_for(Account, "after_update")
+@event.listens_for(Account, "after_delete")
+@event.listens_for(KYCApplication, "after_insert")
+@event.listens_for(KYCApplication, "after_update")
+@event.listens_for(KYCApplication, "after_delete")
+def _touch_owner(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        touch(session, target.user_id)
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.database import get_db
+from app import idempotency, ledger, response_cache
+from app.database import get_session
 from app.models import Account, User, KYCApplication
-from app.routers.kyc import get_current_user
-from app.utils import generate_account_number
+from app.routers.kyc import get_current_user_async, get_read_session
+from app.utils import generate_account_number, naive_utc
+from app.counters import bump_bank_stats
 
 router = APIRouter(prefix="/accounts", tags=["Accounts"])
 
@@ -22,14 +27,63 @@ MIN_DEPOSIT = {
 }
 
 @router.get("/me")
-def get_my_accounts(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    accounts = db.query(Account).filter(Account.user_id == current_user.id).all()
-    if not accounts:
-        raise HTTPException(status_code=404, detail="No accounts found")
-    return accounts
+async def get_my_accounts(request: Request, db: AsyncSession = Depends(get_read_session), current_user=Depends(get_current_user_async)):
+    def serve(db: Session):
+        def build():
+            accounts = db.query(Account).filter(Account.user_id == current_user.id).all()
+            if not accounts:
+                raise HTTPException(status_code=404, detail="No accounts found")
+            return accounts
+        return response_cache.serve(request, db, current_user.id, "my_accounts", build)
+    return await db.run_sync(serve)
+
+@router.get("/{account_number}/balance")
+async def get_balance_as_of(
+    account_number: str,
+    as_of: datetime | None = Query(None, description="Balance at this time (UTC); default now"),
+    db: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user_async),
+):
+    return await db.run_sync(_balance_as_of, account_number, as_of, current_user)
+
+def _balance_as_of(db: Session, account_number: str, as_of: datetime | None, current_user):
+    account = db.query(Account).filter(Account.account_number == account_number).first()
+    if not account or (account.user_id != current_user.id and current_user.role not in ("admin", "auditor")):
+        raise HTTPException(status_code=404, detail="Account not found")
+    if as_of is None:
+        return {"account_number": account_number, "as_of": datetime.utcnow(), "balance": account.balance}
+    # newest ledger entry at or before as_of carries the running balance
+    as_of = naive_utc(as_of)
+    balance = ledger.balance_as_of(db, account_number, as_of)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="No balance recorded at that time")
+    return {"account_number": account_number, "as_of": as_of, "balance": balance}
 
 @router.post("/create")
-def create_account(request: AccountCreateRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def create_account(
+    request: AccountCreateRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user_async),
+):
+    try:
+        return await db.run_sync(_create_account, request, response, idempotency_key, current_user)
+    except IntegrityError as e:
+        await db.rollback()
+        # A concurrent resend with the same key committed first: answer with its outcome
+        previous = idempotency_key and await db.run_sync(
+            idempotency.replay, current_user.id, idempotency_key, "create_account", request, response
+        )
+        if previous:
+            return previous
+        raise HTTPException(status_code=500, detail=f"Account creation failed: {str(e)}")
+
+def _create_account(db: Session, request: AccountCreateRequest, response: Response, idempotency_key: str | None, current_user):
+    if idempotency_key:
+        previous = idempotency.replay(db, current_user.id, idempotency_key, "create_account", request, response)
+        if previous is not None:
+            return previous
 
     # Determine user for account creation
     if current_user.role == "admin" and request.email:
@@ -67,11 +121,16 @@ def create_account(request: AccountCreateRequest, db: Session = Depends(get_db),
         status="active"
     )
     db.add(new_account)
-    db.commit()
-    db.refresh(new_account)
-
-    return {
+    ledger.record_opening(db, account_number, request.initial_deposit)
+    bump_bank_stats(db, total_accounts=1, total_balance=request.initial_deposit)
+    result = {
         "message": f"{request.account_type.capitalize()} account created successfully",
         "account_number": new_account.account_number,
         "balance": new_account.balance
     }
+    if idempotency_key:
+        idempotency.remember(db, current_user.id, idempotency_key, "create_account", request, result)
+    response_cache.touch(db, current_user.id)  # the requester, when an admin opens it for someone else
+    db.commit()
+
+    return result
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 
-from app import models
+from app import config, metrics, models, principals
+from app.throttle import login_throttle
 from app.database import get_db
-from app.security import hash_password, verify_password, create_access_token
+from app.counters import bump_bank_stats
+from app.security import hash_password_async, verify_and_update_password_async, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -16,10 +19,22 @@ class RegisterRequest(BaseModel):
     password: str
     full_name: str
 
+def _find_user(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def _create_user(db: Session, user):
+    db.add(user)
+    bump_bank_stats(db, total_users=1)
+    db.commit()
+    db.refresh(user)
+    return user
+
+# Async so bcrypt waits on the hashing executor instead of holding a request thread;
+# the database calls still run on the threadpool.
 @router.post("/register")
-def register_user(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register_user(request: RegisterRequest, db: Session = Depends(get_db)):
     # Check if user already exists
-    existing_user = db.query(models.User).filter(models.User.email == request.email).first()
+    existing_user = await run_in_threadpool(_find_user, db, request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
 
@@ -31,11 +46,9 @@ def register_user(request: RegisterRequest, db: Session = Depends(get_db)):
     new_user = models.User(
         email=request.email,
         full_name=request.full_name,
-        password=hash_password(request.password)
+        password=await hash_password_async(request.password)
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_create_user, db, new_user)
 
     return {"message": "User registered successfully", "user_id": new_user.id}
 #Admin Creation Endpoint
@@ -45,9 +58,9 @@ class AdminCreateRequest(BaseModel):
     full_name: str = "Admin User"
 
 @router.post("/create-admin")
-def create_admin(request: AdminCreateRequest, db: Session = Depends(get_db)):
+async def create_admin(request: AdminCreateRequest, db: Session = Depends(get_db)):
     # Check if admin already exists
-    existing_user = db.query(models.User).filter(models.User.email == request.email).first()
+    existing_user = await run_in_threadpool(_find_user, db, request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Admin already exists")
 
@@ -55,21 +68,47 @@ def create_admin(request: AdminCreateRequest, db: Session = Depends(get_db)):
     new_admin = models.User(
         email=request.email,
         full_name=request.full_name,
-        password=hash_password(request.password),
+        password=await hash_password_async(request.password),
         role="admin"
     )
-    db.add(new_admin)
-    db.commit()
+    await run_in_threadpool(_create_user, db, new_admin)
     return {"message": "Admin created successfully", "admin_email": new_admin.email}
 
+async def _throttle(fn, *args):
+    # The shared SQLite store can wait on another worker's write lock: keep that off the event loop
+    if login_throttle.store.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    client_ip = request.client.host if request.client else None
+    if config.LOGIN_THROTTLE_ENABLED:
+        # Locked-out identities are turned away before any query or bcrypt work
+        wait = await _throttle(login_throttle.retry_after, form_data.username, client_ip)
+        if wait > 0:
+            metrics.counter("login.throttled").inc()
+            raise HTTPException(status_code=429, detail="Too many failed login attempts",
+                                headers={"Retry-After": str(int(wait) + 1)})
+
     # Fetch user by email
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+    user = await run_in_threadpool(_find_user, db, form_data.username)
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_and_update_password_async(form_data.password, user.password)
+    if not valid:
+        if config.LOGIN_THROTTLE_ENABLED:
+            await _throttle(login_throttle.record_failure, form_data.username, client_ip)
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if config.LOGIN_THROTTLE_ENABLED:
+        await _throttle(login_throttle.record_success, form_data.username, client_ip)
+    claims = principals.token_claims(user)
+    if new_hash:
+        # stored hash used an older bcrypt cost: upgrade it now that we know the password
+        user.password = new_hash
+        await run_in_threadpool(db.commit)
 
-    token = create_access_token({"sub": user.email})
+    token = create_access_token(claims)
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me")
@@ -1,10 +1,14 @@
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from app.database import get_db
-from app.models import User, Account, Transaction, KYCApplication
-from app.routers.kyc import get_current_user, admin_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
+from app.models import Account, Transaction, KYCApplication
+from app.utils import naive_utc
+from app.routers.kyc import get_current_user_async, get_read_session, admin_only
+from app import events, ledger, metrics, principals, replicas, response_cache, rollups
+from app.counters import read_bank_stats
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -17,57 +21,61 @@ def response(data):
     return {"status": "success", "generated_at": now_ist(), "data": data}
 
 @router.get("/customer/summary")
-def customer_summary(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def customer_summary(request: Request, db: AsyncSession = Depends(get_read_session), current_user=Depends(get_current_user_async)):
     if current_user.role == "admin":
         raise HTTPException(status_code=403, detail="Customers only")
-    kyc = db.query(KYCApplication).filter(KYCApplication.user_id == current_user.id).first()
-    total_accounts = db.query(func.count(Account.id)).filter(Account.user_id == current_user.id).scalar()
-    total_balance = db.query(func.coalesce(func.sum(Account.balance), 0)).filter(Account.user_id == current_user.id).scalar()
-    return response({
-        "name": current_user.full_name,
-        "kyc_status": kyc.status if kyc else "not submitted",
-        "total_accounts": total_accounts,
-        "total_balance": total_balance
-    })
+    return await db.run_sync(_customer_summary, request, current_user)
+
+def _customer_summary(db: Session, request: Request, current_user):
+    def build():
+        kyc = db.query(KYCApplication).filter(KYCApplication.user_id == current_user.id).first()
+        total_accounts = db.query(func.count(Account.id)).filter(Account.user_id == current_user.id).scalar()
+        total_balance = db.query(func.coalesce(func.sum(Account.balance), 0)).filter(Account.user_id == current_user.id).scalar()
+        return response({
+            "name": current_user.full_name,
+            "kyc_status": kyc.status if kyc else "not submitted",
+            "total_accounts": total_accounts,
+            "total_balance": total_balance
+        })
+    return response_cache.serve(request, db, current_user.id, "customer_summary", build)
 
 @router.get("/customer/recent-transactions")
-def recent_customer_txn(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def recent_customer_txn(request: Request, db: AsyncSession = Depends(get_read_session), current_user=Depends(get_current_user_async)):
     if current_user.role == "admin":
         raise HTTPException(status_code=403, detail="Customers only")
-    accounts = db.query(Account).filter(Account.user_id == current_user.id).all()
-    account_numbers = [a.account_number for a in accounts]
-    txns = db.query(Transaction).filter(or_(
-        Transaction.sender_account.in_(account_numbers),
-        Transaction.receiver_account.in_(account_numbers)
-    )).order_by(Transaction.timestamp.desc()).limit(5).all()
-    return response([{
-        "txn_ref": t.reference_id,
-        "amount": t.amount,
-        "from": t.sender_account,
-        "to": t.receiver_account,
-        "time": t.timestamp
-    } for t in txns])
+    return await db.run_sync(_recent_customer_txn, request, current_user)
+
+def _recent_customer_txn(db: Session, request: Request, current_user):
+    def build():
+        accounts = db.query(Account).filter(Account.user_id == current_user.id).all()
+        account_numbers = [a.account_number for a in accounts]
+        txns = db.execute(ledger.history(account_numbers, 5)).all() if account_numbers else []
+        return response([{
+            "txn_ref": t.reference_id,
+            "amount": t.amount,
+            "from": t.sender_account,
+            "to": t.receiver_account,
+            "time": t.timestamp
+        } for t in txns])
+    return response_cache.serve(request, db, current_user.id, "customer_recent_transactions", build)
 
 @router.get("/admin/summary")
-def admin_summary(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def admin_summary(db: AsyncSession = Depends(get_read_session), current_user=Depends(get_current_user_async)):
     admin_only(current_user)
-    total_users = db.query(func.count(User.id)).scalar()
-    kyc_pending = db.query(func.count(KYCApplication.id)).filter(KYCApplication.status == "pending").scalar()
-    kyc_approved = db.query(func.count(KYCApplication.id)).filter(KYCApplication.status == "approved").scalar()
-    total_accounts = db.query(func.count(Account.id)).scalar()
-    total_balance = db.query(func.coalesce(func.sum(Account.balance), 0)).scalar()
+    # one primary-key read; the write paths keep this row current (see app/counters.py)
+    stats = await db.run_sync(read_bank_stats)
     return response({
-        "total_users": total_users,
-        "kyc_pending": kyc_pending,
-        "kyc_approved": kyc_approved,
-        "total_accounts": total_accounts,
-        "total_bank_balance": total_balance
+        "total_users": stats["total_users"],
+        "kyc_pending": stats["kyc_pending"],
+        "kyc_approved": stats["kyc_approved"],
+        "total_accounts": stats["total_accounts"],
+        "total_bank_balance": stats["total_balance"]
     })
 
 @router.get("/admin/recent-transactions")
-def admin_recent_txn(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def admin_recent_txn(db: AsyncSession = Depends(get_read_session), current_user=Depends(get_current_user_async)):
     admin_only(current_user)
-    txns = db.query(Transaction).order_by(Transaction.timestamp.desc()).limit(10).all()
+    txns = await db.run_sync(lambda db: db.query(Transaction).order_by(Transaction.timestamp.desc()).limit(10).all())
     return response([{
         "ref": t.reference_id,
         "from": t.sender_account,
@@ -75,3 +83,38 @@ def admin_recent_txn(db: Session = Depends(get_db), current_user=Depends(get_cur
         "amount": t.amount,
         "time": t.timestamp
     } for t in txns])
+
+@router.get("/admin/volume")
+async def admin_volume(
+    granularity: Literal["hour", "day"] = Query("hour"),
+    start: datetime | None = Query(None, description="UTC unless it has an offset; default 24 hours / 30 days before end"),
+    end: datetime | None = Query(None, description="UTC unless it has an offset, exclusive; default now"),
+    account_type: str | None = Query(None, description="Sender account type; default bank-wide"),
+    db: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user_async),
+):
+    admin_only(current_user)
+    step = rollups.GRANULARITIES[granularity]
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - step * (24 if granularity == "hour" else 30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / step > rollups.MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {rollups.MAX_BUCKETS} {granularity} buckets per request")
+    return response({
+        "granularity": granularity,
+        "account_type": account_type or "all",
+        "buckets": await db.run_sync(rollups.volume, granularity, start, end, account_type),
+    })
+
+@router.get("/admin/metrics")
+async def admin_metrics(current_user=Depends(get_current_user_async)):
+    admin_only(current_user)
+    cache = principals.cache
+    return response({
+        **metrics.snapshot(),
+        "principal_cache": {"hits": cache.hits, "misses": cache.misses},
+        "response_cache": response_cache.cache.stats(),
+        "replica": replicas.stats(),
+        "event_subscribers": events.bus.subscriber_count,
+    })
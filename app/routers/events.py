@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import config, events
+from app.database import get_db
+from app.routers.kyc import get_current_user, admin_only
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+TOPICS = {"transactions", "kyc"}
+
+async def _stream(request: Request, sub: events.Subscription):
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            lagged, batch = await sub.next(config.EVENTS_HEARTBEAT_SECONDS)
+            if lagged:
+                # missed events: the client re-reads the current state, then continues live
+                yield "event: reset\ndata: {}\n\n"
+            if batch:
+                yield "".join(ev.encode() for ev in batch)
+            elif not lagged:
+                yield ": keepalive\n\n"
+    finally:
+        events.bus.unsubscribe(sub)
+
+@router.get("/admin", summary="Live transactions and KYC changes (text/event-stream)")
+async def admin_events(
+    request: Request,
+    topics: str = Query("transactions,kyc", description="Comma-separated: transactions, kyc"),
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    admin_only(current_user)
+    db.close()  # nothing else needs a connection while the stream is open
+    wanted = {t.strip() for t in topics.split(",") if t.strip()}
+    if not wanted or not wanted <= TOPICS:
+        raise HTTPException(status_code=400, detail=f"topics must be among {sorted(TOPICS)}")
+    sub = events.bus.subscribe(wanted, last_event_id)
+    return StreamingResponse(
+        _stream(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
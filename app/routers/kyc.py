@@ -1,32 +1,80 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models
+from typing import Literal
+from fastapi import APIRouter, Depends, Query, Request, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_session
+from app import config, events, ledger, models, principals, replicas, response_cache, storage
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-import os
+from datetime import datetime
 from app.security import SECRET_KEY, ALGORITHM
 from app.utils import generate_account_number  
+from app.counters import bump_bank_stats, kyc_status_deltas
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/kyc", tags=["KYC"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-# Utility – get current user
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+MAX_BATCH_DECISIONS = 1_000
+
+# Utility – get current user (claims, then principal cache, then one query)
+def _principal_from_token(token: str):
+    """(subject, principal from claims or cache or None); 401 for a bad token."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        user = db.query(models.User).filter(models.User.email == email).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid user")
-        return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    email = payload.get("sub")
+
+    principal = principals.from_claims(payload)
+    if not principal and config.PRINCIPAL_CACHE_ENABLED:
+        principal = principals.cache.get(email)
+    return email, principal
+
+def _load_principal(db: Session, email: str):
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid user")
+    principal = principals.Principal.from_user(user)
+    if config.PRINCIPAL_CACHE_ENABLED:
+        principals.cache.put(email, principal)
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    email, principal = _principal_from_token(token)
+    return principal or _load_principal(db, email)
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_session)):
+    # Same as get_current_user on the async routes' session; no thread unless the query runs
+    email, principal = _principal_from_token(token)
+    return principal or await db.run_sync(_load_principal, email)
+
+async def get_read_session(current_user=Depends(get_current_user_async), db: AsyncSession = Depends(get_session)):
+    # Read-only routes: the replica, unless it is lagging or this user wrote recently (app/replicas.py)
+    replica = replicas.read_session(current_user.id)
+    if replica is not None and await db.run_sync(replicas.wrote_recently, current_user.id):
+        await replica.close()  # a write made through another worker
+        replica = None
+    if replica is None:
+        yield db
+        return
+    try:
+        yield replica
+    finally:
+        await replica.close()
+
 def admin_only(user):
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access only")
 
+def audit_access(user):
+    # read-only ledger access for compliance (readme.txt: auditor role)
+    if user.role not in ("admin", "auditor"):
+        raise HTTPException(status_code=403, detail="Admin or auditor access only")
+
 # 1. Create KYC Application
 @router.post("/apply")
 def create_kyc_application(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
@@ -34,15 +82,45 @@ def create_kyc_application(db: Session = Depends(get_db), current_user=Depends(g
     if existing_kyc:
         return {"message": "KYC application already exists", "kyc_id": existing_kyc.id}
 
-    new_kyc = models.KYCApplication(user_id=current_user.id)
+    new_kyc = models.KYCApplication(user_id=current_user.id, status="pending")
     db.add(new_kyc)
+    bump_bank_stats(db, **kyc_status_deltas(None, "pending"))
+    db.flush()
+    events.publish_on_commit(db, "kyc", {"kyc_id": new_kyc.id, "user_id": current_user.id, "status": "pending"})
     db.commit()
     db.refresh(new_kyc)
     return {"message": "KYC application created", "kyc_id": new_kyc.id}
 
 # 2. Upload KYC Documents
+def _find_own_kyc(db: Session, kyc_id: int, user_id: int):
+    kyc = db.query(models.KYCApplication).filter(models.KYCApplication.id == kyc_id).first()
+    if not kyc or kyc.user_id != user_id:
+        raise HTTPException(status_code=404, detail="KYC application not found or access denied")
+    return kyc
+
+def _add_document(db: Session, user_id: int, kyc_id: int, document_type: str, sha256: str, size: int, file_path: str):
+    # A re-upload replaces the application's previous document of that type
+    doc = db.query(models.KYCDocument).filter(
+        models.KYCDocument.kyc_id == kyc_id, models.KYCDocument.document_type == document_type
+    ).first()
+    if doc is None:
+        doc = models.KYCDocument(kyc_id=kyc_id, document_type=document_type)
+        db.add(doc)
+    elif doc.blob_sha256 == sha256:
+        db.rollback()
+        return
+    storage.release(db, doc.blob_sha256)
+    storage.add_reference(db, sha256, size)
+    doc.blob_sha256 = sha256
+    doc.file_path = file_path
+    doc.uploaded_at = datetime.utcnow()
+    response_cache.touch(db, user_id)
+    db.commit()
+
+# Async so the file is streamed with async I/O in fixed-size chunks into the
+# content-addressed store (app/storage.py); the database calls still run on the threadpool.
 @router.post("/{kyc_id}/upload")
-def upload_kyc_document(
+async def upload_kyc_document(
     kyc_id: int,
     document_type: str,
     file: UploadFile = File(...),
@@ -52,46 +130,100 @@ def upload_kyc_document(
     allowed_docs = ["aadhaar", "pan", "selfie"]
     if document_type not in allowed_docs:
         raise HTTPException(status_code=400, detail="Invalid document type")
+    filename = storage.safe_filename(file)
 
-    kyc = db.query(models.KYCApplication).filter(models.KYCApplication.id == kyc_id).first()
-    if not kyc or kyc.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="KYC application not found or access denied")
-
-    save_dir = f"storage/kyc/{current_user.id}/{document_type}"
-    os.makedirs(save_dir, exist_ok=True)
-    file_path = f"{save_dir}/{file.filename}"
+    await run_in_threadpool(_find_own_kyc, db, kyc_id, current_user.id)
 
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-
-    new_doc = models.KYCDocument(kyc_id=kyc_id, document_type=document_type, file_path=file_path)
-    db.add(new_doc)
-    db.commit()
+    sha256, size, file_path = await storage.save_upload(file, filename, config.KYC_MAX_UPLOAD_BYTES)
+    await run_in_threadpool(_add_document, db, current_user.id, kyc_id, document_type, sha256, size, file_path)
 
     return {"message": f"{document_type} uploaded successfully"}
 
 # 3. View KYC Status
 @router.get("/status")
-def get_kyc_status(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    kyc = db.query(models.KYCApplication).filter(models.KYCApplication.user_id == current_user.id).first()
-    if not kyc:
-        raise HTTPException(status_code=404, detail="No KYC application found")
-    return {"kyc_id": kyc.id, "status": kyc.status}
+def get_kyc_status(request: Request, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    def build():
+        kyc = db.query(models.KYCApplication).filter(models.KYCApplication.user_id == current_user.id).first()
+        if not kyc:
+            raise HTTPException(status_code=404, detail="No KYC application found")
+        return {"kyc_id": kyc.id, "status": kyc.status}
+    return response_cache.serve(request, db, current_user.id, "kyc_status", build)
 # ---------------- Admin KYC Review ----------------
 
-# 4. Admin - View pending KYC requests
+# 4. Admin - View pending KYC requests (oldest first, keyset-paginated)
 @router.get("/admin/pending")
-def get_pending_kyc(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def get_pending_kyc(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
     # Allow only admin
     admin_only(current_user)
 
-    pending_kyc = db.query(models.KYCApplication).filter(models.KYCApplication.status == "pending").all()
+    query = db.query(models.KYCApplication).filter(models.KYCApplication.status == "pending")
+    if cursor:
+        (after,) = decode_cursor(cursor, int)
+        query = query.filter(models.KYCApplication.id > after)
+    # three queries per page whatever its size: applications, their users, their documents
+    rows = query.options(
+        selectinload(models.KYCApplication.user), selectinload(models.KYCApplication.documents)
+    ).order_by(models.KYCApplication.id).limit(limit + 1).all()
+
+    page = rows[:limit]
     return {
         "message": "Pending KYC applications",
-        "count": len(pending_kyc),
-        "data": pending_kyc
+        "count": len(page),
+        "data": [{
+            "id": k.id,
+            "user_id": k.user_id,
+            "status": k.status,
+            "created_at": k.created_at,
+            "user": {"email": k.user.email, "full_name": k.user.full_name} if k.user else None,
+            "documents": [{
+                "id": d.id,
+                "document_type": d.document_type,
+                "uploaded_at": d.uploaded_at,
+                "sha256": d.blob_sha256,
+            } for d in k.documents],
+        } for k in page],
+        "next_cursor": encode_cursor(page[-1].id) if len(rows) > limit else None,
+        "limit": limit,
     }
 
+def _apply_decisions(db: Session, decisions: list) -> list:
+    """Record (kyc, decision) pairs in the open transaction; returns the new account number per pair (or None).
+
+    Approved applicants without an account get a savings account. Their account numbers are
+    drawn before the first write (the sequence reserves blocks on its own connection), and the
+    bank stats get one combined update.
+    """
+    approved_users = {kyc.user_id for kyc, decision in decisions if decision == "approved"}
+    with_accounts = {
+        user_id for (user_id,) in
+        db.query(models.Account.user_id).filter(models.Account.user_id.in_(approved_users)).distinct()
+    } if approved_users else set()
+    numbers = {user_id: generate_account_number(db) for user_id in sorted(approved_users - with_accounts)}
+
+    totals = {"kyc_pending": 0, "kyc_approved": 0, "total_accounts": len(numbers)}
+    for kyc, decision in decisions:
+        for field, delta in kyc_status_deltas(kyc.status, decision).items():
+            totals[field] += delta
+        kyc.status = decision
+        events.publish_on_commit(db, "kyc", {"kyc_id": kyc.id, "user_id": kyc.user_id, "status": decision})
+
+    db.add_all(
+        models.Account(user_id=user_id, account_number=number, account_type="savings", balance=0)
+        for user_id, number in numbers.items()
+    )
+    ledger.record_openings(db, [(number, 0) for number in numbers.values()])
+    bump_bank_stats(db, **totals)
+
+    created = []
+    for kyc, decision in decisions:
+        created.append(numbers.pop(kyc.user_id, None) if decision == "approved" else None)
+    return created
+
 # 5. Admin - Approve / Reject KYC
 @router.put("/admin/{kyc_id}/verify")
 def verify_kyc(kyc_id: int, decision: str, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
@@ -105,22 +237,55 @@ def verify_kyc(kyc_id: int, decision: str, db: Session = Depends(get_db), curren
     if not kyc:
         raise HTTPException(status_code=404, detail="KYC application not found")
 
-    kyc.status = decision
+    # ✅ If approved, create account automatically (same commit as the decision)
+    (account_number,) = _apply_decisions(db, [(kyc, decision)])
+    response_cache.touch(db, current_user.id)
     db.commit()
+    if account_number:
+        return {"message": "KYC approved and account created", "account_number": account_number}
+    return {"message": f"KYC has been {decision} successfully"}
+
+class KYCDecision(BaseModel):
+    kyc_id: int
+    decision: Literal["approved", "rejected"]
+
+class KYCBatchDecision(BaseModel):
+    decisions: list[KYCDecision] = Field(..., min_length=1, max_length=MAX_BATCH_DECISIONS)
+
+# 6. Admin - Approve / Reject many applications in one transaction
+@router.put("/admin/verify-batch")
+def verify_kyc_batch(batch: KYCBatchDecision, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    admin_only(current_user)
 
-    # ✅ If approved, create account automatically
-    if decision == "approved":
-        existing_account = db.query(models.Account).filter(models.Account.user_id == kyc.user_id).first()
-        if not existing_account:
-            account_number = generate_account_number(db)
-            new_account = models.Account(
-                user_id=kyc.user_id,
-                account_number=account_number,
-                account_type="savings",
-                balance=0
-            )
-            db.add(new_account)
-            db.commit()
-            return {"message": "KYC approved and account created", "account_number": account_number}
-
-    return {"message": f"KYC has been {decision} successfully"}
\ No newline at end of file
+    ids = [d.kyc_id for d in batch.decisions]
+    kycs = {k.id: k for k in db.query(models.KYCApplication).filter(models.KYCApplication.id.in_(ids)).all()}
+    results, decisions, seen = [], [], set()
+    for index, item in enumerate(batch.decisions):
+        kyc = kycs.get(item.kyc_id)
+        if kyc is None or item.kyc_id in seen:
+            detail = "KYC application not found" if kyc is None else "Duplicate kyc_id in batch"
+            results.append({"index": index, "kyc_id": item.kyc_id, "status": "failed", "detail": detail})
+            continue
+        seen.add(item.kyc_id)
+        decisions.append((kyc, item.decision))
+        results.append({"index": index, "kyc_id": item.kyc_id, "status": "success", "decision": item.decision})
+
+    if decisions:
+        created = iter(_apply_decisions(db, decisions))
+        for result in results:
+            if result["status"] == "success":
+                account_number = next(created)
+                if account_number:
+                    result["account_number"] = account_number
+        response_cache.touch(db, current_user.id)
+        db.commit()
+
+    succeeded = len(decisions)
+    return {
+        "message": "Batch processed",
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "accounts_created": sum(1 for r in results if "account_number" in r),
+        "results": results,
+    }
@@ -1,29 +1,223 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, union_all
+from app import ledger
+from app.database import ThreadedSession
 from app.models import Account, Transaction
-from app.routers.kyc import get_current_user, admin_only
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from app.routers.kyc import get_current_user_async, get_read_session, admin_only, audit_access
+from app.utils import naive_utc
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
+txn = Transaction.__table__.c
+
+EXPORT_COLUMNS = ["id", "reference_id", "timestamp", "sender_account", "receiver_account", "amount", "status"]
+EXPORT_CHUNK_ROWS = 1000
+
+class HistoryFilters:
+    """Query parameters shared by the history endpoints."""
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+        start: datetime | None = Query(None, description="Only transactions at or after this time (UTC)"),
+        end: datetime | None = Query(None, description="Only transactions before this time (UTC)"),
+        min_amount: int | None = Query(None, ge=0),
+        max_amount: int | None = Query(None, ge=0),
+        direction: Literal["in", "out"] | None = Query(None, description="Relative to the selected accounts"),
+        counterparty: str | None = Query(None, description="Account number on the other side"),
+    ):
+        self.limit = limit
+        self.after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+        self.start, self.end = naive_utc(start), naive_utc(end)  # columns hold naive UTC
+        self.min_amount, self.max_amount = min_amount, max_amount
+        self.direction = direction
+        self.counterparty = counterparty
+
+    def common(self, timestamp=txn.timestamp, txn_id=txn.id):
+        # the ledger path passes its own (timestamp, transaction_id) so its index drives the scan
+        conds = []
+        if self.after:
+            ts, after_id = self.after
+            conds.append(or_(timestamp < ts, and_(timestamp == ts, txn_id < after_id)))
+        if self.start:
+            conds.append(timestamp >= self.start)
+        if self.end:
+            conds.append(timestamp < self.end)
+        if self.min_amount is not None:
+            conds.append(txn.amount >= self.min_amount)
+        if self.max_amount is not None:
+            conds.append(txn.amount <= self.max_amount)
+        return conds
+
+
+def _branches(filters: HistoryFilters):
+    """Bank-wide history, split into pieces that each map onto one index range."""
+    cp = filters.counterparty
+    if not cp:
+        return [[]]
+    return [[txn.sender_account == cp], [txn.receiver_account == cp, txn.sender_account != cp]]
+
+
+def _history_page(db: Session, filters: HistoryFilters, accounts: list[str] | None = None):
+    # Each branch is an index range scan stopped after limit+1 rows; merging them keeps
+    # every page O(limit) no matter how long the history is. Per-account history reads the
+    # ledger, one (account, timestamp) range per account.
+    fetch = filters.limit + 1
+    if accounts:
+        stmt = ledger.history(
+            accounts, fetch, filters.common(ledger.ent.timestamp, ledger.ent.transaction_id),
+            direction=filters.direction, counterparty=filters.counterparty,
+        )
+    else:
+        common = filters.common()
+        parts = [
+            select(txn).where(*common, *conds).order_by(txn.timestamp.desc(), txn.id.desc()).limit(fetch).subquery()
+            for conds in _branches(filters)
+        ]
+        merged = union_all(*[select(p) for p in parts]).subquery() if len(parts) > 1 else parts[0]
+        stmt = select(merged).order_by(merged.c.timestamp.desc(), merged.c.id.desc()).limit(fetch)
+    rows = db.execute(stmt).mappings().all()
+
+    page = [dict(r) for r in rows[:filters.limit]]
+    next_cursor = encode_cursor(page[-1]["timestamp"], page[-1]["id"]) if len(rows) > filters.limit else None
+    return {"data": page, "next_cursor": next_cursor, "limit": filters.limit}
+
+
 @router.get("/me")
-def get_my_transactions(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def get_my_transactions(
+    account: str | None = Query(None, description="Limit to one of your accounts"),
+    filters: HistoryFilters = Depends(),
+    db: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user_async),
+):
+    return await db.run_sync(_my_transactions, account, filters, current_user)
+
+def _my_transactions(db: Session, account: str | None, filters: HistoryFilters, current_user):
     accounts = db.query(Account).filter(Account.user_id == current_user.id).all()
     if not accounts:
         raise HTTPException(status_code=404, detail="No accounts found")
 
     account_nums = [acc.account_number for acc in accounts]
-    txns = db.query(Transaction).filter(
-        or_(
-            Transaction.sender_account.in_(account_nums),
-            Transaction.receiver_account.in_(account_nums)
-        )
-    ).order_by(Transaction.timestamp.desc()).all()
-
-    return txns
+    if account:
+        if account not in account_nums:
+            raise HTTPException(status_code=404, detail="Account not found")
+        account_nums = [account]
+    return _history_page(db, filters, account_nums)
 
 @router.get("/all")
-def get_all_transactions(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def get_all_transactions(
+    account: str | None = Query(None, description="Only transactions touching this account"),
+    filters: HistoryFilters = Depends(),
+    db: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user_async),
+):
     admin_only(current_user)
-    return db.query(Transaction).order_by(Transaction.timestamp.desc()).all()
+    if filters.direction and not account:
+        raise HTTPException(status_code=400, detail="direction requires an account")
+    return await db.run_sync(_history_page, filters, [account] if account else None)
+
+
+def _encode_chunk(rows, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({col: (r[col].isoformat() if col == "timestamp" and r[col] else r[col]) for col in EXPORT_COLUMNS}) + "\n"
+            for r in rows
+        )
+    buf = io.StringIO()
+    csv.writer(buf).writerows([[r[col] for col in EXPORT_COLUMNS] for r in rows])
+    return buf.getvalue()
+
+class _ExportEncoder:
+    def __init__(self, fmt: str, gzip: bool):
+        self.fmt = fmt
+        self.compressor = zlib.compressobj(wbits=31) if gzip else None
+
+    def emit(self, text: str) -> bytes:
+        data = text.encode()
+        return self.compressor.compress(data) if self.compressor else data
+
+    def head(self) -> bytes:
+        return self.emit(",".join(EXPORT_COLUMNS) + "\r\n") if self.fmt == "csv" else b""
+
+    def chunk(self, rows) -> bytes:
+        return self.emit(_encode_chunk(rows, self.fmt))
+
+    def tail(self) -> bytes:
+        return self.compressor.flush() if self.compressor else b""
+
+def _export_stream(db: Session, stmt, fmt: str, gzip: bool):
+    # Server-side cursor: only one chunk of rows is in memory at a time
+    encoder = _ExportEncoder(fmt, gzip)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS))
+    try:
+        yield encoder.head()
+        for rows in result.mappings().partitions():
+            yield encoder.chunk(rows)
+        yield encoder.tail()
+    finally:
+        result.close()
+
+async def _export_stream_async(db: AsyncSession, stmt, fmt: str, gzip: bool):
+    encoder = _ExportEncoder(fmt, gzip)
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+    try:
+        yield encoder.head()
+        async for rows in result.mappings().partitions():
+            yield encoder.chunk(rows)
+        yield encoder.tail()
+    finally:
+        await result.close()
+
+@router.get("/export")
+async def export_transactions(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    start: datetime | None = Query(None, description="Only transactions at or after this time (UTC)"),
+    end: datetime | None = Query(None, description="Only transactions before this time (UTC)"),
+    account: str | None = Query(None, description="Only transactions touching this account"),
+    db: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user_async),
+):
+    audit_access(current_user)
+    columns = [txn[col] for col in EXPORT_COLUMNS]
+    if account:
+        # account statement: one ledger range scan, one leg per transaction
+        ts = ledger.ent.timestamp
+        stmt = (
+            select(*columns)
+            .select_from(ledger.entries.join(Transaction, txn.id == ledger.ent.transaction_id))
+            .where(ledger.ent.account_number == account)
+            .order_by(ts, ledger.ent.transaction_id)
+        )
+    else:
+        ts = txn.timestamp
+        stmt = select(*columns).order_by(txn.timestamp, txn.id)
+    start, end = naive_utc(start), naive_utc(end)
+    if start:
+        stmt = stmt.where(ts >= start)
+    if end:
+        stmt = stmt.where(ts < end)
+
+    gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="transactions.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    if isinstance(db, ThreadedSession):
+        body = _export_stream(db.sync_session, stmt, format, gzip)
+    else:
+        body = _export_stream_async(db, stmt, format, gzip)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,47 +1,47 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
 
-from app.database import get_db
+from app import config, events, group_commit, idempotency, ledger, response_cache, rollups
+from app.database import get_session, sync_engine_for
 from app.models import Account, Transaction
-from app.routers.kyc import get_current_user  # uses your JWT decode
+from app.routers.kyc import get_current_user_async  # uses your JWT decode
 from app.utils import generate_transaction_reference
+from app.counters import todays_debits_many, try_record_debit
 
 router = APIRouter(prefix="/transfer", tags=["Transfers"])
 
+accounts_table = Account.__table__
+acc = accounts_table.c
+
 # Limits
 MIN_TRANSFER = 1            # ₹
 MAX_PER_TRANSFER = 50_000   # ₹
 DAILY_LIMIT = 200_000       # ₹
+MAX_BATCH_TRANSFERS = 5_000
 
 class TransferRequest(BaseModel):
     sender_account: str = Field(..., description="Account number of the sender")
     receiver_account: str = Field(..., description="Account number of the receiver")
     amount: int = Field(..., gt=0, description="Amount in rupees (integer)")
 
+class BatchTransferRequest(BaseModel):
+    transfers: list[TransferRequest] = Field(..., min_length=1, max_length=MAX_BATCH_TRANSFERS)
+
 def _is_admin(user) -> bool:
     return getattr(user, "role", "") == "admin"
 
-def _today_range_utc():
-    # naive UTC window
-    now = datetime.utcnow()
-    start = datetime(now.year, now.month, now.day)
-    end = start + timedelta(days=1)
-    return start, end
-
-@router.post("", summary="Internal transfer between accounts")
-def make_transfer(req: TransferRequest, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def _validate_transfer(req: TransferRequest, sender, receiver, current_user):
+    # Rules that only depend on the loaded rows; shared by single and batch transfers
     if req.sender_account == req.receiver_account:
         raise HTTPException(status_code=400, detail="Cannot transfer to the same account")
-
-    # Load accounts
-    sender = db.query(Account).filter(Account.account_number == req.sender_account).first()
     if not sender:
         raise HTTPException(status_code=404, detail="Sender account not found")
-
-    receiver = db.query(Account).filter(Account.account_number == req.receiver_account).first()
     if not receiver:
         raise HTTPException(status_code=404, detail="Receiver account not found")
 
@@ -61,51 +61,253 @@ def make_transfer(req: TransferRequest, db: Session = Depends(get_db), current_u
     if req.amount > MAX_PER_TRANSFER:
         raise HTTPException(status_code=400, detail=f"Maximum per transfer is ₹{MAX_PER_TRANSFER}")
 
-    # Daily limit: compute all successful debits from this sender today
-    start, end = _today_range_utc()
-    todays_total = (
-        db.query(func.coalesce(func.sum(Transaction.amount), 0))
-          .filter(
-              Transaction.sender_account == sender.account_number,
-              Transaction.timestamp >= start,
-              Transaction.timestamp < end,
-              Transaction.status == "success",
-          ).scalar()
-    )
+def _check_funds(req: TransferRequest, todays_total: int, balance: int):
+    # In-memory version of the daily-limit and balance rules (batch transfers)
     if todays_total + req.amount > DAILY_LIMIT:
         raise HTTPException(status_code=400, detail="Daily transfer limit exceeded")
+    if balance < req.amount:
+        raise HTTPException(status_code=400, detail="Insufficient funds")
+
+def _load_accounts(db: Session, numbers, lock: bool = False) -> dict:
+    query = db.query(Account).filter(Account.account_number.in_(numbers))
+    if lock:
+        # SELECT ... FOR UPDATE in account-number order, so two transfers between the same accounts
+        # in opposite directions queue on the first row instead of deadlocking (no-op on SQLite,
+        # where the write lock covers the whole database)
+        query = query.order_by(Account.account_number).with_for_update().populate_existing()
+    return {a.account_number: a for a in query.all()}
+
+def _apply_transfer(db: Session, req: TransferRequest, current_user) -> dict:
+    """Validate and write one transfer in the session's open transaction; the caller commits or rolls back.
 
-    # Balance check
-    if sender.balance < req.amount:
+    Both account rows are locked first (see _load_accounts). Daily limit, balance and account
+    status are still enforced by conditional UPDATEs and their row counts, so concurrent
+    transfers on a hot account are serialized by the database and can never both pass a check
+    that only one of them satisfies. One timestamp, read once the first UPDATE holds the write
+    lock (SQLite has no row locks), dates the daily-limit bucket and the transaction and ledger
+    rows, so each account's ledger is in commit order and the debit counts on the day it is dated.
+    """
+    if req.sender_account == req.receiver_account:
+        raise HTTPException(status_code=400, detail="Cannot transfer to the same account")
+
+    accounts = _load_accounts(db, [req.sender_account, req.receiver_account], lock=True)
+    sender, receiver = accounts.get(req.sender_account), accounts.get(req.receiver_account)
+    _validate_transfer(req, sender, receiver, current_user)
+    response_cache.touch(db, sender.user_id, receiver.user_id, current_user.id)
+
+    debit = db.execute(
+        update(accounts_table)
+        .where(acc.account_number == req.sender_account, acc.status == "active", acc.balance >= req.amount)
+        .values(balance=acc.balance - req.amount)
+    )
+    if debit.rowcount != 1:
+        status = db.execute(select(acc.status).where(acc.account_number == req.sender_account)).scalar()
+        if status != "active":
+            raise HTTPException(status_code=400, detail="Sender account is not active")
         raise HTTPException(status_code=400, detail="Insufficient funds")
 
-    # Atomic transfer
-    try:
-            # Update balances
-            sender.balance = sender.balance - req.amount
-            receiver.balance = receiver.balance + req.amount
-
-            # Create transaction record (only for success, per your choice)
-            ref = generate_transaction_reference()
-            txn = Transaction(
-                sender_account=sender.account_number,
-                receiver_account=receiver.account_number,
-                amount=req.amount,
-                status="success",
-                reference_id=ref,
-            )
-            db.add(txn)
-            db.commit()               
-            db.refresh(sender)        
-            db.refresh(receiver)
-    except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
+    now = datetime.utcnow()
+    if not try_record_debit(db, req.sender_account, req.amount, DAILY_LIMIT, now.date()):
+        raise HTTPException(status_code=400, detail="Daily transfer limit exceeded")
 
+    credit = db.execute(
+        update(accounts_table)
+        .where(acc.account_number == req.receiver_account, acc.status == "active")
+        .values(balance=acc.balance + req.amount)
+    )
+    if credit.rowcount != 1:
+        raise HTTPException(status_code=400, detail="Receiver account is not active")
 
+    # Create transaction record (only for success, per your choice) and its two ledger legs
+    ref = generate_transaction_reference()
+    inserted = db.execute(insert(Transaction.__table__).values(
+        sender_account=req.sender_account,
+        receiver_account=req.receiver_account,
+        amount=req.amount,
+        status="success",
+        timestamp=now,
+        reference_id=ref,
+    ))
+    ledger.record_transfer(db, inserted.inserted_primary_key[0], req.sender_account, req.receiver_account, req.amount, now)
+    rollups.record(db, {sender.account_type: (1, req.amount)}, now)
+    events.publish_on_commit(db, "transactions", {
+        "ref": ref, "from": req.sender_account, "to": req.receiver_account, "amount": req.amount, "time": now,
+    })
     return {
         "message": "Transfer successful",
         "reference_id": ref,
-        "debited_from": sender.account_number,
-        "credited_to": receiver.account_number,
+        "debited_from": req.sender_account,
+        "credited_to": req.receiver_account,
         "amount": req.amount
     }
+
+@router.post("", summary="Internal transfer between accounts")
+async def make_transfer(
+    req: TransferRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_session),
+    current_user = Depends(get_current_user_async),
+):
+    if idempotency_key:
+        previous = await db.run_sync(idempotency.replay, current_user.id, idempotency_key, "transfer", req, response)
+        if previous is not None:
+            return previous
+
+    def settle(session: Session) -> dict:
+        result = _apply_transfer(session, req, current_user)
+        if idempotency_key:
+            idempotency.remember(session, current_user.id, idempotency_key, "transfer", req, result)
+        return result
+
+    def settle_and_commit(session: Session) -> dict:
+        result = settle(session)
+        session.commit()
+        return result
+
+    try:
+        if config.TRANSFER_GROUP_COMMIT:
+            # Fail fast on the static rules here, in parallel; the writer re-checks everything
+            bind = await db.run_sync(_precheck_transfer, req, current_user)
+            writer = group_commit.writer_for(sync_engine_for(bind))
+            result = await asyncio.wrap_future(writer.submit(settle))
+        else:
+            result = await db.run_sync(settle_and_commit)
+    except HTTPException:
+        await db.rollback()
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        # A concurrent resend with the same key committed first: answer with its outcome
+        previous = idempotency_key and await db.run_sync(
+            idempotency.replay, current_user.id, idempotency_key, "transfer", req, response
+        )
+        if previous:
+            return previous
+        raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
+    return result
+
+def _precheck_transfer(db: Session, req: TransferRequest, current_user):
+    if req.sender_account == req.receiver_account:
+        raise HTTPException(status_code=400, detail="Cannot transfer to the same account")
+    accounts = _load_accounts(db, [req.sender_account, req.receiver_account])
+    _validate_transfer(req, accounts.get(req.sender_account), accounts.get(req.receiver_account), current_user)
+    return db.get_bind()
+
+@router.post("/batch", summary="Settle many internal transfers in one database transaction")
+async def make_batch_transfer(batch: BatchTransferRequest, db: AsyncSession = Depends(get_session), current_user = Depends(get_current_user_async)):
+    return await db.run_sync(_make_batch_transfer, batch, current_user)
+
+def _make_batch_transfer(db: Session, batch: BatchTransferRequest, current_user):
+    # Load every account involved with one query
+    numbers = {t.sender_account for t in batch.transfers} | {t.receiver_account for t in batch.transfers}
+    accounts = _load_accounts(db, numbers, lock=True)
+
+    # Today's debit counters for every sender with one query
+    senders = {t.sender_account for t in batch.transfers}
+    todays_totals = todays_debits_many(db, senders, datetime.utcnow().date())
+
+    # Apply the rules in memory, in request order, so later items see earlier debits/credits
+    balances = {num: a.balance for num, a in accounts.items()}
+    deltas, debited = {}, {}
+    results, rows = [], []
+    for index, req in enumerate(batch.transfers):
+        sender = accounts.get(req.sender_account)
+        receiver = accounts.get(req.receiver_account)
+        try:
+            _validate_transfer(req, sender, receiver, current_user)
+            _check_funds(req, todays_totals.get(req.sender_account, 0), balances[req.sender_account])
+        except HTTPException as e:
+            results.append({"index": index, "status": "failed", "status_code": e.status_code, "detail": e.detail})
+            continue
+
+        balances[sender.account_number] -= req.amount
+        balances[receiver.account_number] += req.amount
+        deltas[sender.account_number] = deltas.get(sender.account_number, 0) - req.amount
+        deltas[receiver.account_number] = deltas.get(receiver.account_number, 0) + req.amount
+        todays_totals[sender.account_number] = todays_totals.get(sender.account_number, 0) + req.amount
+        debited[sender.account_number] = debited.get(sender.account_number, 0) + req.amount
+
+        ref = generate_transaction_reference()
+        rows.append({
+            "sender_account": sender.account_number,
+            "receiver_account": receiver.account_number,
+            "amount": req.amount,
+            "status": "success",
+            "reference_id": ref,
+        })
+        results.append({
+            "index": index,
+            "status": "success",
+            "reference_id": ref,
+            "debited_from": sender.account_number,
+            "credited_to": receiver.account_number,
+            "amount": req.amount,
+        })
+
+    # Net balance changes are applied relative to the stored balance and re-checked in SQL,
+    # so a transfer committed by another request since the accounts were read cannot be lost.
+    if rows:
+        try:
+            changed = [{"num": num, "delta": delta} for num, delta in deltas.items() if delta]
+            stmt = (
+                update(accounts_table)
+                .where(
+                    acc.account_number == bindparam("num"),
+                    acc.status == "active",
+                    acc.balance + bindparam("delta") >= 0,
+                )
+                .values(balance=acc.balance + bindparam("delta"))
+            )
+            if db.get_bind().dialect.supports_sane_multi_rowcount:
+                matched = db.execute(stmt, changed).rowcount
+            else:
+                matched = sum(db.execute(stmt, [params]).rowcount for params in changed)
+            if matched != len(changed):
+                raise HTTPException(status_code=409, detail="Accounts changed during the batch; retry")
+            # One timestamp, read under the write lock, for the debit counters and every row
+            now = datetime.utcnow()
+            for account_number, amount in debited.items():
+                if not try_record_debit(db, account_number, amount, DAILY_LIMIT, now.date()):
+                    raise HTTPException(status_code=409, detail="Accounts changed during the batch; retry")
+            for row in rows:
+                row["timestamp"] = now
+            db.execute(insert(Transaction.__table__), rows)
+            ids = dict(db.execute(
+                select(Transaction.reference_id, Transaction.id)
+                .where(Transaction.reference_id.in_([r["reference_id"] for r in rows]))
+            ).all())
+            ledger.record_transfers(db, [
+                (ids[r["reference_id"]], r["sender_account"], r["receiver_account"], r["amount"]) for r in rows
+            ], now)
+            volume = {}
+            for r in rows:
+                account_type = accounts[r["sender_account"]].account_type
+                transfers, amount = volume.get(account_type, (0, 0))
+                volume[account_type] = (transfers + 1, amount + r["amount"])
+            rollups.record(db, volume, now)
+            for r in rows:
+                events.publish_on_commit(db, "transactions", {
+                    "ref": r["reference_id"], "from": r["sender_account"], "to": r["receiver_account"],
+                    "amount": r["amount"], "time": now,
+                })
+            response_cache.touch(db, current_user.id, *{accounts[num].user_id for num in deltas})
+            db.commit()
+        except HTTPException:
+            db.rollback()
+            raise
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Batch transfer failed: {str(e)}")
+
+    succeeded = len(rows)
+    return {
+        "message": "Batch processed",
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
@@ -1,21 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from fastapi import HTTPException
 from jose import jwt
 from passlib.context import CryptContext
 
+from app import config, metrics
+
 SECRET_KEY = "mysecretkey123"  # Change later
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with a different cost are flagged by verify_and_update and rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
 
-def hash_password(password: str):
+def _truncate(password: str) -> str:
     # Ensure password not longer than 72 bytes (bcrypt limit)
-    password = password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
-    return pwd_context.hash(password)
+    return password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
+
+def hash_password(password: str):
+    return pwd_context.hash(_truncate(password))
 
 def verify_password(plain_password, hashed_password):
-    plain_password = plain_password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    """(valid, new_hash); new_hash is set when the stored hash should be replaced (e.g. BCRYPT_ROUNDS changed)."""
+    return pwd_context.verify_and_update(_truncate(plain_password), hashed_password)
+
+class HashExecutor:
+    """bcrypt on its own bounded pool, so login bursts cannot starve the request threadpool.
+
+    bcrypt releases the GIL, so `workers` threads hash on that many cores. At most `max_pending`
+    jobs may be queued or running; beyond that submit() fails immediately with 503.
+    """
+    def __init__(self, workers: int, max_pending: int):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._queue_wait = metrics.summary("hash.queue_wait_seconds")
+        self._exec_time = metrics.summary("hash.exec_seconds")
+        self._rejected = metrics.counter("hash.rejected")
+
+    def _timed(self, submitted: float, fn, args):
+        started = time.perf_counter()
+        self._queue_wait.observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            self._exec_time.observe(time.perf_counter() - started)
+            self._slots.release()
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._rejected.inc()
+            raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+        try:
+            future = self._pool.submit(self._timed, time.perf_counter(), fn, args)
+        except BaseException:
+            self._slots.release()
+            raise
+        return await asyncio.wrap_future(future)
+
+hash_executor = HashExecutor(config.HASH_WORKERS, config.HASH_MAX_PENDING)
+
+async def hash_password_async(password: str):
+    return await hash_executor.run(hash_password, password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await hash_executor.run(verify_and_update_password, plain_password, hashed_password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -0,0 +1,80 @@
+"""Block-allocated sequences backed by the `sequences` table.
+
+Each process reserves `block_size` numbers at a time with one atomic
+`UPDATE sequences SET next_value = next_value + block_size` in its own short transaction,
+then hands them out from memory. Reservations commit independently of the request that
+triggered them, so numbers are never reused across processes or restarts; a process that
+exits with part of a block unused simply leaves a gap.
+"""
+import threading
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from app import config
+from app.models import Account, IdSequence
+
+
+def _account_number_seed(conn) -> int:
+    # Continue after every number issued so far, whether id-based or from an earlier sequence
+    highest = 0
+    for (number,) in conn.execute(select(Account.account_number)):
+        if number and number[4:].isdigit():
+            highest = max(highest, int(number[4:]))
+    last_id = conn.execute(select(Account.id).order_by(Account.id.desc()).limit(1)).scalar() or 0
+    return max(highest, last_id) + 1
+
+
+class BlockSequence:
+    def __init__(self, name: str, block_size: int, seed):
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed
+        self._blocks = {}  # engine url -> [next, end)
+        self._lock = threading.Lock()
+
+    def _reserve(self, engine) -> tuple[int, int]:
+        table = IdSequence.__table__
+        with engine.begin() as conn:
+            bump = (
+                update(table).where(table.c.name == self.name)
+                .values(next_value=table.c.next_value + self.block_size)
+            )
+            if conn.execute(bump).rowcount == 0:
+                values = {"name": self.name, "next_value": self.seed(conn)}
+                if conn.dialect.name == "sqlite":
+                    conn.execute(sqlite.insert(table).values(**values).on_conflict_do_nothing())
+                elif conn.dialect.name in ("mysql", "mariadb"):
+                    conn.execute(mysql.insert(table).values(**values).prefix_with("IGNORE"))
+                else:
+                    conn.execute(table.insert().values(**values))
+                conn.execute(bump)
+            end = conn.execute(select(table.c.next_value).where(table.c.name == self.name)).scalar()
+        return end - self.block_size, end
+
+    def next_value(self, db: Session) -> int:
+        # Reserve on the session's engine, but outside its transaction. The lock is never held
+        # across the reservation: under an AsyncSession this runs on the event-loop thread, so a
+        # second caller blocking on the lock would stall the loop the first one is waiting on.
+        engine = db.get_bind().engine
+        key = engine.url.render_as_string(hide_password=True)
+        while True:
+            with self._lock:
+                start, end = self._blocks.get(key, (0, 0))
+                if start < end:
+                    self._blocks[key] = (start + 1, end)
+                    return start
+            block = self._reserve(engine)
+            with self._lock:
+                # another caller may have installed a block meanwhile; ours is then left as a gap
+                start, end = self._blocks.get(key, (0, 0))
+                if start >= end:
+                    self._blocks[key] = block
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+account_numbers = BlockSequence("account_number", config.ACCOUNT_NUMBER_BLOCK_SIZE, _account_number_seed)
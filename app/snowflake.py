@@ -0,0 +1,105 @@
+"""Snowflake-style 63-bit IDs: milliseconds since EPOCH_MS | 10-bit worker id | 12-bit sequence.
+
+IDs are unique as long as no two live processes share a worker id, and they sort by creation
+time. Set WORKER_ID (0-1023) explicitly when several hosts write to the same database. Otherwise
+each process claims a free slot by taking an exclusive lock on one of the files in
+SNOWFLAKE_LOCK_DIR. The lock is released when the process exits, so slots can be reused.
+"""
+import os
+import tempfile
+import threading
+import time
+
+EPOCH_MS = 1_735_689_600_000  # 2025-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKERS = 1 << WORKER_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+ID_DIGITS = 19  # 63-bit ids fit in 19 decimal digits; zero-padding keeps string order == time order
+
+
+def _lock_file(fd) -> bool:
+    try:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:  # Windows
+        import msvcrt
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+    except OSError:
+        return False
+    return True
+
+
+def claim_worker_id() -> tuple[int, int | None]:
+    """Return (worker_id, fd holding the slot lock); the fd must stay open for the process lifetime."""
+    if os.getenv("WORKER_ID") is not None:
+        worker_id = int(os.environ["WORKER_ID"])
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"WORKER_ID must be between 0 and {MAX_WORKERS - 1}")
+        return worker_id, None
+
+    lock_dir = os.getenv("SNOWFLAKE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "corebank-workers"))
+    os.makedirs(lock_dir, exist_ok=True)
+    start = os.getpid() % MAX_WORKERS
+    for offset in range(MAX_WORKERS):
+        worker_id = (start + offset) % MAX_WORKERS
+        fd = os.open(os.path.join(lock_dir, f"worker-{worker_id}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        if _lock_file(fd):
+            return worker_id, fd
+        os.close(fd)
+    raise RuntimeError(f"All {MAX_WORKERS} snowflake worker slots in {lock_dir} are taken")
+
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKERS - 1}")
+        self.worker_id = worker_id
+        self._last_ms = 0
+        self._sequence = 0
+        # Guards a handful of integer operations; never held across I/O or sleeps
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now <= self._last_ms:
+                # Same millisecond, or the clock stepped back: keep counting on the last timestamp
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    # 4096 ids used up in this millisecond: borrow the next one instead of sleeping
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+_generator = None
+_worker_fd = None
+_init_lock = threading.Lock()
+
+
+def next_id() -> int:
+    """Next id from this process's generator, claiming a worker id on first use."""
+    global _generator, _worker_fd
+    if _generator is None:
+        with _init_lock:
+            if _generator is None:
+                worker_id, _worker_fd = claim_worker_id()
+                _generator = SnowflakeGenerator(worker_id)
+    return _generator.next_id()
+
+
+def _reset_after_fork():
+    # A forked child must not reuse the parent's worker id
+    global _generator, _worker_fd
+    _generator, _worker_fd = None, None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
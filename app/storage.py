@@ -0,0 +1,217 @@
+"""Content-addressed, deduplicating store for KYC documents.
+
+Every file is stored once per unique content, at
+KYC_STORAGE_DIR/blobs/<sha[:2]>/<sha[2:4]>/<sha256>, and is described by a `kyc_blobs` row whose
+refcount is the number of KYCDocument rows pointing at it. The refcount changes in the same
+commit as those rows. Uploading an identical file again, from any user or flow, adds a
+reference and no bytes. A re-upload of a document type replaces that application's previous
+document instead of piling up next to it.
+
+save_upload() streams an upload in UPLOAD_CHUNK_BYTES pieces with async file I/O, so memory per
+upload stays constant whatever the file size. While streaming it:
+- hashes the content
+- checks the leading bytes against the signature of the declared type
+- enforces the size limit
+The data goes to a hidden temporary file, which is fsynced and renamed into its shard. If the
+content is already stored, the temporary file is dropped. Readers never see a partial blob.
+
+gc() removes blobs that no document references, and stray files (interrupted uploads, and the
+pre-blob layout after migrate_legacy() copied it over). Anything modified within
+KYC_BLOB_GC_GRACE_SECONDS is skipped, and an upload that reuses a blob touches it, so an upload
+in flight never loses its file. Run it with `python -m app.maintenance gc-kyc-blobs`.
+"""
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime
+
+import anyio
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app import config
+from app.counters import _insert_ignore
+from app.models import KYCBlob, KYCDocument
+
+# Leading bytes of every allowed document type, by file extension
+SIGNATURES = {
+    ".pdf": (b"%PDF-",),
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+}
+
+
+def blob_root() -> str:
+    return os.path.join(config.KYC_STORAGE_DIR, "blobs")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(blob_root(), sha256[:2], sha256[2:4], sha256)
+
+
+def _partial_path() -> str:
+    return os.path.join(blob_root(), "tmp", f".{uuid.uuid4().hex}.part")
+
+
+def _commit_blob(partial: str, sha256: str) -> str:
+    """Move a complete, fsynced temporary file to its blob path, or drop it if the content is stored."""
+    final = blob_path(sha256)
+    try:
+        os.utime(final)  # already stored: refresh its mtime so gc() leaves it alone
+        os.unlink(partial)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(partial, final)
+    return final
+
+
+def safe_filename(upload: UploadFile) -> str:
+    """Client file name without any directory part; 415 if its extension is not an allowed type."""
+    name = os.path.basename((upload.filename or "").replace("\\", "/"))
+    ext = os.path.splitext(name)[1].lower()
+    if not name or name.startswith(".") or ext not in SIGNATURES:
+        raise HTTPException(status_code=415, detail=f"Allowed file types: {', '.join(sorted(SIGNATURES))}")
+    return name
+
+
+async def save_upload(upload: UploadFile, filename: str, max_bytes: int) -> tuple[str, int, str]:
+    """Stream `upload` into the store; returns (sha256, size in bytes, blob path)."""
+    signatures = SIGNATURES[os.path.splitext(filename)[1].lower()]
+    partial = anyio.Path(_partial_path())
+    await partial.parent.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(partial, "wb") as out:
+            while chunk := await upload.read(config.UPLOAD_CHUNK_BYTES):
+                if size == 0 and not chunk.startswith(signatures):
+                    raise HTTPException(status_code=415, detail="File content does not match its type")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                await out.write(chunk)
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Empty file")
+            await out.flush()
+            await anyio.to_thread.run_sync(os.fsync, out.wrapped.fileno())
+        sha256 = digest.hexdigest()
+        path = await anyio.to_thread.run_sync(_commit_blob, str(partial), sha256)
+    except BaseException:
+        await partial.unlink(missing_ok=True)
+        raise
+    return sha256, size, path
+
+
+def add_reference(db: Session, sha256: str, size: int):
+    """Count one more document pointing at the blob, in the caller's transaction."""
+    _insert_ignore(db, KYCBlob, {"sha256": sha256, "size": size, "refcount": 0, "created_at": datetime.utcnow()})
+    db.execute(update(KYCBlob).where(KYCBlob.sha256 == sha256).values(refcount=KYCBlob.refcount + 1))
+
+
+def release(db: Session, sha256: str | None):
+    if sha256:
+        db.execute(update(KYCBlob).where(KYCBlob.sha256 == sha256).values(refcount=KYCBlob.refcount - 1))
+
+
+def _ingest_file(path: str) -> tuple[str, int]:
+    """Copy an existing file into the store (blocking); returns (sha256, size)."""
+    digest = hashlib.sha256()
+    partial = _partial_path()
+    os.makedirs(os.path.dirname(partial), exist_ok=True)
+    size = 0
+    try:
+        with open(path, "rb") as src, open(partial, "wb") as out:
+            while chunk := src.read(config.UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        sha256 = digest.hexdigest()
+        _commit_blob(partial, sha256)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    return sha256, size
+
+
+def migrate_legacy(db: Session) -> dict:
+    """Copy documents saved under the old per-user layout into the store and repoint their rows.
+
+    The old files are left in place; gc() removes them once nothing references their path.
+    """
+    moved, missing = 0, []
+    for doc in db.query(KYCDocument).filter(KYCDocument.blob_sha256.is_(None)).all():
+        if not doc.file_path or not os.path.isfile(doc.file_path):
+            missing.append(doc.id)
+            continue
+        sha256, size = _ingest_file(doc.file_path)
+        add_reference(db, sha256, size)
+        doc.blob_sha256 = sha256
+        doc.file_path = blob_path(sha256)
+        moved += 1
+    db.commit()
+    return {"moved": moved, "missing": missing}
+
+
+def gc(db: Session, dry_run: bool = False, grace_seconds: int | None = None) -> dict:
+    """Fix refcount drift, then delete unreferenced blobs and stray files older than the grace period."""
+    grace = config.KYC_BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace
+
+    # Documents are the source of truth for references
+    counted = dict(db.execute(
+        select(KYCDocument.blob_sha256, func.count())
+        .where(KYCDocument.blob_sha256.isnot(None)).group_by(KYCDocument.blob_sha256)
+    ).all())
+    stored = dict(db.execute(select(KYCBlob.sha256, KYCBlob.refcount)).all())
+    drift = {
+        sha: {"refcount": stored[sha], "documents": counted.get(sha, 0)}
+        for sha in stored if stored[sha] != counted.get(sha, 0)
+    }
+
+    def old_enough(path: str) -> bool:
+        try:
+            return os.stat(path).st_mtime < cutoff
+        except FileNotFoundError:
+            return True
+
+    unreferenced = [sha for sha in stored if not counted.get(sha) and old_enough(blob_path(sha))]
+    keep = {os.path.abspath(blob_path(sha)) for sha in stored}
+    keep |= {os.path.abspath(p) for p in db.execute(select(KYCDocument.file_path)).scalars() if p}
+    strays = [
+        path
+        for directory, _, files in os.walk(config.KYC_STORAGE_DIR)
+        for path in (os.path.join(directory, f) for f in files)
+        if os.path.abspath(path) not in keep and old_enough(path)
+    ]
+    if dry_run:
+        return {"refcount_drift": drift, "removed_blobs": len(unreferenced), "removed_files": len(strays), "bytes_freed": 0}
+
+    for sha, entry in drift.items():
+        # relative, so a reference committed since the count above is kept
+        db.execute(update(KYCBlob).where(KYCBlob.sha256 == sha)
+                   .values(refcount=KYCBlob.refcount + (entry["documents"] - entry["refcount"])))
+    removed = [
+        sha for sha in unreferenced
+        if db.execute(delete(KYCBlob).where(KYCBlob.sha256 == sha, KYCBlob.refcount <= 0)).rowcount
+    ]
+    db.commit()
+
+    freed = 0
+    for path in strays + [blob_path(sha) for sha in removed]:
+        if not old_enough(path):
+            continue  # reused by an upload since the scan
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return {"refcount_drift": drift, "removed_blobs": len(removed), "removed_files": len(strays), "bytes_freed": freed}
@@ -0,0 +1,121 @@
+"""Failed-login throttling keyed by username and by client IP.
+
+Each key counts failed password checks within LOGIN_FAILURE_WINDOW_SECONDS. From the
+LOGIN_MAX_FAILURES-th failure on (LOGIN_MAX_FAILURES_PER_IP for IPs) the key is locked out for
+LOGIN_LOCKOUT_BASE_SECONDS, doubling with every further failure up to LOGIN_LOCKOUT_MAX_SECONDS.
+Attempts made during a lockout are rejected before the user lookup and bcrypt, and are not
+counted, so a rejection costs a dictionary (or single-row SQLite) lookup.
+
+State is per process by default. Set LOGIN_THROTTLE_STORE to a file path to share it between
+uvicorn workers on the same host through a small SQLite database.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app import config
+
+
+class MemoryStore:
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> (failures, window_start, blocked_until)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self._entries.get(key)
+
+    def update(self, key: str, fn):
+        with self._lock:
+            self._entries[key] = fn(self._entries.get(key))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore:
+    blocking = True  # may wait up to its 5 s busy timeout for another worker's write
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS login_throttle "
+            "(key TEXT PRIMARY KEY, failures INTEGER, window_start REAL, blocked_until REAL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT failures, window_start, blocked_until FROM login_throttle WHERE key = ?", (key,)
+            ).fetchone()
+
+    def update(self, key: str, fn):
+        with self._lock:
+            # IMMEDIATE: read-modify-write must not interleave with another worker's
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT failures, window_start, blocked_until FROM login_throttle WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute("INSERT OR REPLACE INTO login_throttle VALUES (?, ?, ?, ?)", (key, *fn(row)))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM login_throttle WHERE key = ?", (key,))
+
+
+class LoginThrottle:
+    def __init__(self, store):
+        self.store = store
+
+    def _keys(self, username: str, ip: str | None):
+        keys = [(f"user:{username.strip().lower()}", config.LOGIN_MAX_FAILURES)]
+        if ip:
+            keys.append((f"ip:{ip}", config.LOGIN_MAX_FAILURES_PER_IP))
+        return keys
+
+    def retry_after(self, username: str, ip: str | None) -> float:
+        """Seconds until a login for this username/IP may be attempted; 0 if allowed now."""
+        now = time.time()
+        wait = 0.0
+        for key, _ in self._keys(username, ip):
+            entry = self.store.get(key)
+            if entry:
+                wait = max(wait, entry[2] - now)
+        return wait
+
+    def record_failure(self, username: str, ip: str | None):
+        now = time.time()
+        for key, limit in self._keys(username, ip):
+            def bump(entry, limit=limit):
+                failures, window_start, blocked_until = entry or (0, now, 0.0)
+                if now - window_start > config.LOGIN_FAILURE_WINDOW_SECONDS and now >= blocked_until:
+                    failures, window_start = 0, now
+                failures += 1
+                if failures >= limit:
+                    lockout = config.LOGIN_LOCKOUT_BASE_SECONDS * 2 ** (failures - limit)
+                    blocked_until = now + min(lockout, config.LOGIN_LOCKOUT_MAX_SECONDS)
+                return failures, window_start, blocked_until
+            self.store.update(key, bump)
+
+    def record_success(self, username: str, ip: str | None):
+        # only the username is cleared; an IP that fails for many accounts stays counted
+        self.store.delete(self._keys(username, None)[0][0])
+
+
+login_throttle = LoginThrottle(
+    SQLiteStore(config.LOGIN_THROTTLE_STORE) if config.LOGIN_THROTTLE_STORE else MemoryStore(config.LOGIN_THROTTLE_MAX_KEYS)
+)
@@ -1,17 +1,19 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from app.models import Account
-import random
-import string
+from app import sequences, snowflake
 
 def generate_account_number(db: Session):
+    # Served from this process's reserved block; one UPDATE per ACCOUNT_NUMBER_BLOCK_SIZE accounts
     year = datetime.now().year
-    last_account = db.query(Account).order_by(Account.id.desc()).first()
-    if last_account:
-        seq = last_account.id + 1
-    else:
-        seq = 1
+    seq = sequences.account_numbers.next_value(db)
     return f"{year}{seq:06d}"  # Example: 2025000001
 
 def generate_transaction_reference():
-    return "TXN" + ''.join(random.choices(string.digits, k=9))
+    # Snowflake id: unique across workers and ordered by time, so reference ranges follow timestamps
+    return f"TXN{snowflake.next_id():0{snowflake.ID_DIGITS}d}"
+
+def naive_utc(value: datetime | None) -> datetime | None:
+    # Stored timestamps are naive UTC; bring client-supplied aware datetimes to the same form
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,133 @@
+"""Requests per second and p99 latency of the hot routes with DB_ASYNC on and off, at high concurrency.
+
+    python -m benchmarks.bench_async_path [--concurrency 200] [--requests 4000] [--users 20]
+
+Starts the real app under uvicorn once per mode, on a throwaway SQLite database, and drives it
+over HTTP with that many requests in flight: a mix of GET /dashboard/customer/summary,
+GET /transactions/me and POST /transfer. The response cache is off so every request reaches the
+database. With DB_ASYNC=0 each request holds one of Starlette's ~40 threadpool threads while it
+waits; with DB_ASYNC=1 it waits on the event loop.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(tmp: str, use_async: bool, **extra_env):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "DB_ASYNC": "1" if use_async else "0",
+        "KYC_STORAGE_DIR": os.path.join(tmp, "kyc"),
+        "BCRYPT_ROUNDS": "4",
+        "RESPONSE_CACHE_ENABLED": "0",
+        "LOGIN_THROTTLE_ENABLED": "0",
+        **extra_env,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base}/docs", timeout=1)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def _seed(base: str, users: int):
+    """Customers with an approved KYC and a funded current account; returns [(auth headers, account number)]."""
+    with httpx.Client(base_url=base, timeout=30) as client:
+        client.post("/auth/create-admin", json={"email": "benchadmin@test.com", "password": "Admin@123"})
+        admin = client.post("/auth/login", data={"username": "benchadmin@test.com", "password": "Admin@123"}).json()
+        admin_headers = {"Authorization": f"Bearer {admin['access_token']}"}
+        seeded = []
+        for n in range(users):
+            email = f"bench{n}@test.com"
+            client.post("/auth/register", json={"email": email, "password": "Bench@123", "full_name": f"B{n}"})
+            token = client.post("/auth/login", data={"username": email, "password": "Bench@123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            kyc_id = client.post("/kyc/apply", headers=headers).json()["kyc_id"]
+            client.put(f"/kyc/admin/{kyc_id}/verify", headers=admin_headers, params={"decision": "approved"})
+            account = client.post("/accounts/create", headers=headers,
+                                  json={"account_type": "current", "initial_deposit": 1_000_000}).json()
+            seeded.append((headers, account["account_number"]))
+        return seeded
+
+
+async def _load(base: str, seeded, concurrency: int, count: int):
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+        queue = asyncio.Queue()
+        for _ in range(count):
+            queue.put_nowait(random.random())
+
+        async def worker():
+            nonlocal failures
+            while not queue.empty():
+                pick = queue.get_nowait()
+                (headers, account), (_, other) = random.sample(seeded, 2)
+                t0 = time.perf_counter()
+                try:
+                    if pick < 0.4:
+                        r = await client.get("/dashboard/customer/summary", headers=headers)
+                    elif pick < 0.8:
+                        r = await client.get("/transactions/me", headers=headers, params={"limit": 20})
+                    else:
+                        r = await client.post("/transfer", headers=headers,
+                                              json={"sender_account": account, "receiver_account": other, "amount": 1})
+                    failures += r.status_code >= 500
+                except httpx.TransportError:  # timeouts, dropped keep-alive connections
+                    failures += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, failures, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4_000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    for use_async in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc, base = _start(tmp, use_async)
+            try:
+                seeded = _seed(base, args.users)
+                latencies, failures, elapsed = asyncio.run(_load(base, seeded, args.concurrency, args.requests))
+            finally:
+                proc.terminate()
+                proc.wait()
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        label = "DB_ASYNC=1 (async session)" if use_async else "DB_ASYNC=0 (threadpool) "
+        print(f"{label}: {len(latencies) / elapsed:,.0f} req/s | p50 {latencies[len(latencies) // 2] * 1000:.0f} ms"
+              f" | p99 {p99:.0f} ms | errors {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latency of authenticated GETs with the principal cache off, on, and with principal claims.
+
+    python -m benchmarks.bench_auth_cache [--requests 2000]
+
+Runs the real app in-process (TestClient) against a throwaway SQLite database and times
+GET /kyc/status, which needs get_current_user plus one query of its own.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import config, principals
+from app.database import Base, get_db
+from app.main import app
+
+
+def _measure(client, headers, count):
+    timings = []
+    for _ in range(count):
+        t0 = time.perf_counter()
+        r = client.get("/kyc/status", headers=headers)
+        timings.append(time.perf_counter() - t0)
+        assert r.status_code == 200, r.text
+    timings.sort()
+    return statistics.mean(timings), timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+
+        def override_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        client = TestClient(app)
+        client.post("/auth/register", json={"email": "bench@test.com", "password": "Bench@123", "full_name": "Bench"})
+
+        modes = [
+            ("cache off     ", False, False),
+            ("principal LRU ", True, False),
+            ("token claims  ", False, True),
+        ]
+        for label, cache_on, claims in modes:
+            config.PRINCIPAL_CACHE_ENABLED, config.TOKEN_EMBED_PRINCIPAL = cache_on, claims
+            principals.cache.clear()
+            tok = client.post("/auth/login", data={"username": "bench@test.com", "password": "Bench@123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {tok}"}
+            client.post("/kyc/apply", headers=headers)
+            _measure(client, headers, 100)  # warm up
+            mean, p50, p99 = _measure(client, headers, args.requests)
+            print(f"{label}: mean {mean * 1000:.3f} ms  p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms  "
+                  f"({1 / mean:,.0f} req/s)")
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
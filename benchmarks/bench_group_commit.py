@@ -0,0 +1,83 @@
+"""Committed transfers per second with and without group commit on a file-backed SQLite database.
+
+    python -m benchmarks.bench_group_commit [--threads 32] [--transfers 3000]
+
+Request threads call the same transfer core as POST /transfer: either each thread commits its
+own transfer, or it submits to the group-commit writer and waits for its batch to commit.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import group_commit, models
+from app.routers.transfers import TransferRequest, _apply_transfer
+
+ADMIN = SimpleNamespace(id=0, role="admin")
+
+
+def _setup(path, accounts):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all(models.Account(user_id=1, account_number=f"2025{n:06d}", balance=10_000_000, status="active")
+                   for n in range(accounts))
+        db.commit()
+    return engine
+
+
+def _requests(count, accounts):
+    numbers = [f"2025{n:06d}" for n in range(accounts)]
+    return [TransferRequest(sender_account=s, receiver_account=r, amount=random.randint(1, 100))
+            for s, r in (random.sample(numbers, 2) for _ in range(count))]
+
+
+def _run(engine, reqs, threads, grouped):
+    SessionLocal = sessionmaker(bind=engine)
+    writer = group_commit.GroupCommitWriter(engine, 64, 2) if grouped else None
+
+    def one(req):
+        db = SessionLocal()
+        try:
+            if grouped:
+                writer.submit(lambda wdb: _apply_transfer(wdb, req, ADMIN)).result()
+            else:
+                _apply_transfer(db, req, ADMIN)
+                db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        ok = sum(pool.map(one, reqs))
+    return ok, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--transfers", type=int, default=3_000)
+    parser.add_argument("--accounts", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for grouped in (False, True):
+            engine = _setup(os.path.join(tmp, f"bench-{grouped}.db"), args.accounts)
+            ok, elapsed = _run(engine, _requests(args.transfers, args.accounts), args.threads, grouped)
+            label = "group commit   " if grouped else "commit per call"
+            print(f"{label}: {ok}/{args.transfers} committed in {elapsed:.2f}s -> {ok / elapsed:,.0f} transfers/s")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Transfer latency while admins pull reports, with and without the read replica.
+
+    python -m benchmarks.bench_read_replica [--concurrency 100] [--requests 3000] [--users 20]
+
+Starts the app under uvicorn once without and once with REPLICA_DATABASE_URL (the SQLite
+stand-in, synced every second), on throwaway databases. Half the requests are transfers
+between seeded customers; the other half are admin reports: GET /transactions/all with 100
+rows per page and GET /dashboard/admin/recent-transactions. Prints transfer p50/p99, report
+p99, how many reports the replica served and the lag it ended at.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_async_path import _seed, _start
+
+
+async def _load(base: str, seeded, admin: dict, concurrency: int, count: int):
+    transfers, reports, failures = [], [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+        queue = asyncio.Queue()
+        for _ in range(count):
+            queue.put_nowait(random.random())
+
+        async def worker():
+            nonlocal failures
+            while not queue.empty():
+                pick = queue.get_nowait()
+                (headers, account), (_, other) = random.sample(seeded, 2)
+                t0 = time.perf_counter()
+                try:
+                    if pick < 0.5:
+                        r = await client.post("/transfer", headers=headers,
+                                              json={"sender_account": account, "receiver_account": other, "amount": 1})
+                        bucket = transfers
+                    else:
+                        path = "/transactions/all" if pick < 0.75 else "/dashboard/admin/recent-transactions"
+                        r = await client.get(path, headers=admin, params={"limit": 100} if pick < 0.75 else None)
+                        bucket = reports
+                    failures += r.status_code >= 500
+                except httpx.TransportError:
+                    failures += 1
+                    continue
+                bucket.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        replica = (await client.get("/dashboard/admin/metrics", headers=admin)).json()["data"]
+    return transfers, reports, failures, replica
+
+
+def _pct(values, p) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=3_000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    for use_replica in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            extra = {"REPLICA_DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'replica.db')}",
+                     "REPLICA_SYNC_SECONDS": "1"} if use_replica else {}
+            proc, base = _start(tmp, True, TRANSFER_GROUP_COMMIT="1", **extra)
+            try:
+                seeded = _seed(base, args.users)
+                token = httpx.post(f"{base}/auth/login",
+                                   data={"username": "benchadmin@test.com", "password": "Admin@123"}).json()["access_token"]
+                admin = {"Authorization": f"Bearer {token}"}
+                time.sleep(2 if use_replica else 0)  # first sync and heartbeat
+                transfers, reports, failures, snapshot = asyncio.run(
+                    _load(base, seeded, admin, args.concurrency, args.requests))
+            finally:
+                proc.terminate()
+                proc.wait()
+        label = "replica    " if use_replica else "primary only"
+        served = snapshot.get("replica.reads", 0)
+        lag = snapshot["replica"].get("lag_seconds")
+        print(f"{label}: transfer p50 {_pct(transfers, 0.5):.0f} ms p99 {_pct(transfers, 0.99):.0f} ms"
+              f" | report p99 {_pct(reports, 0.99):.0f} ms | replica reads {served}"
+              f" | lag {lag if lag is None else round(lag, 2)} s | errors {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Generate transaction references in several processes at once and check none repeat.
+
+    python -m benchmarks.bench_reference_ids [--processes 4] [--per-process 1000000]
+
+Each process starts fresh (spawn, like uvicorn workers), claims its own worker id through the
+lock-file slots in app.snowflake, and generates ids as fast as it can.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from array import array
+
+
+def _worker(args):
+    count, lock_dir = args
+    os.environ["SNOWFLAKE_LOCK_DIR"] = lock_dir
+    from app import snowflake
+
+    ids = array("q")
+    t0 = time.perf_counter()
+    for _ in range(count):
+        ids.append(snowflake.next_id())
+    elapsed = time.perf_counter() - t0
+    ordered = all(a < b for a, b in zip(ids, ids[1:]))
+    return snowflake._generator.worker_id, elapsed, ordered, ids.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--per-process", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as lock_dir, mp.get_context("spawn").Pool(args.processes) as pool:
+        t0 = time.perf_counter()
+        results = pool.map(_worker, [(args.per_process, lock_dir)] * args.processes)
+        wall = time.perf_counter() - t0
+
+    seen = set()
+    total = 0
+    for worker_id, elapsed, ordered, raw in results:
+        ids = array("q")
+        ids.frombytes(raw)
+        seen.update(ids)
+        total += len(ids)
+        print(f"worker {worker_id:>4}: {len(ids):,} ids in {elapsed:.2f}s "
+              f"({len(ids) / elapsed:,.0f}/s), strictly increasing: {ordered}")
+    print(f"total {total:,} ids, unique {len(seen):,}, duplicates {total - len(seen):,}, wall {wall:.2f}s")
+    if total != len(seen):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Mixed read/write throughput on a file-backed SQLite database, stock settings vs the tuned profile.
+
+    python -m benchmarks.bench_sqlite_profile [--threads 32] [--ops 6000] [--write-ratio 0.2]
+
+Each operation is either a transfer through the same core as POST /transfer (commit per call)
+or a history read of one account's latest 20 transactions from the ledger. Under the default
+rollback journal those reads wait for every committing writer; in WAL mode they do not.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import ledger, models
+from app.database import make_engine
+from app.routers.transfers import TransferRequest, _apply_transfer
+
+ADMIN = SimpleNamespace(id=0, role="admin")
+
+
+def _setup(path, profile, accounts):
+    engine = make_engine(f"sqlite:///{path}", profile=profile, pool_size=64, max_overflow=0)
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        numbers = [f"2025{n:06d}" for n in range(accounts)]
+        db.add_all(models.Account(user_id=1, account_number=num, balance=10_000_000, status="active")
+                   for num in numbers)
+        ledger.record_openings(db, [(num, 10_000_000) for num in numbers])
+        db.commit()
+    return engine
+
+
+def _run(engine, ops, threads, accounts):
+    SessionLocal = sessionmaker(bind=engine)
+    numbers = [f"2025{n:06d}" for n in range(accounts)]
+
+    def one(op):
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        try:
+            if op == "write":
+                sender, receiver = random.sample(numbers, 2)
+                req = TransferRequest(sender_account=sender, receiver_account=receiver, amount=random.randint(1, 100))
+                _apply_transfer(db, req, ADMIN)
+                db.commit()
+            else:
+                db.execute(ledger.history([random.choice(numbers)], 20)).all()
+            return op, time.perf_counter() - t0, True
+        except Exception:
+            db.rollback()
+            return op, time.perf_counter() - t0, False
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, ops))
+    return results, time.perf_counter() - t0
+
+
+def _p99(latencies):
+    latencies = sorted(latencies)
+    return latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=6_000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--accounts", type=int, default=200)
+    args = parser.parse_args()
+
+    ops = ["write" if random.random() < args.write_ratio else "read" for _ in range(args.ops)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("default", "tuned"):
+            engine = _setup(os.path.join(tmp, f"bench-{profile}.db"), profile, args.accounts)
+            results, elapsed = _run(engine, ops, args.threads, args.accounts)
+            ok = sum(1 for _, _, success in results if success)
+            reads = [t for op, t, success in results if op == "read" and success]
+            writes = [t for op, t, success in results if op == "write" and success]
+            print(f"{profile:>7}: {ok}/{len(ops)} ops in {elapsed:.2f}s -> {ok / elapsed:,.0f} ops/s | "
+                  f"read p99 {_p99(reads):.1f} ms | write p99 {_p99(writes):.1f} ms")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
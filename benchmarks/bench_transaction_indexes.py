@@ -0,0 +1,109 @@
+"""Query plans and timings for the hot transaction queries, before and after migration 1.
+
+    python -m benchmarks.bench_transaction_indexes [--rows 200000] [--accounts 2000]
+
+Builds a throwaway SQLite database with the pre-migration schema, fills it with random
+transfers, prints EXPLAIN QUERY PLAN and the median time of each query, then runs
+`app.migrations.upgrade` and prints the same again.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+
+from app import migrations, models
+
+QUERIES = {
+    "daily debit SUM": (
+        "SELECT coalesce(sum(amount), 0) FROM transactions "
+        "WHERE sender_account = :acct AND timestamp >= :start AND timestamp < :end AND status = 'success'"
+    ),
+    "/transactions/me": (
+        "SELECT * FROM transactions WHERE sender_account IN (:acct, :acct2) OR receiver_account IN (:acct, :acct2) "
+        "ORDER BY timestamp DESC"
+    ),
+    "customer recent (limit 5)": (
+        "SELECT * FROM transactions WHERE sender_account IN (:acct, :acct2) OR receiver_account IN (:acct, :acct2) "
+        "ORDER BY timestamp DESC LIMIT 5"
+    ),
+    "/transactions/all (first 50)": "SELECT * FROM transactions ORDER BY timestamp DESC, id DESC LIMIT 50",
+    "admin recent (limit 10)": "SELECT * FROM transactions ORDER BY timestamp DESC LIMIT 10",
+}
+
+
+def _fill(engine, rows, accounts):
+    numbers = [f"2025{n:06d}" for n in range(1, accounts + 1)]
+    start = datetime.utcnow() - timedelta(days=30)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            sender, receiver = random.sample(numbers, 2)
+            batch.append({
+                "sender_account": sender,
+                "receiver_account": receiver,
+                "amount": random.randint(1, 50_000),
+                "status": "success",
+                "timestamp": start + timedelta(seconds=i * 30 * 86400 / rows),
+                "reference_id": f"TXN{i:012d}",
+            })
+            if len(batch) == 10_000:
+                conn.execute(insert(models.Transaction), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Transaction), batch)
+    return numbers
+
+
+def _report(engine, params, repeat):
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append(time.perf_counter() - t0)
+            print(f"  {name}: {statistics.median(timings) * 1000:.2f} ms")
+            for row in plan:
+                print(f"      {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--accounts", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        # Roll back to the pre-migration schema
+        with engine.begin() as conn:
+            for index in models.Transaction.__table__.indexes:
+                if index.name.startswith(("ix_transactions_sender_ts", "ix_transactions_receiver_ts", "ix_transactions_ts_id")):
+                    index.drop(bind=conn)
+        numbers = _fill(engine, args.rows, args.accounts)
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        params = {"acct": numbers[0], "acct2": numbers[1], "start": today, "end": today + timedelta(days=1)}
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+        print(f"{args.rows} transactions over {args.accounts} accounts")
+        print("before:")
+        _report(engine, params, args.repeat)
+        print(f"applied migrations: {migrations.upgrade(engine)}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        print("after:")
+        _report(engine, params, args.repeat)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
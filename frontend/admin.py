@@ -3,6 +3,15 @@ from utils import require_auth
 import api
 import requests
 
+def _live_updates(topics: str, key: str):
+    # Re-run the page when the server pushes a change, instead of re-querying on a timer
+    if not st.checkbox("Live updates", key=key):
+        return
+    with st.spinner("Waiting for changes…"):
+        for event_id, _, _ in api.admin_events(st.session_state["token"], topics, st.session_state.get(f"{key}_last")):
+            st.session_state[f"{key}_last"] = event_id  # None after a reset: resume from the live stream
+            st.rerun()
+
 def page_admin_dashboard():
     if not require_auth("admin"): return
     st.subheader("Admin Dashboard")
@@ -18,6 +27,17 @@ def page_admin_dashboard():
     else:
         st.error(s.text)
 
+    st.write("### Transfer Volume")
+    granularity = st.radio("Buckets", ["hour", "day"], horizontal=True)
+    vol = api.admin_volume(st.session_state["token"], granularity)
+    if vol.ok:
+        buckets = vol.json()["data"]["buckets"]
+        series = {b["bucket"]: {"Transfers": b["transfers"], "Amount (₹)": b["amount"]} for b in buckets}
+        st.bar_chart({b: v["Transfers"] for b, v in series.items()})
+        st.line_chart({b: v["Amount (₹)"] for b, v in series.items()})
+    else:
+        st.error(vol.text)
+
     st.write("### Recent Transactions")
     rt = api.admin_recent_txns(st.session_state["token"])
     if rt.ok:
@@ -25,25 +45,30 @@ def page_admin_dashboard():
             st.write(f'[{t["time"]}] {t["ref"]} — ₹{t["amount"]} — {t["from"]} → {t["to"]}')
     else:
         st.info("No transactions yet.")
+    _live_updates("transactions,kyc", "live_dashboard")
 
 def page_admin_kyc():
     if not require_auth("admin"): return
     st.subheader("KYC Review (Pending)")
-    # endpoint from your kyc router: /kyc/admin/pending and /kyc/admin/{kyc_id}/verify
-    # We'll call them via requests directly since api.py doesn't include these two.
+    # endpoints from your kyc router: /kyc/admin/pending, /kyc/admin/{kyc_id}/verify, /kyc/admin/verify-batch
+    # We'll call them via requests directly since api.py doesn't include these.
     headers = {"Authorization": f"Bearer {st.session_state['token']}"}
-    pending = requests.get("http://127.0.0.1:8000/kyc/admin/pending", headers=headers)
+    cursor = st.session_state.get("kyc_cursor")
+    pending = requests.get("http://127.0.0.1:8000/kyc/admin/pending", headers=headers,
+                           params={"limit": 50, **({"cursor": cursor} if cursor else {})})
     if pending.ok:
-        data = pending.json().get("data") or pending.json()  # handle both shapes
-        if isinstance(data, dict) and "data" in data:
-            kycs = data["data"]
-        else:
-            kycs = data if isinstance(data, list) else pending.json()
+        page = pending.json()
+        kycs = page["data"]
         if not kycs:
             st.info("No pending KYC.")
+        selected = []
         for k in kycs:
-            st.write(f'KYC ID: {k["id"]}  |  user_id: {k["user_id"]}  |  status: {k["status"]}')
-            col1, col2 = st.columns(2)
+            who = k["user"]["email"] if k.get("user") else f'user_id: {k["user_id"]}'
+            docs = ", ".join(d["document_type"] for d in k["documents"]) or "no documents"
+            col0, col1, col2 = st.columns([4, 1, 1])
+            with col0:
+                if st.checkbox(f'KYC ID: {k["id"]}  |  {who}  |  {docs}', key=f"sel{k['id']}"):
+                    selected.append(k["id"])
             with col1:
                 if st.button(f"Approve #{k['id']}", key=f"ap{k['id']}"):
                     r = requests.put(f"http://127.0.0.1:8000/kyc/admin/{k['id']}/verify",
@@ -54,8 +79,22 @@ def page_admin_kyc():
                     r = requests.put(f"http://127.0.0.1:8000/kyc/admin/{k['id']}/verify",
                                      params={"decision": "rejected"}, headers=headers)
                     st.write(r.text if not r.ok else "Rejected ✗")
+        if selected:
+            decision = st.radio("Decision for selected", ["approved", "rejected"], horizontal=True)
+            if st.button(f"Apply to {len(selected)} selected"):
+                r = requests.put("http://127.0.0.1:8000/kyc/admin/verify-batch", headers=headers,
+                                 json={"decisions": [{"kyc_id": i, "decision": decision} for i in selected]})
+                st.write(r.text if not r.ok else f'{r.json()["succeeded"]} done, {r.json()["failed"]} failed')
+        nav1, nav2 = st.columns(2)
+        if cursor and nav1.button("First page"):
+            st.session_state.pop("kyc_cursor", None)
+            st.rerun()
+        if page.get("next_cursor") and nav2.button("Next page"):
+            st.session_state["kyc_cursor"] = page["next_cursor"]
+            st.rerun()
     else:
         st.error(pending.text)
+    _live_updates("kyc", "live_kyc")
 
 def page_admin_accounts():
     if not require_auth("admin"): return
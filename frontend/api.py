@@ -5,6 +5,24 @@ BASE_URL = "http://127.0.0.1:8000"
 def _auth_header(token: str | None):
     return {"Authorization": f"Bearer {token}"} if token else {}
 
+# Last 200 response per (url, token); re-sent as If-None-Match so unchanged data comes back as a 304
+_etag_cache = {}
+
+def _conditional_get(url: str, token: str):
+    key = (url, token)
+    headers = _auth_header(token)
+    cached = _etag_cache.get(key)
+    if cached:
+        headers["If-None-Match"] = cached.headers["ETag"]
+    r = requests.get(url, headers=headers)
+    if r.status_code == 304 and cached:
+        return cached
+    if r.status_code == 200 and "ETag" in r.headers:
+        _etag_cache[key] = r
+    else:
+        _etag_cache.pop(key, None)
+    return r
+
 # ---------- Auth ----------
 def register(email: str, password: str, full_name: str):
     return requests.post(f"{BASE_URL}/auth/register", json={
@@ -23,12 +41,10 @@ def login(email: str, password: str):
 
 # ---------- Dashboard ----------
 def customer_summary(token: str):
-    return requests.get(f"{BASE_URL}/dashboard/customer/summary",
-                        headers=_auth_header(token))
+    return _conditional_get(f"{BASE_URL}/dashboard/customer/summary", token)
 
 def customer_recent_txns(token: str):
-    return requests.get(f"{BASE_URL}/dashboard/customer/recent-transactions",
-                        headers=_auth_header(token))
+    return _conditional_get(f"{BASE_URL}/dashboard/customer/recent-transactions", token)
 
 def admin_summary(token: str):
     return requests.get(f"{BASE_URL}/dashboard/admin/summary",
@@ -38,12 +54,40 @@ def admin_recent_txns(token: str):
     return requests.get(f"{BASE_URL}/dashboard/admin/recent-transactions",
                         headers=_auth_header(token))
 
+def admin_volume(token: str, granularity: str = "hour", **filters):
+    # filters: start, end, account_type
+    params = {"granularity": granularity, **{k: v for k, v in filters.items() if v is not None}}
+    return requests.get(f"{BASE_URL}/dashboard/admin/volume", headers=_auth_header(token), params=params)
+
+def admin_events(token: str, topics: str = "transactions,kyc", last_event_id: str | None = None):
+    """Yield (event_id, event, data) from the server-sent events stream; blocks between events."""
+    headers = _auth_header(token)
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+    with requests.get(f"{BASE_URL}/events/admin", headers=headers, params={"topics": topics},
+                      stream=True, timeout=(5, None)) as r:
+        r.raise_for_status()
+        event_id, event, data = None, "message", []
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                field, _, value = line.partition(":")
+                value = value.removeprefix(" ")
+                if field == "id":
+                    event_id = value
+                elif field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+            elif data:
+                yield event_id, event, "\n".join(data)
+                event, data = "message", []
+
 # ---------- KYC ----------
 def kyc_apply(token: str):
     return requests.post(f"{BASE_URL}/kyc/apply", headers=_auth_header(token))
 
 def kyc_status(token: str):
-    return requests.get(f"{BASE_URL}/kyc/status", headers=_auth_header(token))
+    return _conditional_get(f"{BASE_URL}/kyc/status", token)
 
 def kyc_upload(token: str, kyc_id: int, document_type: str, file_tuple):
     # file_tuple: ("filename.ext", bytes, "mime/type")
@@ -55,7 +99,7 @@ def kyc_upload(token: str, kyc_id: int, document_type: str, file_tuple):
 
 # ---------- Accounts ----------
 def my_accounts(token: str):
-    return requests.get(f"{BASE_URL}/accounts/me", headers=_auth_header(token))
+    return _conditional_get(f"{BASE_URL}/accounts/me", token)
 
 def create_account(token: str, account_type: str, initial_deposit: int, email: str | None = None):
     body = {"account_type": account_type, "initial_deposit": initial_deposit}
@@ -67,8 +111,17 @@ def transfer(token: str, sender_acct: str, receiver_acct: str, amount: int):
     body = {"sender_account": sender_acct, "receiver_account": receiver_acct, "amount": amount}
     return requests.post(f"{BASE_URL}/transfer", json=body, headers=_auth_header(token))
 
-def my_transactions(token: str):
-    return requests.get(f"{BASE_URL}/transactions/me", headers=_auth_header(token))
+def my_transactions(token: str, cursor: str | None = None, **filters):
+    # filters: limit, start, end, min_amount, max_amount, direction, counterparty, account
+    params = {k: v for k, v in {"cursor": cursor, **filters}.items() if v is not None}
+    return requests.get(f"{BASE_URL}/transactions/me", headers=_auth_header(token), params=params)
+
+def all_transactions(token: str, cursor: str | None = None, **filters):
+    params = {k: v for k, v in {"cursor": cursor, **filters}.items() if v is not None}
+    return requests.get(f"{BASE_URL}/transactions/all", headers=_auth_header(token), params=params)
 
-def all_transactions(token: str):
-    return requests.get(f"{BASE_URL}/transactions/all", headers=_auth_header(token))
+def export_transactions(token: str, fmt: str = "ndjson", **filters):
+    # streamed download; iterate with r.iter_lines() / r.iter_content()
+    params = {"format": fmt, **{k: v for k, v in filters.items() if v is not None}}
+    return requests.get(f"{BASE_URL}/transactions/export", headers=_auth_header(token),
+                        params=params, stream=True)
@@ -115,9 +115,27 @@ def page_transfer():
 def page_transactions():
     if not require_auth("customer"): return
     st.subheader("My Transactions")
-    r = api.my_transactions(st.session_state["token"])
+    direction = st.selectbox("Direction", ["all", "in", "out"])
+    counterparty = st.text_input("Counterparty Account (optional)")
+    filters = {"direction": None if direction == "all" else direction, "counterparty": counterparty or None}
+
+    # cursor stack: one entry per page visited, so "Previous" can go back
+    if st.session_state.get("txn_filters") != filters:
+        st.session_state["txn_filters"] = filters
+        st.session_state["txn_cursors"] = [None]
+    cursors = st.session_state["txn_cursors"]
+
+    r = api.my_transactions(st.session_state["token"], cursors[-1], **filters)
     if r.ok:
-        for t in r.json():
+        page = r.json()
+        for t in page["data"]:
             st.write(f'[{t["timestamp"]}] {t["reference_id"]} — ₹{t["amount"]} — {t["sender_account"]} → {t["receiver_account"]}')
+        col1, col2 = st.columns(2)
+        if len(cursors) > 1 and col1.button("Previous"):
+            cursors.pop()
+            st.rerun()
+        if page["next_cursor"] and col2.button("Next"):
+            cursors.append(page["next_cursor"])
+            st.rerun()
     else:
         st.error(r.text)